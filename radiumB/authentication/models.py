@@ -130,17 +130,11 @@ class UserProfile(models.Model):
 
     def get_year_display(self):
         """Get the display name for the year (method for Django admin compatibility)"""
-        from users.dynamic_choices_models import Year
-        from users.choices import YEAR_CHOICES
-        
+        from users.choice_registry import year_label
+
         if self.year:
-            try:
-                year_obj = Year.objects.get(code=self.year, is_active=True)
-                return year_obj.display_name
-            except Year.DoesNotExist:
-                # Fallback to hardcoded choices if dynamic model doesn't exist
-                year_choices = dict(YEAR_CHOICES)
-                return year_choices.get(self.year, self.year)
+            # Registry lookup: no query per profile, falls back to the hardcoded choices
+            return year_label(self.year)
         return None
     
     @property
@@ -151,17 +145,10 @@ class UserProfile(models.Model):
     @property
     def department_display(self):
         """Get the display name for the department"""
-        from users.dynamic_choices_models import Department
-        from users.choices import DEPARTMENT_CHOICES
-        
+        from users.choice_registry import department_label
+
         if self.department:
-            try:
-                dept_obj = Department.objects.get(code=self.department, is_active=True)
-                return dept_obj.full_name
-            except Department.DoesNotExist:
-                # Fallback to hardcoded choices if dynamic model doesn't exist
-                dept_choices = dict(DEPARTMENT_CHOICES)
-                return dept_choices.get(self.department, self.department)
+            return department_label(self.department)
         return None
 
     @property
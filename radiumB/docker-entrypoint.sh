@@ -0,0 +1,43 @@
+#!/bin/sh
+# Container entrypoint: runs the web server and/or the background workers.
+#
+#   all             gunicorn plus every background worker in one container (default)
+#   web             gunicorn only
+#   email-worker    process_email_outbox only (sends queued registration QR emails)
+#   webhook-worker  process_payment_webhooks only (applies stored payment webhooks)
+#
+# Anything else is run as a command, e.g. `docker run <image> python manage.py migrate`.
+# See DEPLOYMENT.md.
+set -e
+
+run_forever() {
+    # Restart a worker that exits or crashes, after a short pause
+    while true; do
+        python manage.py "$@" || echo "[entrypoint] $1 exited with status $?, restarting"
+        sleep 5
+    done
+}
+
+web() {
+    exec gunicorn --bind 0.0.0.0:8000 radiumB.wsgi:application
+}
+
+case "${1:-all}" in
+    all)
+        run_forever process_email_outbox &
+        run_forever process_payment_webhooks &
+        web
+        ;;
+    web)
+        web
+        ;;
+    email-worker)
+        run_forever process_email_outbox
+        ;;
+    webhook-worker)
+        run_forever process_payment_webhooks
+        ;;
+    *)
+        exec "$@"
+        ;;
+esac
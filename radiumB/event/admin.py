@@ -1,11 +1,13 @@
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 from django.shortcuts import redirect, render
 from django.urls import path
 from django.utils.html import format_html
 from django.contrib import messages
-from .models import Event, ODList, Participant, EventGuide, EventQuestion, EventCategory
-from .email_services import send_registration_email, send_qr_email_to_participant, get_participant_qr_status_html, create_participant_with_od
+from .models import Event, ODList, Participant, EventGuide, EventQuestion, EventCategory, EmailOutbox, EventStats, UserScheduleSlot
+from .email_services import send_registration_email, send_registration_emails_bulk, format_bulk_email_report, send_qr_email_to_participant, get_participant_qr_status_html
+from .bulk_booking import PROFILE_FIELDS, BookingRowError, bulk_book, parse_booking_csv
 from import_export.admin import ImportExportModelAdmin
 from import_export import resources
 
@@ -57,25 +59,8 @@ def internal_booking_view(request):
             messages.error(request, 'No users selected.')
             return redirect(f"{request.path}?event_id={event_id}")
 
-        success_count = 0
-        for user_id in selected_user_ids:
-            try:
-                user = User.objects.get(pk=user_id)
-                result = create_participant_with_od(user, event, send_email=True)
-
-                if result['success']:
-                    messages.success(request, f'{user.username}: {result["message"]}')
-                    success_count += 1
-                else:
-                    messages.warning(request, f'{user.username}: {result["message"]}')
-
-            except User.DoesNotExist:
-                messages.error(request, f'User with ID {user_id} not found.')
-            except Exception as e:
-                messages.error(request, f'Error booking user {user_id}: {str(e)}')
-
-        if success_count > 0:
-            messages.success(request, f'Successfully processed {success_count} booking(s) for {event.event_name}.')
+        report = bulk_book(event, [{'user_id': user_id} for user_id in selected_user_ids])
+        _report_bulk_booking(request, event, report)
 
         return redirect('admin:event_event_changelist')
 
@@ -91,12 +76,64 @@ def internal_booking_view(request):
 
     return render(request, 'admin/internal_booking_form.html', context)
 
+def _report_bulk_booking(request, event, report):
+    for result in report['results']:
+        if result['status'] not in ('booked', 'already_registered'):
+            label = result.get('username') or result['email'] or result['user_id'] or f"Row {result['row']}"
+            messages.warning(request, f"{label}: {result.get('error', result['status'])}")
+    if report['already_registered']:
+        messages.info(request, f"{report['already_registered']} already registered for {event.event_name}.")
+    if report['booked']:
+        messages.success(
+            request,
+            f"Successfully booked {report['booked']} participant(s) for {event.event_name} "
+            f"({report['users_created']} new users, {report['emails_queued']} QR emails queued)."
+        )
+
+
+def internal_booking_bulk_view(request):
+    """Admin view for booking a CSV list of people to an event"""
+    event_id = request.GET.get('event_id')
+    try:
+        event = Event.objects.get(pk=event_id)
+    except (Event.DoesNotExist, ValueError, TypeError):
+        messages.error(request, 'Event not found.')
+        return redirect('admin:event_event_changelist')
+
+    if request.method == 'POST':
+        uploaded = request.FILES.get('file')
+        if not uploaded:
+            messages.error(request, 'Choose a CSV file to upload.')
+            return redirect(f"{request.path}?event_id={event_id}")
+        try:
+            rows = parse_booking_csv(uploaded)
+        except BookingRowError as e:
+            messages.error(request, str(e))
+            return redirect(f"{request.path}?event_id={event_id}")
+        if len(rows) > settings.BULK_BOOKING_MAX_ROWS:
+            messages.error(request, f'At most {settings.BULK_BOOKING_MAX_ROWS} rows can be booked per upload.')
+            return redirect(f"{request.path}?event_id={event_id}")
+
+        report = bulk_book(event, rows, send_email=bool(request.POST.get('send_email')))
+        _report_bulk_booking(request, event, report)
+        return redirect('admin:event_event_changelist')
+
+    context = {
+        'title': f'Bulk Book Users for {event.event_name}',
+        'event': event,
+        'columns': ', '.join(('email', 'first_name', 'last_name') + PROFILE_FIELDS),
+        'max_rows': settings.BULK_BOOKING_MAX_ROWS,
+        'opts': Event._meta,
+    }
+    return render(request, 'admin/internal_booking_bulk.html', context)
+
 original_get_urls = admin.site.get_urls
 
 def get_urls_with_internal_booking():
     urls = original_get_urls()
     custom_urls = [
         path('internal-booking/', admin.site.admin_view(internal_booking_view), name='internal_booking'),
+        path('internal-booking/bulk/', admin.site.admin_view(internal_booking_bulk_view), name='internal_booking_bulk'),
     ]
     return custom_urls + urls
 
@@ -124,6 +161,7 @@ class EventAdmin(ImportExportModelAdmin):
         'is_active',
         'is_upcoming',
         'participant_count',
+        'od_status_summary',
         'created_at'
     ]
 
@@ -172,10 +210,10 @@ class EventAdmin(ImportExportModelAdmin):
     )
 
     inlines = [EventQuestionInline, ParticipantInline]
-    actions = ['send_qr_emails_bulk', 'resend_qr_emails_bulk', 'internal_book_users']
+    actions = ['send_qr_emails_bulk', 'resend_qr_emails_bulk', 'internal_book_users', 'bulk_book_from_csv']
 
     def get_queryset(self, request):
-        return super().get_queryset(request).select_related().prefetch_related('participants')
+        return super().get_queryset(request).select_related('event_type', 'stats')
 
     def is_upcoming(self, obj):
         return obj.is_upcoming
@@ -183,31 +221,26 @@ class EventAdmin(ImportExportModelAdmin):
     is_upcoming.short_description = 'Upcoming'
 
     def participant_count(self, obj):
-        return obj.participants.count()
+        return EventStats.for_event(obj).registered
     participant_count.short_description = 'Participants'
 
     def od_status_summary(self, obj):
         """Show OD/QR status summary for the event"""
-        participants = obj.participants.filter(registration_status='confirmed', payment_status=True)
-        total_participants = participants.count()
+        stats = EventStats.for_event(obj)
 
-        if total_participants == 0:
+        if stats.eligible == 0:
             return format_html('<span style="color: gray;">No eligible participants</span>')
 
-        od_entries = ODList.objects.filter(participant__in=participants)
-        qr_sent_count = od_entries.filter(qr_sent=True).count()
-        total_od_entries = od_entries.count()
-
-        if total_od_entries == 0:
+        if stats.od_created == 0:
             return format_html('<span style="color: orange;">{} eligible, {} OD entries</span>',
-                             total_participants, total_od_entries)
+                             stats.eligible, stats.od_created)
 
-        percentage = int((qr_sent_count / total_od_entries) * 100)
+        percentage = int((stats.qr_sent / stats.od_created) * 100)
 
-        if qr_sent_count == total_od_entries:
+        if stats.qr_sent >= stats.od_created:
             color = 'green'
             status = 'Complete'
-        elif qr_sent_count > 0:
+        elif stats.qr_sent > 0:
             color = 'orange'
             status = 'Partial'
         else:
@@ -222,136 +255,66 @@ class EventAdmin(ImportExportModelAdmin):
 
     def od_status_detail(self, obj):
         """Show detailed OD/QR status for the event"""
-        participants = obj.participants.filter(registration_status='confirmed', payment_status=True)
-        total_eligible = participants.count()
+        stats = EventStats.for_event(obj)
+        total_eligible = stats.eligible
 
         if total_eligible == 0:
             return "No eligible participants (confirmed registration + payment completed)"
 
-        od_entries = ODList.objects.filter(participant__in=participants)
-        total_od = od_entries.count()
-        qr_sent = od_entries.filter(qr_sent=True).count()
-        qr_not_sent = total_od - qr_sent
-
         detail = f"Eligible participants: {total_eligible}\n"
-        detail += f"OD entries created: {total_od}\n"
-        detail += f"QR emails sent: {qr_sent}\n"
-        detail += f"QR emails pending: {qr_not_sent}"
+        detail += f"OD entries created: {stats.od_created}\n"
+        detail += f"QR emails sent: {stats.qr_sent}\n"
+        detail += f"QR emails pending: {stats.qr_pending}\n"
+        detail += f"Attended: {stats.attended}"
 
-        if total_od < total_eligible:
-            detail += f"\n {total_eligible - total_od} participants missing OD entries"
+        if stats.od_created < total_eligible:
+            detail += f"\n {total_eligible - stats.od_created} participants missing OD entries"
 
         return detail
     od_status_detail.short_description = 'OD/QR Status Details'
 
-    def send_qr_emails_bulk(self, request, queryset):
-        """Send QR code emails to all eligible participants of selected events"""
-        total_sent = 0
-        total_failed = 0
+    def _eligible_od_lists(self, queryset, only_unsent):
+        """ODList rows for eligible participants of the selected events, creating any missing entries"""
+        participants = Participant.objects.filter(
+            event__in=queryset,
+            registration_status='confirmed',
+            payment_status=True
+        ).select_related('event')
 
-        for event in queryset:
-            participants = event.participants.filter(
-                registration_status='confirmed',
-                payment_status=True
-            )
+        for participant in participants.filter(registered_participants__isnull=True):
+            ODList.objects.create(participant=participant, event=participant.event)
 
-            for participant in participants:
-                try:
-                    od_list = ODList.objects.get(participant=participant)
-                    if not od_list.qr_sent: 
-                        try:
-                            if send_registration_email(od_list):
-                                od_list.qr_sent = True
-                                od_list.save(update_fields=['qr_sent'])
-                                total_sent += 1
-                            else:
-                                total_failed += 1
-                        except Exception as e:
-                            total_failed += 1
-                            self.message_user(
-                                request,
-                                f'Failed to send email for {event.event_name} to {participant.user.email}: {str(e)}',
-                                messages.ERROR
-                            )
-                except ODList.DoesNotExist:
-                    try:
-                        od_list = ODList.objects.create(participant=participant)
-                        if send_registration_email(od_list):
-                            total_sent += 1
-                        else:
-                            total_failed += 1
-                    except Exception as e:
-                        total_failed += 1
-                        self.message_user(
-                            request,
-                            f'Failed to create OD and send email for {event.event_name} to {participant.user.email}: {str(e)}',
-                            messages.ERROR
-                        )
+        od_lists = ODList.objects.filter(participant__in=participants).select_related(
+            'participant', 'participant__user', 'participant__event'
+        )
+        if only_unsent:
+            od_lists = od_lists.filter(qr_sent=False)
+        return od_lists
 
-        if total_sent > 0:
+    def _report_bulk_send(self, request, report, verb):
+        if report['sent'] > 0:
             self.message_user(
                 request,
-                f'Successfully sent {total_sent} QR code emails.',
+                f'Successfully {verb} {report["sent"]} QR code emails. {format_bulk_email_report(report)}',
                 messages.SUCCESS
             )
-        if total_failed > 0:
+        if report['failed'] > 0:
             self.message_user(
                 request,
-                f'Failed to send {total_failed} emails.',
+                f'Failed to send {report["failed"]} emails.',
                 messages.WARNING
             )
+
+    def send_qr_emails_bulk(self, request, queryset):
+        """Send QR code emails to all eligible participants of selected events"""
+        report = send_registration_emails_bulk(self._eligible_od_lists(queryset, only_unsent=True))
+        self._report_bulk_send(request, report, 'sent')
     send_qr_emails_bulk.short_description = 'Send QR emails to all eligible participants'
 
     def resend_qr_emails_bulk(self, request, queryset):
         """Resend QR code emails to all participants of selected events (force send)"""
-        total_sent = 0
-        total_failed = 0
-
-        for event in queryset:
-            participants = event.participants.filter(
-                registration_status='confirmed',
-                payment_status=True
-            )
-
-            for participant in participants:
-                try:
-                    od_list = ODList.objects.get(participant=participant)
-                    try:
-                        if send_registration_email(od_list):
-                            od_list.qr_sent = True
-                            od_list.save(update_fields=['qr_sent'])
-                            total_sent += 1
-                        else:
-                            total_failed += 1
-                    except Exception as e:
-                        total_failed += 1
-                        self.message_user(
-                            request,
-                            f'Failed to resend email for {event.event_name} to {participant.user.email}: {str(e)}',
-                            messages.ERROR
-                        )
-                except ODList.DoesNotExist:
-                    try:
-                        od_list = ODList.objects.create(participant=participant)
-                        if send_registration_email(od_list):
-                            total_sent += 1
-                        else:
-                            total_failed += 1
-                    except Exception as e:
-                        total_failed += 1
-
-        if total_sent > 0:
-            self.message_user(
-                request,
-                f'Successfully resent {total_sent} QR code emails.',
-                messages.SUCCESS
-            )
-        if total_failed > 0:
-            self.message_user(
-                request,
-                f'Failed to resend {total_failed} emails.',
-                messages.WARNING
-            )
+        report = send_registration_emails_bulk(self._eligible_od_lists(queryset, only_unsent=False))
+        self._report_bulk_send(request, report, 'resent')
     resend_qr_emails_bulk.short_description = 'Resend QR emails to all participants (force)'
 
     def internal_book_users(self, request, queryset):
@@ -369,6 +332,16 @@ class EventAdmin(ImportExportModelAdmin):
 
     internal_book_users.short_description = 'Book users for selected event'
 
+    def bulk_book_from_csv(self, request, queryset):
+        """Action to book a CSV list of people for one event - redirects to the upload form"""
+        if queryset.count() != 1:
+            messages.error(request, 'Please select exactly one event for bulk booking.')
+            return
+
+        from django.urls import reverse
+        return redirect(reverse('admin:internal_booking_bulk') + f'?event_id={queryset.first().pk}')
+    bulk_book_from_csv.short_description = 'Bulk book users from CSV for selected event'
+
     def get_form(self, request, obj=None, **kwargs):
         if obj:
             request._current_event = obj
@@ -438,83 +411,47 @@ class ODListAdmin(ImportExportModelAdmin):
     user_email.admin_order_field = 'participant__user__email'
 
     def mark_attendance(self, request, queryset):
+        event_ids = set(queryset.values_list('event_id', flat=True))
         updated = queryset.update(attendance=True)
+        EventStats.refresh(event_ids)
         self.message_user(request, f'{updated} entries marked as attended.')
     mark_attendance.short_description = 'Mark selected as attended'
 
     def unmark_attendance(self, request, queryset):
+        event_ids = set(queryset.values_list('event_id', flat=True))
         updated = queryset.update(attendance=False, attendance_marked_at=None)
+        EventStats.refresh(event_ids)
         self.message_user(request, f'{updated} entries unmarked.')
     unmark_attendance.short_description = 'Unmark attendance'
 
-    def send_qr_email(self, request, queryset):
-        """Send QR code email to selected OD entries"""
-        sent_count = 0
-        failed_count = 0
-
-        for od_list in queryset:
-            try:
-                if send_registration_email(od_list):
-                    od_list.qr_sent = True
-                    od_list.save(update_fields=['qr_sent'])
-                    sent_count += 1
-                else:
-                    failed_count += 1
-            except Exception as e:
-                failed_count += 1
-                self.message_user(
-                    request,
-                    f'Failed to send email to {od_list.participant.user.email}: {str(e)}',
-                    messages.ERROR
-                )
+    def _send_bulk(self, request, queryset, verb):
+        report = send_registration_emails_bulk(
+            queryset.select_related('participant', 'participant__user', 'participant__event')
+        )
+        for od_list_id, error in report['errors'].items():
+            self.message_user(request, f'Failed to send email for OD #{od_list_id}: {error}', messages.ERROR)
 
-        if sent_count > 0:
+        if report['sent'] > 0:
             self.message_user(
                 request,
-                f'Successfully sent {sent_count} QR code emails.',
+                f'Successfully {verb} {report["sent"]} QR code emails. {format_bulk_email_report(report)}',
                 messages.SUCCESS
             )
-        if failed_count > 0:
+        if report['failed'] > 0:
             self.message_user(
                 request,
-                f'Failed to send {failed_count} emails.',
+                f'Failed to send {report["failed"]} emails.',
                 messages.WARNING
             )
+
+    def send_qr_email(self, request, queryset):
+        """Send QR code email to selected OD entries"""
+        self._send_bulk(request, queryset, 'sent')
     send_qr_email.short_description = 'Send QR code email to selected'
 
     def resend_qr_email(self, request, queryset):
         """Resend QR code email to selected OD entries (force send even if already sent)"""
-        sent_count = 0
-        failed_count = 0
-
-        for od_list in queryset:
-            try:
-                if send_registration_email(od_list):
-                    od_list.qr_sent = True
-                    od_list.save(update_fields=['qr_sent'])
-                    sent_count += 1
-                else:
-                    failed_count += 1
-            except Exception as e:
-                failed_count += 1
-                self.message_user(
-                    request,
-                    f'Failed to resend email to {od_list.participant.user.email}: {str(e)}',
-                    messages.ERROR
-                )
-
-        if sent_count > 0:
-            self.message_user(
-                request,
-                f'Successfully resent {sent_count} QR code emails.',
-                messages.SUCCESS
-            )
-        if failed_count > 0:
-            self.message_user(
-                request,
-                f'Failed to resend {failed_count} emails.',
-                messages.WARNING
-            )
+        self._send_bulk(request, queryset, 'resent')
     resend_qr_email.short_description = 'Resend QR code email to selected (force)'
 
 
@@ -537,12 +474,20 @@ class ParticipantAdmin(ImportExportModelAdmin):
     actions = ['confirm_registrations', 'mark_as_paid', 'admin_unregister', 'send_qr_email_individual', 'resend_qr_email_individual']
 
     def confirm_registrations(self, request, queryset):
-        updated = queryset.update(registration_status=True)
+        event_ids = set(queryset.values_list('event_id', flat=True))
+        updated = queryset.exclude(registration_status='confirmed').update(registration_status='confirmed')
+        # Bulk update skips the participant signals, so recount the affected events
+        Event.reconcile_confirmed_counts(Event.objects.filter(pk__in=event_ids))
+        EventStats.refresh(event_ids)
+        for participant in queryset.select_related('event'):
+            UserScheduleSlot.sync_participant(participant)
         self.message_user(request, f'{updated} registrations confirmed.')
     confirm_registrations.short_description = 'Confirm selected registrations'
 
     def mark_as_paid(self, request, queryset):
+        event_ids = set(queryset.values_list('event_id', flat=True))
         updated = queryset.update(payment_status=True)
+        EventStats.refresh(event_ids)
         self.message_user(request, f'{updated} marked as paid.')
     mark_as_paid.short_description = 'Mark selected as paid'
 
@@ -766,4 +711,26 @@ class EventCategoryAdmin(ImportExportModelAdmin):
     def get_readonly_fields(self, request, obj=None):
         if obj:  # Editing existing object
             return self.readonly_fields + ('event_count',)
-        return self.readonly_fields
\ No newline at end of file
+        return self.readonly_fields
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    """Admin interface for the email outbox"""
+    list_display = ('od_list', 'email_type', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'email_type')
+    search_fields = ('od_list__participant__user__email', 'od_list__participant__event__event_name')
+    readonly_fields = ('od_list', 'attempts', 'locked_at', 'last_error', 'sent_at', 'created_at', 'updated_at')
+    actions = ['retry_now']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('od_list__participant__user')
+
+    def retry_now(self, request, queryset):
+        """Reschedule selected emails for immediate delivery"""
+        from django.utils import timezone
+        updated = queryset.exclude(status='sent').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), locked_at=None
+        )
+        self.message_user(request, f'{updated} email(s) queued for immediate retry.')
+    retry_now.short_description = 'Retry selected emails now'
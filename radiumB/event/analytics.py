@@ -0,0 +1,141 @@
+"""
+Attendance analytics for events
+
+Every breakdown is one GROUP BY query with conditional Count(filter=Q(...))
+aggregates, so the cost depends on the number of groups, not participants.
+Used by the CSV analysis export and the JSON analytics endpoint. Whole-event
+totals come from the EventStats row instead.
+"""
+from django.db.models import Case, CharField, Count, Q, Value, When
+from django.db.models.functions import Coalesce, Concat, NullIf, Substr
+
+from .models import EventStats, Participant
+
+# Year code taken from the roll number in the email (231001196@... -> 2023), as _extract_year_from_email does
+EMAIL_YEAR = Case(
+    When(
+        user__email__regex=r'^[0-9]{2}[^@]{7,}@',
+        then=Concat(Value('20'), Substr('user__email', 1, 2), output_field=CharField())
+    ),
+    default=Value('Unknown'),
+    output_field=CharField()
+)
+
+PAYMENT_STATUS = Case(
+    When(payment_status=True, then=Value('Paid')),
+    default=Value('Unpaid'),
+    output_field=CharField()
+)
+
+DIMENSIONS = {
+    'department': NullIf('user__profile__department', Value('')),
+    'year': EMAIL_YEAR,
+    'college': Coalesce('user__profile__college_name', Value('Unknown')),
+    'payment': PAYMENT_STATUS,
+}
+
+ATTENDED = Q(registered_participants__attendance=True)
+
+
+def _rate(part, total):
+    return round(part / total * 100, 2) if total else 0.0
+
+
+def department_names(codes):
+    """Map department codes to display names from the choice registry"""
+    from users.choice_registry import department_label
+
+    return {code: department_label(code) for code in codes}
+
+
+def event_participants(event):
+    return Participant.objects.filter(event=event)
+
+
+def attendance_summary(participants):
+    """
+    Overall counts in a single aggregate query.
+
+    Returns:
+        dict: registered, present, absent, paid, unpaid, attendance_rate, payment_rate
+    """
+    totals = participants.order_by().aggregate(
+        registered=Count('pk', distinct=True),
+        present=Count('pk', filter=ATTENDED, distinct=True),
+        paid=Count('pk', filter=Q(payment_status=True), distinct=True),
+    )
+    registered = totals['registered']
+    return {
+        'registered': registered,
+        'present': totals['present'],
+        'absent': registered - totals['present'],
+        'paid': totals['paid'],
+        'unpaid': registered - totals['paid'],
+        'attendance_rate': _rate(totals['present'], registered),
+        'payment_rate': _rate(totals['paid'], registered),
+    }
+
+
+def attendance_breakdown(participants, dimension):
+    """
+    Registered/present/absent counts per group of one dimension.
+
+    Args:
+        participants: Participant queryset
+        dimension: One of DIMENSIONS ('department', 'year', 'college', 'payment')
+
+    Returns:
+        list: [{'key', 'label', 'registered', 'present', 'absent', 'attendance_rate'}] ordered by key
+    """
+    if dimension not in DIMENSIONS:
+        raise ValueError(f'Unknown analytics dimension: {dimension}')
+
+    groups = list(
+        participants.order_by()
+        .annotate(group=DIMENSIONS[dimension])
+        .values('group')
+        .annotate(
+            registered=Count('pk', distinct=True),
+            present=Count('pk', filter=ATTENDED, distinct=True),
+        )
+        .order_by('group')
+    )
+
+    labels = {}
+    if dimension == 'department':
+        labels = department_names([group['group'] for group in groups if group['group']])
+
+    rows = []
+    for group in groups:
+        key = group['group'] or 'Unknown'
+        registered, present = group['registered'], group['present']
+        rows.append({
+            'key': key,
+            'label': labels.get(key, key),
+            'registered': registered,
+            'present': present,
+            'absent': registered - present,
+            'attendance_rate': _rate(present, registered),
+        })
+    return rows
+
+
+def event_analytics(event, dimensions=None):
+    """
+    Summary plus the requested breakdowns for one event.
+
+    Args:
+        event: Event instance
+        dimensions: Iterable of dimension names (default: all)
+
+    Returns:
+        dict: {'summary': {...}, 'breakdowns': {dimension: [...]}}
+    """
+    participants = event_participants(event)
+    return {
+        'summary': EventStats.for_event(event).summary(),
+        'breakdowns': {
+            dimension: attendance_breakdown(participants, dimension)
+            for dimension in (dimensions or DIMENSIONS)
+        },
+    }
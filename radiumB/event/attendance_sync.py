@@ -0,0 +1,246 @@
+"""
+Offline attendance sync for scanner devices
+
+Devices download an event's hash manifest before the gate opens, validate
+QRs locally while offline and upload their scans in batches once connected.
+
+Manifest formats (GET /api/events/<id>/attendance/manifest/?encoding=...):
+
+ndjson   One JSON object per line. The first line is a header
+         {"event_id", "event_name", "generated_at"}, then one line per OD entry
+         {"h": hash, "n": display name, "r": roll number, "a": attended}.
+
+binary   Header: b'RDMF', version byte (1), event ID (uint32), generated_at
+         (uint64 unix seconds), all big-endian. Then one record per OD entry:
+         flags byte (bit 0 attended, bit 1 hash packed from hex), length byte,
+         hash bytes. SHA-256 hex hashes are packed to 32 raw bytes, other
+         hashes are sent as ASCII.
+"""
+import json
+import re
+import struct
+
+from django.conf import settings
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import EventStats, ODList
+from .qr_tokens import check_scan
+
+MANIFEST_MAGIC = b'RDMF'
+MANIFEST_VERSION = 1
+FLAG_ATTENDED = 0x01
+FLAG_PACKED_HEX = 0x02
+
+_HEX_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+# Keeps hash__in lookups under SQLite's bound parameter limit
+_LOOKUP_CHUNK = 500
+
+
+def _parse_scanned_at(value, now):
+    if not value:
+        return now
+    scanned_at = parse_datetime(str(value))
+    if scanned_at is None:
+        raise ValueError('scanned_at must be an ISO 8601 datetime')
+    if timezone.is_naive(scanned_at):
+        scanned_at = timezone.make_aware(scanned_at)
+    # A device clock running ahead must not record attendance in the future
+    return min(scanned_at, now)
+
+
+def sync_scans(event_id, scans):
+    """
+    Mark a batch of offline scans in one transaction.
+
+    Repeated hashes in the batch are collapsed to the earliest scan. An entry
+    that is already marked keeps its attendance but takes the earlier of the
+    two timestamps, so late uploads from an offline device still record when
+    the attendee actually came in.
+
+    Args:
+        event_id: Event ID
+        scans: Iterable of dicts with 'hash' and optional 'scanned_at', 'scanner_id'
+
+    Returns:
+        dict: {'marked', 'already_marked', 'not_found', 'invalid', 'duplicate', 'results'}, where
+              results holds one {'hash', 'status', ...} per submitted scan, in order
+    """
+    now = timezone.now()
+    results = []
+    earliest = {}
+
+    for scan in scans:
+        if not isinstance(scan, dict):
+            results.append({'hash': None, 'status': 'invalid', 'error': 'Each scan must be an object'})
+            continue
+        hash_value = str(scan.get('hash') or '').strip()
+        result = {'hash': hash_value}
+        results.append(result)
+        if not hash_value:
+            result.update(status='invalid', error='hash is required')
+            continue
+        if not check_scan(event_id, hash_value)[0]:
+            result.update(status='invalid', error='QR token is forged or belongs to another event')
+            continue
+        try:
+            scanned_at = _parse_scanned_at(scan.get('scanned_at'), now)
+        except ValueError as e:
+            result.update(status='invalid', error=str(e))
+            continue
+
+        scanner_id = str(scan.get('scanner_id') or '')[:64]
+        kept = earliest.get(hash_value)
+        if kept is None or scanned_at < kept['scanned_at']:
+            earliest[hash_value] = {'scanned_at': scanned_at, 'scanner_id': scanner_id, 'result': result}
+
+    outcome = {}
+    newly_marked = 0
+    with transaction.atomic():
+        hashes = list(earliest)
+        entries = []
+        for start in range(0, len(hashes), _LOOKUP_CHUNK):
+            entries.extend(
+                ODList.objects.select_for_update()
+                .filter(event_id=event_id, hash__in=hashes[start:start + _LOOKUP_CHUNK])
+                .only('id', 'hash', 'attendance', 'attendance_marked_at', 'scanned_by')
+            )
+
+        changed = []
+        for entry in entries:
+            scan = earliest[entry.hash]
+            if not entry.attendance:
+                entry.attendance = True
+                entry.attendance_marked_at = scan['scanned_at']
+                entry.scanned_by = scan['scanner_id']
+                changed.append(entry)
+                newly_marked += 1
+                outcome[entry.hash] = ('marked', entry.attendance_marked_at)
+            else:
+                if entry.attendance_marked_at is None or scan['scanned_at'] < entry.attendance_marked_at:
+                    entry.attendance_marked_at = scan['scanned_at']
+                    entry.scanned_by = scan['scanner_id']
+                    changed.append(entry)
+                outcome[entry.hash] = ('already_marked', entry.attendance_marked_at)
+
+        if changed:
+            ODList.objects.bulk_update(
+                changed, ['attendance', 'attendance_marked_at', 'scanned_by'], batch_size=_LOOKUP_CHUNK
+            )
+        if newly_marked:
+            # bulk_update skips the stats signals
+            EventStats.apply_delta(event_id, attended=newly_marked)
+
+    kept_results = {id(scan['result']) for scan in earliest.values()}
+    counts = dict.fromkeys(('marked', 'already_marked', 'not_found', 'invalid', 'duplicate'), 0)
+    for result in results:
+        if 'status' not in result:
+            if id(result) not in kept_results:
+                result['status'] = 'duplicate'
+            elif result['hash'] in outcome:
+                result['status'], marked_at = outcome[result['hash']]
+                result['marked_at'] = marked_at.isoformat()
+            else:
+                result['status'] = 'not_found'
+        counts[result['status']] += 1
+
+    return {**counts, 'results': results}
+
+
+def sync_uploads(event_id, uploads, scanner_id='', scanned_at=None):
+    """
+    Decode uploaded gate photos or clips and mark the QR values found, like an offline batch.
+
+    Args:
+        event_id: Event ID
+        uploads: List of (name, data, content_type) tuples
+        scanner_id: Optional ID of the uploading device
+        scanned_at: Optional ISO 8601 time the uploads were captured (defaults to now)
+
+    Returns:
+        dict: sync_scans() report plus 'uploads', one decode summary per upload
+    """
+    # OpenCV and NumPy are only needed here; scan syncing and manifests must not depend on them
+    from .qr_decoder import decode_uploads
+
+    decoded = decode_uploads(
+        uploads,
+        workers=settings.QR_DECODE_WORKERS,
+        max_side=settings.QR_DECODE_MAX_SIDE,
+        duplicate_threshold=settings.QR_DECODE_DUPLICATE_THRESHOLD,
+        max_frames=settings.QR_DECODE_MAX_FRAMES,
+    )
+    scans = [
+        {'hash': value, 'scanned_at': scanned_at, 'scanner_id': scanner_id}
+        for upload in decoded
+        for value in upload['values']
+    ]
+    report = sync_scans(event_id, scans) if scans else {
+        **dict.fromkeys(('marked', 'already_marked', 'not_found', 'invalid', 'duplicate'), 0), 'results': []
+    }
+    return {**report, 'uploads': decoded}
+
+
+def _manifest_entries(event_id):
+    return (
+        ODList.objects.filter(event_id=event_id)
+        .order_by('pk')
+        .values_list(
+            'hash', 'attendance',
+            'participant__user__first_name', 'participant__user__last_name', 'participant__user__username',
+            'participant__user__profile__rollno',
+        )
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+def ndjson_manifest(event):
+    """Yield the NDJSON manifest, one encoded line at a time"""
+    header = {'event_id': event.id, 'event_name': event.event_name, 'generated_at': timezone.now().isoformat()}
+    yield json.dumps(header) + '\n'
+    for hash_value, attended, first_name, last_name, username, rollno in _manifest_entries(event.id):
+        line = {'h': hash_value, 'n': f'{first_name} {last_name}'.strip() or username, 'r': rollno or '', 'a': attended}
+        yield json.dumps(line, separators=(',', ':')) + '\n'
+
+
+def binary_manifest(event):
+    """Yield the binary manifest, one chunk of records at a time"""
+    yield MANIFEST_MAGIC + struct.pack('>BIQ', MANIFEST_VERSION, event.id, int(timezone.now().timestamp()))
+    chunk = bytearray()
+    for hash_value, attended, *_ in _manifest_entries(event.id):
+        flags = FLAG_ATTENDED if attended else 0
+        if _HEX_DIGEST_RE.match(hash_value):
+            flags |= FLAG_PACKED_HEX
+            raw = bytes.fromhex(hash_value)
+        else:
+            raw = hash_value.encode()
+        chunk += struct.pack('>BB', flags, len(raw)) + raw
+        if len(chunk) >= 64 * 1024:
+            yield bytes(chunk)
+            chunk = bytearray()
+    if chunk:
+        yield bytes(chunk)
+
+
+def manifest_response(event, encoding):
+    """
+    Stream an event's hash manifest.
+
+    Args:
+        event: Event instance
+        encoding: 'ndjson' or 'binary'
+
+    Returns:
+        StreamingHttpResponse: Manifest attachment
+    """
+    if encoding == 'binary':
+        response = StreamingHttpResponse(binary_manifest(event), content_type='application/octet-stream')
+        filename = f'event_{event.id}_manifest.bin'
+    else:
+        response = StreamingHttpResponse(ndjson_manifest(event), content_type='application/x-ndjson')
+        filename = f'event_{event.id}_manifest.ndjson'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
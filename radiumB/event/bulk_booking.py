@@ -0,0 +1,338 @@
+"""
+Bulk internal booking
+
+Books a list of people (from a CSV upload, JSON or user IDs picked in the
+admin) for one event in a fixed number of queries per chunk:
+
+- existing users are resolved with one email IN query and one ID IN query per chunk
+- usernames for new users are made unique in memory against one lookup, and their
+  passwords hashed, before the transaction opens
+- users, profiles, participants and OD entries are written with bulk_create
+- QR emails are queued in the outbox afterwards, never sent inline
+
+bulk_create skips model signals, so the seat counter, schedule slots, event
+stats and response cache are brought up to date explicitly at the end.
+"""
+import csv
+import io
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from authentication.models import UserProfile
+from users.usernames import unique_usernames
+
+from .models import EmailOutbox, EventStats, ODList, Participant, UserScheduleSlot
+from .qr_tokens import new_qr_value
+from .response_cache import invalidate_event
+
+User = get_user_model()
+
+PROFILE_FIELDS = ('rollno', 'department', 'degree', 'college_name', 'phone_number')
+ROW_FIELDS = ('user_id', 'email', 'first_name', 'last_name') + PROFILE_FIELDS
+
+_EMAIL_RE = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+# Keeps IN lookups under SQLite's bound parameter limit
+_LOOKUP_CHUNK = 500
+
+
+class BookingRowError(ValueError):
+    """Raised when a booking upload cannot be read at all"""
+
+
+def parse_booking_csv(uploaded_file):
+    """
+    Read booking rows from an uploaded CSV.
+
+    The header row names the columns: email (or user_id) is required,
+    first_name, last_name, rollno, department, degree, college_name and
+    phone_number are optional.
+
+    Returns:
+        list: Row dicts
+    """
+    try:
+        text = io.TextIOWrapper(uploaded_file, encoding='utf-8-sig')
+        reader = csv.DictReader(text)
+        if not reader.fieldnames or not {'email', 'user_id'} & {name.strip().lower() for name in reader.fieldnames}:
+            raise BookingRowError('CSV must have a header row with an email or user_id column')
+        return [
+            {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+            for row in reader
+        ]
+    except UnicodeDecodeError:
+        raise BookingRowError('CSV must be UTF-8 encoded')
+
+
+def _chunks(values, size=_LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _normalise(rows):
+    """Clean rows, dropping invalid ones and repeats of the same person"""
+    results, valid, seen = [], [], set()
+    for index, raw in enumerate(rows):
+        row = {field: str(raw.get(field) or '').strip() for field in ROW_FIELDS} if isinstance(raw, dict) else {}
+        row['email'] = row.get('email', '').lower()
+        result = {'row': index + 1, 'email': row.get('email', ''), 'user_id': row.get('user_id') or None}
+        results.append(result)
+
+        if row.get('user_id'):
+            if not row['user_id'].isdigit():
+                result.update(status='invalid', error='user_id must be a number')
+                continue
+            key = ('id', int(row['user_id']))
+        elif row.get('email'):
+            if not _EMAIL_RE.match(row['email']):
+                result.update(status='invalid', error='Invalid email address')
+                continue
+            key = ('email', row['email'])
+        else:
+            result.update(status='invalid', error='email or user_id is required')
+            continue
+
+        if key in seen:
+            result.update(status='duplicate', error='Repeated in this upload')
+            continue
+        seen.add(key)
+        valid.append((row, result))
+    return results, valid
+
+
+def _password_for(row, username):
+    # Same scheme as the single internal booking
+    if row['rollno']:
+        return f"{username}@{row['rollno']}"
+    return f"{row['first_name'].lower()}{row['last_name'].lower()}@{username}"
+
+
+def _hash_passwords(rows, usernames):
+    if not rows:
+        return []
+    # PBKDF2 releases the GIL, so hashing spreads over the worker threads
+    with ThreadPoolExecutor(max_workers=settings.BULK_BOOKING_HASH_WORKERS) as pool:
+        return list(pool.map(make_password, [_password_for(row, name) for row, name in zip(rows, usernames)]))
+
+
+def _prepare_users(rows):
+    """Pick usernames and hash passwords for new users; slow, so done before the transaction"""
+    usernames = unique_usernames([row['email'].split('@')[0] for row in rows])
+    return usernames, _hash_passwords(rows, usernames)
+
+
+def _create_users(rows, usernames, passwords):
+    """bulk_create users and their profiles, returning users in row order"""
+    # Usernames were picked outside the transaction: re-pick (and rehash) any taken since
+    taken = set()
+    for chunk in _chunks(usernames):
+        taken.update(User.objects.filter(username__in=chunk).values_list('username', flat=True))
+    if taken:
+        stale = [index for index, username in enumerate(usernames) if username in taken]
+        fresh = unique_usernames(
+            [rows[index]['email'].split('@')[0] for index in stale],
+            reserved=[username for username in usernames if username not in taken]
+        )
+        rehashed = _hash_passwords([rows[index] for index in stale], fresh)
+        usernames, passwords = list(usernames), list(passwords)
+        for index, username, password in zip(stale, fresh, rehashed):
+            usernames[index], passwords[index] = username, password
+
+    User.objects.bulk_create(
+        [
+            User(username=username, email=row['email'], first_name=row['first_name'],
+                 last_name=row['last_name'], password=password)
+            for row, username, password in zip(rows, usernames, passwords)
+        ],
+        batch_size=settings.BULK_BOOKING_CHUNK_SIZE
+    )
+    by_username = {}
+    for chunk in _chunks(usernames):
+        by_username.update((user.username, user) for user in User.objects.filter(username__in=chunk))
+    users = [by_username[username] for username in usernames]
+
+    UserProfile.objects.bulk_create(
+        [
+            UserProfile(user=user, is_verified=True, **{field: row[field] for field in PROFILE_FIELDS if row[field]})
+            for row, user in zip(rows, users)
+        ],
+        batch_size=settings.BULK_BOOKING_CHUNK_SIZE
+    )
+    return users
+
+
+def _resolve_users(valid):
+    """
+    Match rows to existing users with one IN query per kind of key.
+
+    Returns:
+        tuple: ([(user, result)] for existing users, rows for new users, their results)
+    """
+    user_ids = [int(row['user_id']) for row, _ in valid if row['user_id']]
+    emails = [row['email'] for row, _ in valid if not row['user_id']]
+    by_id, by_email = {}, {}
+    for chunk in _chunks(user_ids):
+        by_id.update((user.pk, user) for user in User.objects.filter(pk__in=chunk))
+    for chunk in _chunks(emails):
+        matches = User.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=chunk).order_by('pk')
+        for user in matches:
+            by_email.setdefault(user.email_lower, user)
+
+    booked_users, new_rows, new_results, seen = [], [], [], set()
+    for row, result in valid:
+        if row['user_id']:
+            user = by_id.get(int(row['user_id']))
+            if user is None:
+                result.update(status='not_found', error='User not found')
+                continue
+        else:
+            user = by_email.get(row['email'])
+            if user is None:
+                new_rows.append(row)
+                new_results.append(result)
+                continue
+        # The same person named once by email and once by user_id
+        if user.pk in seen:
+            result.update(status='duplicate', error='Repeated in this upload')
+            continue
+        seen.add(user.pk)
+        booked_users.append((user, result))
+    return booked_users, new_rows, new_results
+
+
+def new_od_hash(participant):
+    hash_string = f"{participant.user_id}{participant.event_id}{participant.pk}{timezone.now().timestamp()}"
+    return new_qr_value(participant.pk, participant.event_id, hash_string)
+
+
+def bulk_book(event, rows, send_email=True):
+    """
+    Book many people for an event with payment bypassed, like InternalBookingAPIView does for one.
+
+    Args:
+        event: Event instance
+        rows: Iterable of dicts with email or user_id, plus optional first_name,
+              last_name, rollno, department, degree, college_name, phone_number
+        send_email: Queue QR emails for the new OD entries
+
+    Returns:
+        dict: Counts per status ('booked', 'already_registered', 'event_full', 'not_found',
+              'invalid', 'duplicate'), 'users_created', 'emails_queued' and one result per row
+    """
+    results, valid = _normalise(rows)
+
+    # Lookups and password hashing (seconds for thousands of rows) happen before any row is locked
+    booked_users, new_rows, new_results = _resolve_users(valid)
+    usernames, passwords = _prepare_users(new_rows) if new_rows else ([], [])
+
+    with transaction.atomic():
+        new_users = _create_users(new_rows, usernames, passwords) if new_rows else []
+        for user, result in zip(new_users, new_results):
+            result['created'] = True
+        booked_users.extend(zip(new_users, new_results))
+
+        # Existing registrations: fully paid ones are left alone, unpaid ones are approved
+        existing = {}
+        for chunk in _chunks([user.pk for user, _ in booked_users]):
+            existing.update(
+                (participant.user_id, participant)
+                for participant in Participant.objects.filter(event=event, user_id__in=chunk)
+            )
+
+        approve, to_create, create_results = [], [], []
+        for user, result in booked_users:
+            result['user_id'] = user.pk
+            result['username'] = user.username
+            participant = existing.get(user.pk)
+            if participant is None:
+                to_create.append(user)
+                create_results.append(result)
+            elif participant.payment_status:
+                result.update(status='already_registered', participant_id=participant.pk)
+            else:
+                approve.append(participant)
+                result.update(status='booked', participant_id=participant.pk)
+
+        if approve:
+            Participant.objects.filter(pk__in=[participant.pk for participant in approve]).update(payment_status=True)
+            for participant in approve:
+                participant.payment_status = True
+
+        seats = event.reserve_seats(len(to_create)) if to_create else 0
+        for result in create_results[seats:]:
+            result.update(status='event_full', error='Event is full')
+
+        created = Participant.objects.bulk_create(
+            [
+                Participant(user=user, event=event, registration_status='confirmed', payment_status=True, answers=[])
+                for user in to_create[:seats]
+            ],
+            batch_size=settings.BULK_BOOKING_CHUNK_SIZE
+        )
+        if created and created[0].pk is None:
+            # Backends without RETURNING: read the new rows back
+            created_ids = dict(
+                Participant.objects.filter(event=event, user_id__in=[user.pk for user in to_create[:seats]])
+                .values_list('user_id', 'pk')
+            )
+            for participant in created:
+                participant.pk = created_ids[participant.user_id]
+        for participant, result in zip(created, create_results):
+            result.update(status='booked', participant_id=participant.pk)
+
+        # OD entries for everyone who can now attend and does not have one yet
+        eligible = [participant for participant in approve + created if participant.registration_status == 'confirmed']
+        has_od = set()
+        for chunk in _chunks([participant.pk for participant in approve]):
+            has_od.update(ODList.objects.filter(participant_id__in=chunk).values_list('participant_id', flat=True))
+        od_lists = ODList.objects.bulk_create(
+            [
+                ODList(participant_id=participant.pk, event=event, hash=new_od_hash(participant))
+                for participant in eligible if participant.pk not in has_od
+            ],
+            batch_size=settings.BULK_BOOKING_CHUNK_SIZE
+        )
+
+        emails_queued = 0
+        if send_email and od_lists:
+            od_list_ids = [od_list.pk for od_list in od_lists]
+            if od_list_ids[0] is None:
+                od_list_ids = []
+                for chunk in _chunks([od_list.hash for od_list in od_lists]):
+                    od_list_ids.extend(ODList.objects.filter(hash__in=chunk).values_list('pk', flat=True))
+            EmailOutbox.objects.bulk_create(
+                [
+                    EmailOutbox(od_list_id=od_list_id, email_type='registration_qr',
+                                max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS)
+                    for od_list_id in od_list_ids
+                ],
+                batch_size=settings.BULK_BOOKING_CHUNK_SIZE
+            )
+            emails_queued = len(od_list_ids)
+
+        # bulk_create and update() skip the signals that maintain these
+        if created:
+            UserScheduleSlot.sync_event(event)
+        if created or approve or od_lists:
+            EventStats.refresh([event.pk])
+        invalidate_event(event.pk)
+
+    counts = dict.fromkeys(
+        ('booked', 'already_registered', 'event_full', 'not_found', 'invalid', 'duplicate'), 0
+    )
+    for result in results:
+        counts[result['status']] += 1
+    return {
+        **counts,
+        'users_created': len(new_users),
+        'emails_queued': emails_queued,
+        'results': results,
+    }
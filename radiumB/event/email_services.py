@@ -1,29 +1,36 @@
-import qrcode
+import logging
+import random
+import time
+from datetime import timedelta
 from io import BytesIO
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import ODList, Participant
+from .models import ODList, Participant, EmailOutbox, EventStats
+from .qr_cache import get_qr_png
 from email.mime.image import MIMEImage
 
+logger = logging.getLogger(__name__)
+
 def generate_qr_code(hash_value):
-    """Generate QR code image for the hash"""
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(hash_value)
-    qr.make(fit=True)
-    img = qr.make_image(fill='black', back_color='white')
+    """Return the QR code PNG for the hash, rendered once and served from the QR cache"""
+    return BytesIO(get_qr_png(hash_value))
 
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-    return buffer
+def build_registration_email(od_list, connection=None):
+    """
+    Build the registration email with hosted logo (URL) and inline QR code (MIMEImage) for offline events only.
 
-def send_registration_email(od_list):
-    """Send email with hosted logo (URL) and inline QR code (MIMEImage) for offline events only."""
-    if not isinstance(od_list, ODList):
-        return False
+    Args:
+        od_list: ODList instance
+        connection: Optional email backend connection to bind the message to
 
+    Returns:
+        EmailMultiAlternatives: Ready-to-send message
+    """
     participant = od_list.participant
     user = participant.user
     event = participant.event
@@ -52,7 +59,6 @@ def send_registration_email(od_list):
     }
 
     # 4) Render HTML
-    print(f"User: {user}, First name: {user.first_name}, Last name: {user.last_name}")
     html_message = render_to_string('event/registration_email.html', context)
 
     # 5) Email setup
@@ -60,7 +66,7 @@ def send_registration_email(od_list):
     from_email = settings.DEFAULT_FROM_EMAIL
     to = [user.email]
 
-    email = EmailMultiAlternatives(subject=subject, body=html_message, from_email=from_email, to=to)
+    email = EmailMultiAlternatives(subject=subject, body=html_message, from_email=from_email, to=to, connection=connection)
     email.attach_alternative(html_message, "text/html")
 
     # 6) Attach QR as inline MIME image (only for offline events)
@@ -70,30 +76,98 @@ def send_registration_email(od_list):
             qr_img.add_header('Content-ID', '<qr_code>')
             qr_img.add_header('Content-Disposition', 'inline', filename='qr.png')
             email.attach(qr_img)
-        except Exception as e:
-            print("Failed to attach QR image:", e)
+        except Exception:
+            logger.warning("Failed to attach QR image for OD entry %s", od_list.pk, exc_info=True)
+
+    return email
+
+def send_registration_email(od_list):
+    """Send the registration email for a single ODList over its own connection."""
+    if not isinstance(od_list, ODList):
+        return False
+
+    email = build_registration_email(od_list)
 
     # 7) Send email
     try:
-        print(f"User: {user}, First name: {user.first_name}, Last name: {user.last_name}")
-        print(f"Sending email to: {user.email}")
-        print(f"Email subject: {subject}")
-        print(f"Email backend: {settings.EMAIL_BACKEND}")
-        print(f"Email host: {settings.EMAIL_HOST}")
-        print(f"Email port: {settings.EMAIL_PORT}")
-        print(f"Email use TLS: {settings.EMAIL_USE_TLS}")
-        print(f"Email host user: {settings.EMAIL_HOST_USER}")
-        print(f"Default from email: {settings.DEFAULT_FROM_EMAIL}")
-
-        result = email.send()
-        print(f"Email send result: {result}")
+        email.send()
+        logger.debug("Registration email for OD entry %s sent", od_list.pk)
         return True
-    except Exception as e:
-        print("Email send failed:", e)
-        import traceback
-        print("Full traceback:", traceback.format_exc())
+    except Exception:
+        logger.exception("Registration email for OD entry %s failed", od_list.pk)
         return False
 
+def send_registration_emails_bulk(od_lists, batch_size=None, mark_sent=True):
+    """
+    Send registration emails reusing one authenticated connection per batch.
+
+    The connection is opened once per batch and every message goes through
+    send_messages on it, so a batch costs a single SMTP/TLS handshake and login.
+    The connection is closed and reopened between batches to stay within the
+    provider's per-session limits. Works with any EMAIL_BACKEND (smtp, locmem, file).
+
+    Args:
+        od_lists: Iterable of ODList instances (participant, user and event should be preloaded)
+        batch_size: Messages per connection (default: EMAIL_BULK_BATCH_SIZE)
+        mark_sent: If True, set qr_sent on delivered ODList rows
+
+    Returns:
+        dict: {'sent': int, 'failed': int, 'batches': int, 'elapsed': float,
+               'rate': float, 'sent_ids': list, 'failed_ids': list, 'errors': dict}
+    """
+    batch_size = batch_size or settings.EMAIL_BULK_BATCH_SIZE
+    od_lists = list(od_lists)
+    report = {'sent': 0, 'failed': 0, 'batches': 0, 'elapsed': 0.0, 'rate': 0.0,
+              'sent_ids': [], 'failed_ids': [], 'errors': {}}
+    started = time.monotonic()
+    connection = get_connection()
+
+    for offset in range(0, len(od_lists), batch_size):
+        batch = od_lists[offset:offset + batch_size]
+        report['batches'] += 1
+
+        try:
+            connection.open()
+        except Exception as e:
+            for od_list in batch:
+                report['failed_ids'].append(od_list.id)
+                report['errors'][od_list.id] = f'Connection failed: {str(e)}'
+            continue
+
+        try:
+            for od_list in batch:
+                try:
+                    message = build_registration_email(od_list, connection=connection)
+                    if connection.send_messages([message]):
+                        report['sent_ids'].append(od_list.id)
+                    else:
+                        report['failed_ids'].append(od_list.id)
+                        report['errors'][od_list.id] = 'Email backend reported a failure'
+                except Exception as e:
+                    report['failed_ids'].append(od_list.id)
+                    report['errors'][od_list.id] = str(e)
+        finally:
+            connection.close()
+
+    if mark_sent and report['sent_ids']:
+        sent = ODList.objects.filter(id__in=report['sent_ids'])
+        sent.update(qr_sent=True)
+        # Queryset updates skip the stats signals
+        EventStats.refresh(sent.values_list('event_id', flat=True).distinct())
+
+    report['sent'] = len(report['sent_ids'])
+    report['failed'] = len(report['failed_ids'])
+    report['elapsed'] = time.monotonic() - started
+    report['rate'] = report['sent'] / report['elapsed'] if report['elapsed'] > 0 else 0.0
+    return report
+
+def format_bulk_email_report(report):
+    """Human readable throughput summary for a bulk send report"""
+    return (
+        f"{report['sent']} sent, {report['failed']} failed in {report['batches']} batch(es), "
+        f"{report['elapsed']:.1f}s ({report['rate']:.1f} emails/sec)"
+    )
+
 
 def send_qr_email_to_participant(participant, force=False):
     """
@@ -148,6 +222,127 @@ def send_qr_email_to_participant(participant, force=False):
             'od_list': None
         }
 
+def enqueue_qr_email(od_list, force=False):
+    """
+    Queue a registration QR email for delivery by the outbox worker.
+
+    Args:
+        od_list: ODList instance
+        force: If True, queue even if the QR email was already sent
+
+    Returns:
+        EmailOutbox or None: The queued entry, or None if nothing was queued
+    """
+    if not force and od_list.qr_sent:
+        return None
+
+    existing = EmailOutbox.objects.filter(
+        od_list=od_list,
+        email_type='registration_qr',
+        status__in=['pending', 'sending']
+    ).first()
+    if existing:
+        return existing
+
+    return EmailOutbox.objects.create(
+        od_list=od_list,
+        email_type='registration_qr',
+        max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS
+    )
+
+def get_outbox_retry_delay(attempts):
+    """Exponential backoff with jitter for the given number of failed attempts"""
+    base = settings.EMAIL_OUTBOX_BACKOFF_SECONDS
+    delay = min(base * (2 ** max(attempts - 1, 0)), settings.EMAIL_OUTBOX_MAX_BACKOFF_SECONDS)
+    return timedelta(seconds=delay + random.uniform(0, base))
+
+def claim_outbox_batch(batch_size):
+    """
+    Claim a batch of due outbox entries for this worker.
+
+    Entries stuck in 'sending' longer than EMAIL_OUTBOX_LEASE_SECONDS (crashed worker)
+    are reclaimed. Rows are locked with SKIP LOCKED where the database supports it so
+    several workers can drain the queue side by side.
+
+    Returns:
+        list: Claimed EmailOutbox instances with od_list, participant, user and event loaded
+    """
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS)
+
+    with transaction.atomic():
+        due_ids = list(
+            EmailOutbox.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', next_attempt_at__lte=now) |
+                Q(status='sending', locked_at__lt=lease_expired)
+            )
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not due_ids:
+            return []
+        EmailOutbox.objects.filter(id__in=due_ids).update(status='sending', locked_at=now, updated_at=now)
+
+    return list(
+        EmailOutbox.objects
+        .filter(id__in=due_ids)
+        .select_related('od_list', 'od_list__participant', 'od_list__participant__user', 'od_list__participant__event')
+        .order_by('next_attempt_at')
+    )
+
+def record_outbox_result(entry, success, error=''):
+    """Write the outcome of a delivery attempt back to the outbox entry and its ODList"""
+    now = timezone.now()
+    entry.attempts += 1
+    entry.locked_at = None
+
+    if success:
+        entry.status = 'sent'
+        entry.sent_at = now
+        entry.last_error = ''
+        if ODList.objects.filter(pk=entry.od_list_id, qr_sent=False).update(qr_sent=True):
+            EventStats.apply_delta(entry.od_list.event_id, qr_sent=1)
+    elif entry.attempts >= entry.max_attempts:
+        entry.status = 'failed'
+        entry.last_error = error or 'Email send failed'
+    else:
+        entry.status = 'pending'
+        entry.next_attempt_at = now + get_outbox_retry_delay(entry.attempts)
+        entry.last_error = error or 'Email send failed'
+
+    entry.save(update_fields=['status', 'attempts', 'locked_at', 'sent_at', 'next_attempt_at', 'last_error', 'updated_at'])
+
+def process_email_outbox(batch_size=None):
+    """
+    Deliver one batch of due outbox emails.
+
+    Returns:
+        dict: {'claimed': int, 'sent': int, 'retrying': int, 'failed': int}
+    """
+    batch_size = batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE
+    entries = claim_outbox_batch(batch_size)
+    stats = {'claimed': len(entries), 'sent': 0, 'retrying': 0, 'failed': 0}
+
+    if not entries:
+        return stats
+
+    report = send_registration_emails_bulk([entry.od_list for entry in entries], batch_size=batch_size, mark_sent=False)
+    sent_ids = set(report['sent_ids'])
+
+    for entry in entries:
+        success = entry.od_list_id in sent_ids
+        record_outbox_result(entry, success, report['errors'].get(entry.od_list_id, ''))
+        if entry.status == 'sent':
+            stats['sent'] += 1
+        elif entry.status == 'failed':
+            stats['failed'] += 1
+        else:
+            stats['retrying'] += 1
+
+    return stats
+
 def create_participant_with_od(user, event, send_email=True, answers=None, payment_status=True):
     """
     Centralized participant creation with OD handling.
@@ -155,28 +350,30 @@ def create_participant_with_od(user, event, send_email=True, answers=None, payme
     Args:
         user: User instance
         event: Event instance
-        send_email: Whether to send QR email immediately
+        send_email: Whether to queue the QR email for the outbox worker
         answers: List of answer dictionaries (optional)
         payment_status: Initial payment status (default True for free events)
 
     Returns:
         dict: {'success': bool, 'participant': Participant or None, 'od_list': ODList or None, 'message': str}
+        Failed results for a full event or a duplicate registration also carry
+        'reason': 'event_full' or 'already_registered'.
     """
     try:
-        print(f"[PARTICIPANT_DEBUG] Creating participant for user: {user.username}, event: {event.event_name}")
+        logger.debug('Registering user %s for event %s', user.pk, event.pk)
         existing_participant = Participant.objects.filter(user=user, event=event).first()
         if existing_participant:
-            print(f"[PARTICIPANT_DEBUG] Found existing participant: {existing_participant.id}")
             if existing_participant.payment_status:
-                print(f"[PARTICIPANT_DEBUG] User already fully registered")
+                logger.debug('User %s already registered for event %s', user.pk, event.pk)
                 return {
                     'success': False,
                     'participant': existing_participant,
                     'od_list': None,
-                    'message': 'User already fully registered'
+                    'message': 'User already fully registered',
+                    'reason': 'already_registered'
                 }
             else:
-                print(f"[PARTICIPANT_DEBUG] Updating payment status for existing participant")
+                logger.debug('Approving payment for existing participant %s', existing_participant.pk)
                 existing_participant.payment_status = True
                 if answers:
                     existing_participant.answers = answers
@@ -184,32 +381,48 @@ def create_participant_with_od(user, event, send_email=True, answers=None, payme
                 participant = existing_participant
                 message = 'Payment approved for existing registration'
         else:
-            print(f"[PARTICIPANT_DEBUG] Creating new participant")
-            participant = Participant.objects.create(
+            participant = Participant(
                 user=user,
                 event=event,
                 registration_status='confirmed',
                 payment_status=payment_status,
                 answers=answers or []
             )
-            print(f"[PARTICIPANT_DEBUG] New participant created with ID: {participant.id}, payment_status: {payment_status}")
+            try:
+                # Reserve the seat and insert the participant together; a failed
+                # insert rolls the reservation back
+                with transaction.atomic():
+                    if not event.reserve_seat():
+                        logger.info('Event %s is full, user %s not registered', event.pk, user.pk)
+                        return {
+                            'success': False,
+                            'participant': None,
+                            'od_list': None,
+                            'message': 'Event is full',
+                            'reason': 'event_full'
+                        }
+                    participant._seat_reserved = True
+                    participant.save()
+            except IntegrityError:
+                event.confirmed_count -= 1
+                logger.info('Concurrent duplicate registration of user %s for event %s rejected', user.pk, event.pk)
+                return {
+                    'success': False,
+                    'participant': Participant.objects.filter(user=user, event=event).first(),
+                    'od_list': None,
+                    'message': 'User already registered',
+                    'reason': 'already_registered'
+                }
+            logger.debug('Created participant %s (payment_status=%s)', participant.pk, payment_status)
             message = 'Participant created successfully'
 
-        print(f"[PARTICIPANT_DEBUG] Participant can_attend: {participant.can_attend}")
         if participant.can_attend:
-            print(f"[PARTICIPANT_DEBUG] Creating OD list entry")
             od_list = ODList.objects.create(participant=participant, event=participant.event)
-            print(f"[PARTICIPANT_DEBUG] OD list created with ID: {od_list.id}, hash: {od_list.hash}")
+            logger.debug('Created OD entry %s for participant %s', od_list.pk, participant.pk)
 
             if send_email:
-                print(f"[PARTICIPANT_DEBUG] Sending QR email")
-                email_result = send_qr_email_to_participant(participant, force=False)
-                if email_result['success']:
-                    message += ' and QR email sent'
-                    print(f"[PARTICIPANT_DEBUG] QR email sent successfully")
-                else:
-                    message += f' but email failed: {email_result["message"]}'
-                    print(f"[PARTICIPANT_DEBUG] QR email failed: {email_result['message']}")
+                enqueue_qr_email(od_list)
+                message += ' and QR email queued'
 
             return {
                 'success': True,
@@ -218,7 +431,7 @@ def create_participant_with_od(user, event, send_email=True, answers=None, payme
                 'message': message
             }
         else:
-            print(f"[PARTICIPANT_DEBUG] Participant cannot attend yet - OD not created")
+            logger.debug('Participant %s cannot attend yet, OD entry not created', participant.pk)
             return {
                 'success': True,
                 'participant': participant,
@@ -227,9 +440,7 @@ def create_participant_with_od(user, event, send_email=True, answers=None, payme
             }
 
     except Exception as e:
-        print(f"[PARTICIPANT_DEBUG] Error creating participant: {str(e)}")
-        import traceback
-        print(f"[PARTICIPANT_DEBUG] Full traceback: {traceback.format_exc()}")
+        logger.exception('Registering user %s for event %s failed', user.pk, event.pk)
         return {
             'success': False,
             'participant': None,
@@ -314,7 +525,7 @@ def extract_user_info(user):
         'phone': profile.phone_number if profile else 'Unknown'
     }
 
-def format_csv_row(participant, event, idx):
+def format_csv_row(participant, event, idx, attended=None):
     """
     Format participant data for CSV row.
 
@@ -322,6 +533,7 @@ def format_csv_row(participant, event, idx):
         participant: Participant instance
         event: Event instance
         idx: Row index
+        attended: Attendance flag if already known (avoids a per-row ODList lookup)
 
     Returns:
         list: CSV row data
@@ -329,12 +541,14 @@ def format_csv_row(participant, event, idx):
     user_info = extract_user_info(participant.user)
 
     reg_date = participant.registered_at.strftime('%Y-%m-%d %H:%M') if hasattr(participant, 'registered_at') and participant.registered_at else 'Unknown'
-    # Check attendance using prefetched related manager if present, otherwise query
-    try:
-        od_entry = participant.registered_participants.first()
-    except Exception:
-        od_entry = ODList.objects.filter(participant=participant).first()
-    attendance_status = 'Present' if od_entry and od_entry.attendance else 'Absent'
+    if attended is None:
+        # Check attendance using prefetched related manager if present, otherwise query
+        try:
+            od_entry = participant.registered_participants.first()
+        except Exception:
+            od_entry = ODList.objects.filter(participant=participant).first()
+        attended = bool(od_entry and od_entry.attendance)
+    attendance_status = 'Present' if attended else 'Absent'
     payment_status = 'Paid' if participant.payment_status else 'Unpaid' if event.payment_type == 'paid' else 'Unknown'
     team_name = 'Unknown'  # team_name field doesn't exist on Participant model
     special_reqs = 'Unknown'  # special_requirements field doesn't exist on Participant model
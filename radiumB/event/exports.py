@@ -0,0 +1,172 @@
+"""
+Streaming CSV exports for event reports
+
+Rows are produced by generators and written through a pseudo-buffer, so a
+report streams to the client as it is built. Aggregate sections come from the
+GROUP BY queries in analytics.py and the participant lists are read with
+.iterator(), keeping memory flat regardless of participant count.
+"""
+import csv
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .analytics import attendance_breakdown, attendance_summary, event_participants
+from .email_services import format_csv_row
+from .models import EventStats, ODList
+
+
+class Echo:
+    """File-like object whose write() hands the formatted CSV line straight back"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv_response(rows, filename):
+    """
+    Build a StreamingHttpResponse that writes rows as they are generated.
+
+    Args:
+        rows: Iterable of CSV rows (lists)
+        filename: Download filename
+
+    Returns:
+        StreamingHttpResponse: text/csv attachment
+    """
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def _attendance_section_rows(title, underline, label, groups):
+    yield [title]
+    yield ['-' * underline]
+    yield [label, 'Registered', 'Present', 'Absent', 'Attendance %']
+    for group in groups:
+        yield [group['label'], group['registered'], group['present'], group['absent'], f"{group['attendance_rate']:.1f}%"]
+    yield []
+
+
+def event_analysis_rows(event, participants=None):
+    """
+    Rows of the event analysis report.
+
+    Args:
+        event: Event instance
+        participants: Participant queryset to report on (default: all of the event's participants)
+
+    Yields:
+        list: CSV rows
+    """
+    if participants is None:
+        participants = event_participants(event)
+        summary = EventStats.for_event(event).summary()
+    else:
+        summary = attendance_summary(participants)
+
+    # SECTION 1: Event Summary
+    yield ['=' * 80]
+    yield [f'EVENT ANALYSIS REPORT: {event.event_name}']
+    yield ['=' * 80]
+    yield ['Generated on:', timezone.now().strftime('%Y-%m-%d %H:%M:%S')]
+    yield ['Event Date:', event.event_date.strftime('%Y-%m-%d %H:%M:%S')]
+    yield ['Event Type:', event.get_event_type_display()]
+    yield ['Payment Type:', event.get_payment_type_display()]
+    yield ['Participation Type:', event.get_participation_type_display()]
+    yield []
+
+    total_registered = summary['registered']
+
+    yield ['📊 EVENT SUMMARY']
+    yield ['-' * 40]
+    yield ['Total Registrations:', total_registered]
+    yield ['Total Present:', summary['present']]
+    yield ['Total Absent:', summary['absent']]
+    yield ['Attendance Rate:', f"{summary['attendance_rate']:.2f}%"]
+    yield []
+
+    # SECTION 2: Department-wise Analysis
+    yield from _attendance_section_rows(
+        '🏛️ DEPARTMENT-WISE ANALYSIS', 50, 'Department', attendance_breakdown(participants, 'department')
+    )
+
+    # SECTION 3: Year-wise Analysis
+    yield from _attendance_section_rows(
+        '📅 YEAR-WISE ANALYSIS', 40, 'Year', attendance_breakdown(participants, 'year')
+    )
+
+    # SECTION 4: College-wise Analysis
+    yield from _attendance_section_rows(
+        '🏫 COLLEGE-WISE ANALYSIS', 40, 'College', attendance_breakdown(participants, 'college')
+    )
+
+    # SECTION 5: Payment Analysis (if applicable)
+    if event.payment_type == 'paid':
+        yield ['💳 PAYMENT ANALYSIS']
+        yield ['-' * 30]
+        yield ['Total Paid:', summary['paid']]
+        yield ['Total Unpaid:', summary['unpaid']]
+        yield ['Payment Rate:', f"{summary['payment_rate']:.2f}%"]
+        yield []
+
+    # SECTION 6: Complete Participants List
+    yield ['👥 COMPLETE PARTICIPANTS LIST']
+    yield ['=' * 80]
+    yield [
+        'S.No', 'Name', 'Email', 'Roll No', 'Degree', 'Year', 'Department',
+        'College', 'Phone', 'Registration Date', 'Attendance Status',
+        'Payment Status', 'Team Name', 'Special Requirements'
+    ]
+
+    attended = ODList.objects.filter(participant=OuterRef('pk'), attendance=True)
+    rows = (
+        participants.select_related('user', 'user__profile')
+        .annotate(attended=Exists(attended))
+        .order_by('user__first_name', 'pk')
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+    for idx, participant in enumerate(rows, 1):
+        yield format_csv_row(participant, event, idx, attended=participant.attended)
+
+
+def od_list_rows(event, od_list_entries):
+    """
+    Rows of the OD list report.
+
+    Args:
+        event: Event instance
+        od_list_entries: ODList queryset, in output order
+
+    Yields:
+        list: CSV rows
+    """
+    yield [f'{event.event_name} - OD list']
+    yield []
+    yield [
+        'Username',
+        'User Email',
+        'Roll Number',
+        'Degree',
+        'Year',
+        'Department',
+        'College Name',
+        'Attended'
+    ]
+
+    for od_entry in od_list_entries.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        participant = od_entry.participant
+        profile = getattr(participant.user, 'profile', None)
+        yield [
+            participant.user.username,
+            participant.user.email,
+            profile.rollno if profile else 'Unknown',
+            profile.degree if profile and profile.degree else 'Unknown',
+            profile.year if profile and profile.year else 'Unknown',
+            profile.department if profile and profile.department else 'Unknown',
+            profile.college_name if profile else 'Unknown',
+            'Yes' if od_entry.attendance else 'No'
+        ]
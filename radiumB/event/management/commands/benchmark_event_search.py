@@ -0,0 +1,128 @@
+"""
+Management command to compare indexed event search against the old icontains scan
+
+Builds a synthetic corpus inside a transaction, times both approaches for a
+set of queries and rolls everything back at the end.
+"""
+import random
+import statistics
+import time
+from datetime import timedelta, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from event.models import Event, EventCategory
+from event.search import rebuild_search_index, search_backend, search_events
+
+WORDS = [
+    'robotics', 'workshop', 'machine', 'learning', 'hackathon', 'design', 'cloud', 'security',
+    'quiz', 'coding', 'python', 'startup', 'finance', 'marketing', 'drone', 'circuit', 'biotech',
+    'photography', 'dance', 'music', 'debate', 'gaming', 'blockchain', 'analytics', 'vision',
+    'embedded', 'network', 'green', 'energy', 'aero', 'automobile', 'civil', 'bridge', 'treasure',
+]
+# Long tail of rarer words so most queries match a realistic fraction of the corpus
+RARE_WORDS = [f'{prefix}{suffix}' for prefix in ('neo', 'astro', 'quant', 'hydro', 'micro', 'meta')
+              for suffix in ('tron', 'lab', 'verse', 'sync', 'forge', 'wave', 'craft', 'grid', 'core', 'link')]
+QUERIES = ['rob', 'machine learn', 'hackathon', 'cloud sec', 'astrol', 'quantforge', 'neo micro', 'zzzz']
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark event search over a synthetic corpus (all data is rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--events',
+            type=int,
+            default=100000,
+            help='Number of synthetic events (default: 100000)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Timed runs per query (default: 5)',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=20,
+            help='Rows fetched per query, like one page of results (default: 20)',
+        )
+
+    def handle(self, *args, **options):
+        if options['events'] < 1:
+            raise CommandError('--events must be positive.')
+
+        try:
+            with transaction.atomic():
+                self._run(options)
+                raise _Rollback()
+        except _Rollback:
+            self.stdout.write('Synthetic corpus rolled back')
+
+    def _run(self, options):
+        rng = random.Random(42)
+        category = EventCategory.objects.first() or EventCategory.objects.create(
+            code='benchmark', display_name='Benchmark'
+        )
+        now = timezone.now()
+
+        self.stdout.write(f'Creating {options["events"]} synthetic events...')
+        start = time.perf_counter()
+        batch = []
+        for i in range(options['events']):
+            name_words = [rng.choice(WORDS), rng.choice(RARE_WORDS)]
+            description_words = rng.sample(WORDS, 2) + rng.sample(RARE_WORDS, 4)
+            batch.append(Event(
+                event_name=' '.join(name_words).title(),
+                description=' '.join(description_words),
+                event_date=now + timedelta(days=rng.randint(1, 365)),
+                start_time=dt_time(10, 0),
+                end_time=dt_time(12, 0),
+                event_type=category,
+                payment_type=rng.choice(['free', 'paid']),
+            ))
+            if len(batch) == 5000:
+                Event.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Event.objects.bulk_create(batch)
+        self.stdout.write(f'  created in {time.perf_counter() - start:.1f}s')
+
+        start = time.perf_counter()
+        rebuild_search_index()
+        self.stdout.write(f'  indexed ({search_backend()}) in {time.perf_counter() - start:.1f}s')
+
+        page_size = options['page_size']
+        self.stdout.write(f'\n{"query":<16}{"matches":>9}{"icontains ms":>15}{"indexed ms":>13}{"speedup":>10}')
+        for query in QUERIES:
+            condition = Q()
+            for term in query.split():
+                condition &= Q(event_name__icontains=term) | Q(description__icontains=term)
+            scan = Event.objects.filter(condition).order_by('-event_date')
+            indexed = search_events(query)
+
+            scan_ms = self._time(lambda: (scan.count(), list(scan[:page_size])), options['repeat'])
+            indexed_ms = self._time(lambda: (indexed.count(), list(indexed[:page_size])), options['repeat'])
+            speedup = scan_ms / indexed_ms if indexed_ms else 0
+            self.stdout.write(
+                f'{query:<16}{indexed.count():>9}{scan_ms:>15.1f}{indexed_ms:>13.1f}{speedup:>9.1f}x'
+            )
+
+        self.stdout.write(self.style.SUCCESS('\n✓ Benchmark complete'))
+
+    @staticmethod
+    def _time(func, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
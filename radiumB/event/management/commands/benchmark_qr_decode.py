@@ -0,0 +1,158 @@
+"""
+Management command to measure headless QR decoding throughput
+
+Decodes a folder of QR images (or a synthetic set it generates: phone-sized
+JPEGs with the code scaled, rotated and noised) through event.qr_decoder,
+once in-process and once per requested pool size, and reports frames per
+second and how many images yielded a value. The folder is used as-is when
+--folder is given; generated images are removed afterwards unless --keep.
+"""
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import cv2
+import numpy as np
+import qrcode
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from event.qr_decoder import create_pool, decode_uploads
+from event.qr_tokens import issue_token
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp')
+
+
+class Command(BaseCommand):
+    help = 'Decode a folder of QR images in-process and in a process pool and report frames/sec'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--folder',
+            type=str,
+            help='Folder of QR images to decode (default: generate a synthetic set)',
+        )
+        parser.add_argument(
+            '--images',
+            type=int,
+            default=200,
+            help='Synthetic images to generate when no --folder is given (default: 200)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=str,
+            default='2,4',
+            help='Comma-separated pool sizes to compare against in-process decoding (default: 2,4)',
+        )
+        parser.add_argument(
+            '--max-side',
+            type=int,
+            default=settings.QR_DECODE_MAX_SIDE,
+            help=f'Downscale frames to this long side before decoding (default: {settings.QR_DECODE_MAX_SIDE})',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=7,
+            help='Random seed for the synthetic images (default: 7)',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the generated images and print their folder',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            pool_sizes = [int(size) for size in options['workers'].split(',') if size.strip()]
+        except ValueError:
+            raise CommandError('--workers must be a comma-separated list of integers.')
+
+        folder = options['folder']
+        generated = folder is None
+        if generated:
+            folder = tempfile.mkdtemp(prefix='qr_decode_bench_')
+            started = time.perf_counter()
+            self._generate(folder, options['images'], options['seed'])
+            self.stdout.write(f'Generated {options["images"]} images in {time.perf_counter() - started:.2f}s')
+        elif not os.path.isdir(folder):
+            raise CommandError(f'Folder not found: {folder}')
+
+        try:
+            uploads = self._load(folder)
+            if not uploads:
+                raise CommandError(f'No images found in {folder}')
+            self.stdout.write(f'{len(uploads)} images, {sum(len(data) for _, data, _ in uploads) / 1e6:.1f} MB')
+
+            options_kwargs = {
+                'max_side': options['max_side'],
+                'duplicate_threshold': settings.QR_DECODE_DUPLICATE_THRESHOLD,
+                'max_frames': settings.QR_DECODE_MAX_FRAMES,
+            }
+            runs = [('in-process', 0)] + [(f'{size} workers', size) for size in pool_sizes if size > 0]
+            best = 0.0
+            for label, workers in runs:
+                rate = self._run(label, uploads, workers, options_kwargs)
+                best = max(best, rate)
+
+            self.stdout.write(self.style.SUCCESS(f'✓ Best throughput {best:.1f} frames/sec'))
+        finally:
+            if generated and not options['keep']:
+                shutil.rmtree(folder, ignore_errors=True)
+            elif generated:
+                self.stdout.write(f'Kept generated images in {folder}')
+
+    def _generate(self, folder, count, seed):
+        rng = random.Random(seed)
+        for index in range(count):
+            qr = qrcode.QRCode(box_size=1, border=4)
+            qr.add_data(issue_token(index + 1, 1))
+            qr.make(fit=True)
+            code = (np.array(qr.get_matrix(), dtype=np.uint8) ^ 1) * 255
+
+            # Phone photo: 1600x1200 grey background, code at 350-700 px, rotated up to 25 degrees, sensor noise
+            side = rng.randint(350, 700)
+            code = cv2.resize(code, (side, side), interpolation=cv2.INTER_NEAREST)
+            photo = np.full((1200, 1600), rng.randint(150, 220), dtype=np.uint8)
+            top, left = rng.randint(0, 1200 - side), rng.randint(0, 1600 - side)
+            photo[top:top + side, left:left + side] = code
+            matrix = cv2.getRotationMatrix2D((left + side / 2, top + side / 2), rng.uniform(-25, 25), 1.0)
+            photo = cv2.warpAffine(photo, matrix, (1600, 1200), borderValue=int(photo[0, 0]))
+            noise = np.random.default_rng(seed + index).normal(0, 8, photo.shape)
+            photo = np.clip(photo + noise, 0, 255).astype(np.uint8)
+            photo = cv2.cvtColor(photo, cv2.COLOR_GRAY2BGR)
+
+            cv2.imwrite(os.path.join(folder, f'qr_{index:05d}.jpg'), photo, [cv2.IMWRITE_JPEG_QUALITY, 85])
+
+    def _load(self, folder):
+        uploads = []
+        for name in sorted(os.listdir(folder)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                with open(os.path.join(folder, name), 'rb') as f:
+                    uploads.append((name, f.read(), ''))
+        return uploads
+
+    def _run(self, label, uploads, workers, options_kwargs):
+        pool = create_pool(workers) if workers else None
+        try:
+            if pool is not None:
+                # Start the workers (and their OpenCV import) before timing
+                decode_uploads(uploads[:workers], pool=pool, **options_kwargs)
+            started = time.perf_counter()
+            results = decode_uploads(uploads, pool=pool, **options_kwargs)
+            elapsed = time.perf_counter() - started
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        frames = sum(result['frames'] for result in results)
+        decoded = sum(1 for result in results if result['values'])
+        errors = sum(1 for result in results if result['error'])
+        rate = frames / elapsed if elapsed > 0 else 0.0
+        self.stdout.write(
+            f'{label}: {frames} frames in {elapsed:.2f}s ({rate:.1f} frames/sec), '
+            f'{decoded}/{len(results)} decoded, {errors} unreadable'
+        )
+        return rate
@@ -0,0 +1,151 @@
+"""
+Management command to check capacity enforcement under a registration rush
+
+Creates a throwaway event with a small capacity, fires N registrations at
+EventRegistrationAPIView from parallel threads and asserts exactly
+max_participants of them succeed. Everything it creates is removed again
+unless --keep is given.
+"""
+import threading
+import time
+from collections import Counter
+from datetime import timedelta, time as dt_time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from event.models import Event, EventCategory, Participant
+from event.views import EventRegistrationAPIView
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Fire parallel registrations at a capped event and verify no overbooking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--registrations',
+            type=int,
+            default=50,
+            help='Number of parallel registration attempts (default: 50)',
+        )
+        parser.add_argument(
+            '--capacity',
+            type=int,
+            default=10,
+            help='max_participants for the benchmark event (default: 10)',
+        )
+        parser.add_argument(
+            '--duplicates',
+            type=int,
+            default=0,
+            help='Extra attempts that re-register users already in the rush (default: 0)',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark event and users instead of deleting them',
+        )
+
+    def handle(self, *args, **options):
+        registrations = options['registrations']
+        capacity = options['capacity']
+        if registrations < 1 or capacity < 1:
+            raise CommandError('--registrations and --capacity must be positive.')
+
+        event, users = self._create_fixtures(registrations, capacity)
+        attempts = users + users[:options['duplicates']]
+        self.stdout.write(
+            f'Firing {len(attempts)} registrations at "{event.event_name}" (capacity {capacity}) '
+            f'on {connection.vendor}...'
+        )
+
+        try:
+            results, elapsed = self._run(event, attempts)
+
+            event.refresh_from_db()
+            confirmed = Participant.objects.filter(event=event, registration_status='confirmed').count()
+            codes = Counter(code for code, _ in results)
+            errors = Counter(error for code, error in results if code != 201)
+
+            self.stdout.write(f'Finished in {elapsed:.2f}s')
+            for code, count in sorted(codes.items()):
+                self.stdout.write(f'  HTTP {code}: {count}')
+            for error, count in errors.most_common():
+                self.stdout.write(f'    {count} x {error}')
+            self.stdout.write(f'Confirmed participants: {confirmed}, counter: {event.confirmed_count}')
+
+            expected = min(capacity, registrations)
+            if codes.get(201, 0) != expected or confirmed != expected or event.confirmed_count != expected:
+                raise CommandError(
+                    f'Expected exactly {expected} successful registrations, got {codes.get(201, 0)} '
+                    f'({confirmed} confirmed rows, counter {event.confirmed_count})'
+                )
+            if codes.get(500):
+                raise CommandError(f'{codes[500]} registrations failed with a server error')
+
+            self.stdout.write(self.style.SUCCESS(f'✓ Exactly {expected} registrations succeeded, no overbooking'))
+        finally:
+            if options['keep']:
+                self.stdout.write(f'Kept benchmark event ID {event.pk}')
+            else:
+                event.delete()
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def _create_fixtures(self, registrations, capacity):
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+        category = EventCategory.objects.first()
+        if category is None:
+            raise CommandError('No event categories found. Run populate_event_categories first.')
+
+        event = Event.objects.create(
+            event_name=f'Registration benchmark {stamp}',
+            description='Temporary event created by benchmark_registrations',
+            event_type=category,
+            event_date=timezone.now() + timedelta(days=7),
+            start_time=dt_time(10, 0),
+            end_time=dt_time(11, 0),
+            max_participants=capacity,
+            # Online events skip the QR pre-render, keeping the benchmark on the booking path
+            event_mode='online',
+        )
+        users = User.objects.bulk_create([
+            User(username=f'bench_{stamp}_{i}', email=f'bench_{stamp}_{i}@example.com')
+            for i in range(registrations)
+        ])
+        if not users or users[0].pk is None:
+            users = list(User.objects.filter(username__startswith=f'bench_{stamp}_').order_by('pk'))
+        return event, users
+
+    def _run(self, event, attempts):
+        factory = APIRequestFactory()
+        view = EventRegistrationAPIView.as_view()
+        barrier = threading.Barrier(len(attempts))
+        results = []
+        lock = threading.Lock()
+
+        def register(user):
+            try:
+                request = factory.post(f'/api/events/{event.pk}/register/', {'answers': []}, format='json')
+                force_authenticate(request, user=user)
+                barrier.wait(timeout=60)
+                response = view(request, event_id=event.pk)
+                outcome = (response.status_code, response.data.get('error', ''))
+            except Exception as e:
+                outcome = (500, str(e))
+            finally:
+                connection.close()
+            with lock:
+                results.append(outcome)
+
+        threads = [threading.Thread(target=register, args=(user,)) for user in attempts]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results, time.perf_counter() - start
@@ -0,0 +1,198 @@
+"""
+Management command to measure attendance scan throughput
+
+Creates a throwaway event with N attendees, opens the gate (loading the scan
+index) and fires every QR at the Scanner view from parallel scanner threads,
+followed by a round of repeat scans. Reports scans per second and latency
+percentiles, and checks every attendee was marked exactly once. Everything it
+creates is removed again unless --keep is given.
+"""
+import hashlib
+import statistics
+import threading
+import time
+from collections import Counter
+from datetime import timedelta, time as dt_time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from event import scan_index
+from event.models import Event, EventCategory, EventStats, ODList, Participant
+from event.views import Scanner
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Fire attendance scans from parallel scanners and report scans per second'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--attendees',
+            type=int,
+            default=1000,
+            help='Number of attendees to scan (default: 1000)',
+        )
+        parser.add_argument(
+            '--scanners',
+            type=int,
+            default=4,
+            help='Number of parallel scanner threads (default: 4)',
+        )
+        parser.add_argument(
+            '--repeats',
+            type=int,
+            default=100,
+            help='Extra scans of already marked QRs (default: 100)',
+        )
+        parser.add_argument(
+            '--min-rate',
+            type=float,
+            default=0,
+            help='Fail if first scans are processed slower than this many per second (default: no check)',
+        )
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Keep the benchmark event and users instead of deleting them',
+        )
+
+    def handle(self, *args, **options):
+        attendees = options['attendees']
+        scanners = options['scanners']
+        if attendees < 1 or scanners < 1:
+            raise CommandError('--attendees and --scanners must be positive.')
+
+        event, users, hashes = self._create_fixtures(attendees)
+        try:
+            started = time.perf_counter()
+            indexed = scan_index.open_gate(event.pk)
+            self.stdout.write(f'Gate opened: {indexed} entries indexed in {time.perf_counter() - started:.2f}s')
+
+            operator = User.objects.create(
+                username=f'scanop_{event.pk}_{timezone.now():%H%M%S}', email='scanner@example.com', is_staff=True
+            )
+            users.append(operator)
+
+            first = self._run(event, operator, hashes, scanners)
+            self._report('First scans', first)
+            repeats = self._run(event, operator, hashes[:options['repeats']], scanners)
+            if repeats['codes']:
+                self._report('Repeat scans', repeats)
+
+            marked = ODList.objects.filter(event=event, attendance=True).count()
+            attended = EventStats.objects.get(pk=event.pk).attended
+            self.stdout.write(f'Marked present: {marked}, stats counter: {attended}')
+
+            if first['codes'].get(200, 0) != attendees or marked != attendees or attended != attendees:
+                raise CommandError(
+                    f'Expected {attendees} attendees marked once, got {first["codes"].get(200, 0)} successful '
+                    f'scans ({marked} marked rows, counter {attended})'
+                )
+            if set(repeats['codes']) - {208}:
+                raise CommandError(f'Repeat scans returned {dict(repeats["codes"])}, expected only HTTP 208')
+            if options['min_rate'] and first['rate'] < options['min_rate']:
+                raise CommandError(f'{first["rate"]:.0f} scans/sec is below --min-rate {options["min_rate"]:.0f}')
+
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ {attendees} attendees scanned at {first["rate"]:.0f} scans/sec with {scanners} scanners'
+            ))
+        finally:
+            if options['keep']:
+                self.stdout.write(f'Kept benchmark event ID {event.pk}')
+            else:
+                event.delete()
+                User.objects.filter(pk__in=[user.pk for user in users]).delete()
+
+    def _create_fixtures(self, attendees):
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S')
+        category = EventCategory.objects.first()
+        if category is None:
+            raise CommandError('No event categories found. Run populate_event_categories first.')
+
+        event = Event.objects.create(
+            event_name=f'Scanner benchmark {stamp}',
+            description='Temporary event created by benchmark_scanner',
+            event_type=category,
+            event_date=timezone.now() + timedelta(hours=1),
+            start_time=dt_time(10, 0),
+            end_time=dt_time(11, 0),
+            # Online events skip the QR pre-render, keeping fixture creation fast
+            event_mode='online',
+        )
+        User.objects.bulk_create([
+            User(username=f'scan_{stamp}_{i}', email=f'scan_{stamp}_{i}@example.com', first_name=f'Attendee {i}')
+            for i in range(attendees)
+        ])
+        users = list(User.objects.filter(username__startswith=f'scan_{stamp}_').order_by('pk'))
+
+        Participant.objects.bulk_create([Participant(user=user, event=event) for user in users])
+        participants = Participant.objects.filter(event=event).order_by('pk')
+        hashes = [hashlib.sha256(f'{stamp}:{participant.pk}'.encode()).hexdigest() for participant in participants]
+        ODList.objects.bulk_create([
+            ODList(participant=participant, event=event, hash=hash_value)
+            for participant, hash_value in zip(participants, hashes)
+        ], batch_size=500)
+        EventStats.refresh([event.pk])
+        return event, users, hashes
+
+    def _run(self, event, operator, hashes, scanners):
+        factory = APIRequestFactory()
+        # Measure the scan path itself, not the per-account scan rate limit
+        view = Scanner.as_view(throttle_classes=[])
+        lanes = [lane for lane in (hashes[i::scanners] for i in range(scanners)) if lane]
+        barrier = threading.Barrier(max(len(lanes), 1))
+        codes = Counter()
+        latencies = []
+        lock = threading.Lock()
+
+        def scan(lane):
+            lane_codes = Counter()
+            lane_latencies = []
+            try:
+                barrier.wait(timeout=60)
+                for hash_value in lane:
+                    request = factory.put(
+                        f'/api/events/{event.pk}/mark-attendance/', {'hash': hash_value}, format='json'
+                    )
+                    force_authenticate(request, user=operator)
+                    started = time.perf_counter()
+                    response = view(request, event_id=event.pk)
+                    lane_latencies.append(time.perf_counter() - started)
+                    lane_codes[response.status_code] += 1
+            finally:
+                connection.close()
+            with lock:
+                codes.update(lane_codes)
+                latencies.extend(lane_latencies)
+
+        threads = [threading.Thread(target=scan, args=(lane,)) for lane in lanes]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return {
+            'codes': codes,
+            'elapsed': elapsed,
+            'rate': len(latencies) / elapsed if elapsed > 0 else 0.0,
+            'latencies': sorted(latencies),
+        }
+
+    def _report(self, label, result):
+        latencies = result['latencies']
+        if not latencies:
+            return
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(
+            f'{label}: {len(latencies)} in {result["elapsed"]:.2f}s ({result["rate"]:.0f} scans/sec), '
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms, '
+            f'max {latencies[-1] * 1000:.1f} ms'
+        )
+        for code, count in sorted(result['codes'].items()):
+            self.stdout.write(f'  HTTP {code}: {count}')
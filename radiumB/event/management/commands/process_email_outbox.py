@@ -0,0 +1,62 @@
+"""
+Management command to drain the email outbox
+
+Run it as a separate long-lived process next to the web workers:
+    python manage.py process_email_outbox
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from event.email_services import process_email_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send queued registration emails from the email outbox with retries and backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Drain all currently due emails and exit instead of polling forever',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+            help=f'Emails claimed per batch (default: {settings.EMAIL_OUTBOX_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep when the queue is empty (default: 5)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+        totals = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+        self.stdout.write(f'Processing email outbox (batch size {batch_size})...')
+
+        try:
+            while True:
+                stats = process_email_outbox(batch_size=batch_size)
+                for key in totals:
+                    totals[key] += stats[key]
+
+                if stats['claimed']:
+                    self.stdout.write(
+                        f"Batch: {stats['sent']} sent, {stats['retrying']} retrying, {stats['failed']} failed"
+                    )
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted, stopping worker'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Done: {totals['sent']} sent, {totals['retrying']} scheduled for retry, {totals['failed']} failed permanently"
+        ))
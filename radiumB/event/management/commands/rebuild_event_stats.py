@@ -0,0 +1,26 @@
+"""
+Management command to rebuild the EventStats summary rows from the source tables
+"""
+from django.core.management.base import BaseCommand
+from event.models import Event, EventStats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-event statistics (registrations, OD/QR status, attendance, revenue)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=int,
+            help='Only rebuild the stats of the event with this ID',
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options['event']:
+            events = events.filter(pk=options['event'])
+
+        event_ids = list(events.values_list('pk', flat=True))
+        self.stdout.write(f'Rebuilding stats for {len(event_ids)} event(s)...')
+        written = EventStats.refresh(event_ids)
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt stats for {written} event(s)'))
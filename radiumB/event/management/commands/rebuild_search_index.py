@@ -0,0 +1,20 @@
+"""
+Management command to rebuild the event full-text search index
+"""
+import time
+from django.core.management.base import BaseCommand
+from event.search import rebuild_search_index, search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the event search index (tsvector column on PostgreSQL, FTS5 table on SQLite)'
+
+    def handle(self, *args, **options):
+        backend = search_backend()
+        self.stdout.write(f'Rebuilding event search index ({backend})...')
+
+        start = time.perf_counter()
+        indexed = rebuild_search_index()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Indexed {indexed} events in {elapsed:.2f}s'))
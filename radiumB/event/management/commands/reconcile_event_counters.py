@@ -0,0 +1,39 @@
+"""
+Management command to repair drift in the denormalised Event.confirmed_count column
+"""
+from django.core.management.base import BaseCommand
+from event.models import Event
+
+
+class Command(BaseCommand):
+    help = 'Recount confirmed participants per event and fix any drifted confirmed_count values'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--event',
+            type=int,
+            help='Only reconcile the event with this ID',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drift without writing any changes',
+        )
+
+    def handle(self, *args, **options):
+        events = Event.objects.all()
+        if options['event']:
+            events = events.filter(pk=options['event'])
+
+        self.stdout.write(f'Reconciling confirmed counts for {events.count()} event(s)...')
+        drifted = Event.reconcile_confirmed_counts(events, dry_run=options['dry_run'])
+
+        for event, stored, actual in drifted:
+            self.stdout.write(self.style.WARNING(f'  {event.event_name} (ID {event.pk}): stored {stored}, actual {actual}'))
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('✓ All counters are in sync'))
+        elif options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'{len(drifted)} event(s) drifted (dry run, nothing written)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'✓ Fixed {len(drifted)} event(s)'))
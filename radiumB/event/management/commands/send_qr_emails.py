@@ -0,0 +1,47 @@
+"""
+Management command to send QR emails for an event in bulk over pooled connections
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from event.models import Event, ODList
+from event.email_services import send_registration_emails_bulk, format_bulk_email_report
+
+
+class Command(BaseCommand):
+    help = 'Send registration QR emails for an event, reusing one SMTP connection per batch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int, help='ID of the event')
+        parser.add_argument(
+            '--resend',
+            action='store_true',
+            help='Also send to participants whose QR email was already sent',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_BULK_BATCH_SIZE,
+            help=f'Emails per SMTP connection before reconnecting (default: {settings.EMAIL_BULK_BATCH_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            event = Event.objects.get(pk=options['event_id'])
+        except Event.DoesNotExist:
+            raise CommandError(f'Event {options["event_id"]} does not exist.')
+
+        od_lists = ODList.objects.filter(
+            event=event,
+            participant__registration_status='confirmed',
+            participant__payment_status=True
+        ).select_related('participant', 'participant__user', 'participant__event')
+        if not options['resend']:
+            od_lists = od_lists.filter(qr_sent=False)
+
+        self.stdout.write(f'Sending {od_lists.count()} QR emails for {event.event_name}...')
+        report = send_registration_emails_bulk(od_lists, batch_size=options['batch_size'])
+
+        for od_list_id, error in report['errors'].items():
+            self.stdout.write(self.style.WARNING(f'  OD #{od_list_id}: {error}'))
+
+        self.stdout.write(self.style.SUCCESS(f'✓ {format_bulk_email_report(report)}'))
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:47
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0008_replace_event_type_field'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_type', models.CharField(choices=[('registration_qr', 'Registration QR')], default='registration_qr', max_length=30)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Number of delivery attempts made')),
+                ('max_attempts', models.PositiveIntegerField(default=5, help_text='Give up after this many attempts')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time the worker may try again')),
+                ('locked_at', models.DateTimeField(blank=True, help_text='When a worker claimed this email', null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('od_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_emails', to='event.odlist')),
+            ],
+            options={
+                'verbose_name': 'Email Outbox Entry',
+                'verbose_name_plural': 'Email Outbox',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='event_email_status_083000_idx')],
+            },
+        ),
+    ]
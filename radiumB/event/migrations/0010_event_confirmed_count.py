@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:50
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_confirmed_count(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    Participant = apps.get_model('event', 'Participant')
+    confirmed = Participant.objects.filter(
+        event=models.OuterRef('pk'),
+        registration_status='confirmed'
+    ).order_by().values('event').annotate(total=models.Count('pk')).values('total')
+    Event.objects.update(confirmed_count=Coalesce(models.Subquery(confirmed), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0009_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='confirmed_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Number of confirmed participants (maintained by participant signals)'),
+        ),
+        migrations.RunPython(backfill_confirmed_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_schedule_slots(apps, schema_editor):
+    Participant = apps.get_model('event', 'Participant')
+    UserScheduleSlot = apps.get_model('event', 'UserScheduleSlot')
+    confirmed = Participant.objects.filter(
+        registration_status='confirmed',
+        event__event_date__isnull=False,
+        event__start_time__isnull=False,
+        event__end_time__isnull=False,
+    ).values_list('pk', 'user_id', 'event_id', 'event__event_date', 'event__start_time', 'event__end_time')
+
+    slots = []
+    for participant_id, user_id, event_id, event_date, start_time, end_time in confirmed.iterator(chunk_size=2000):
+        if timezone.is_aware(event_date):
+            event_date = timezone.localtime(event_date)
+        slots.append(UserScheduleSlot(
+            participant_id=participant_id, user_id=user_id, event_id=event_id,
+            date=event_date.date(), start_time=start_time, end_time=end_time,
+        ))
+    UserScheduleSlot.objects.bulk_create(slots, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0010_event_confirmed_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserScheduleSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_slots', to='event.event')),
+                ('participant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_slot', to='event.participant')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Schedule Slot',
+                'verbose_name_plural': 'User Schedule Slots',
+                'indexes': [models.Index(fields=['user', 'date', 'start_time'], name='event_users_user_id_f3390a_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_schedule_slots, migrations.RunPython.noop),
+    ]
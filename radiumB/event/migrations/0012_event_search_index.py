@@ -0,0 +1,54 @@
+# Generated by Django 5.2.7 on 2026-10-18 02:56
+
+import django.contrib.postgres.search
+import event.models
+from django.conf import settings
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """search_vector backfill on PostgreSQL, an FTS5 table on SQLite"""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        config = getattr(settings, 'SEARCH_CONFIG', 'english')
+        schema_editor.execute(
+            "UPDATE event_event SET search_vector = "
+            "setweight(to_tsvector(%s::regconfig, coalesce(event_name, '')), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, coalesce(description, '')), 'B')",
+            params=[config, config]
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS event_search_fts USING fts5("
+            "event_name, description, tokenize='porter unicode61', prefix='2 3 4')"
+        )
+        schema_editor.execute(
+            "INSERT INTO event_search_fts (rowid, event_name, description) "
+            "SELECT id, event_name, COALESCE(description, '') FROM event_event"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS event_search_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0011_user_schedule_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, help_text='Full-text search document on PostgreSQL (maintained by event signals)', null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        # After the backfill, so the index is built once rather than updated row by row
+        migrations.AddIndex(
+            model_name='event',
+            index=event.models.PostgresOnlyGinIndex(fields=['search_vector'], name='event_event_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_event_stats(apps, schema_editor):
+    Event = apps.get_model('event', 'Event')
+    EventStats = apps.get_model('event', 'EventStats')
+    Participant = apps.get_model('event', 'Participant')
+    ODList = apps.get_model('event', 'ODList')
+    Payment = apps.get_model('payment', 'Payment')
+
+    def count(model, **filters):
+        return Coalesce(models.Subquery(
+            model.objects.filter(event=models.OuterRef('pk'), **filters)
+            .order_by().values('event').annotate(total=models.Count('pk')).values('total')
+        ), 0)
+
+    revenue = Coalesce(models.Subquery(
+        Payment.objects.filter(event=models.OuterRef('pk'), status='success')
+        .order_by().values('event').annotate(total=models.Sum('amount')).values('total')
+    ), models.Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+    rows = Event.objects.order_by().annotate(
+        stat_registered=count(Participant),
+        stat_eligible=count(Participant, registration_status='confirmed', payment_status=True),
+        stat_paid=count(Participant, payment_status=True),
+        stat_od_created=count(ODList),
+        stat_qr_sent=count(ODList, qr_sent=True),
+        stat_attended=count(ODList, attendance=True),
+        stat_revenue=revenue,
+    ).values()
+    EventStats.objects.bulk_create([
+        EventStats(
+            event_id=row['id'],
+            registered=row['stat_registered'],
+            eligible=row['stat_eligible'],
+            paid=row['stat_paid'],
+            od_created=row['stat_od_created'],
+            qr_sent=row['stat_qr_sent'],
+            attended=row['stat_attended'],
+            revenue=row['stat_revenue'],
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0012_event_search_index'),
+        ('payment', '0002_alter_paymentconfiguration_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventStats',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='event.event')),
+                ('registered', models.IntegerField(default=0, help_text='All participant rows')),
+                ('eligible', models.IntegerField(default=0, help_text='Confirmed and paid participants')),
+                ('paid', models.IntegerField(default=0, help_text='Participants with payment_status set')),
+                ('od_created', models.IntegerField(default=0, help_text='OD list entries')),
+                ('qr_sent', models.IntegerField(default=0, help_text='OD list entries whose QR email was sent')),
+                ('attended', models.IntegerField(default=0, help_text='OD list entries marked present')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Sum of successful payments', max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Event Statistics',
+                'verbose_name_plural': 'Event Statistics',
+            },
+        ),
+        migrations.RunPython(backfill_event_stats, migrations.RunPython.noop),
+    ]
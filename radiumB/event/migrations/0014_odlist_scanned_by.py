@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('event', '0013_event_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='odlist',
+            name='scanned_by',
+            field=models.CharField(blank=True, help_text='ID of the scanner device that marked attendance', max_length=64),
+        ),
+    ]
@@ -1,8 +1,12 @@
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models.functions import Coalesce, TruncDate
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-import hashlib
 from datetime import datetime, time
+from .qr_tokens import new_qr_value
+from .response_cache import invalidate_event
 
 User = get_user_model()
 
@@ -51,6 +55,68 @@ class EventCategory(models.Model):
                     order=order
                 )
 
+class EventQuerySet(models.QuerySet):
+    """Queryset helpers for event listings"""
+
+    def with_listing_annotations(self):
+        """
+        Annotate the flags the list serializers need so they are computed in SQL.
+
+        Adds annotated_is_upcoming and annotated_is_registration_open, matching
+        Event.is_upcoming and Event.is_registration_open.
+        """
+        now = timezone.now()
+        has_room = (
+            models.Q(max_participants__isnull=True)
+            | models.Q(max_participants=0)
+            | models.Q(confirmed_count__lt=models.F('max_participants'))
+        )
+        # Registration stays open until the end of the deadline's local day
+        before_deadline = models.Q(
+            registration_deadline__isnull=False,
+            registration_deadline_date__gte=timezone.localdate(now)
+        ) | models.Q(registration_deadline__isnull=True, event_date__gt=now)
+
+        return self.annotate(
+            registration_deadline_date=TruncDate('registration_deadline'),
+        ).annotate(
+            annotated_is_upcoming=models.Case(
+                models.When(event_date__gt=now, then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField()
+            ),
+            annotated_is_registration_open=models.Case(
+                models.When(has_room & before_deadline, then=models.Value(True)),
+                default=models.Value(False),
+                output_field=models.BooleanField()
+            ),
+        )
+
+    def for_listing(self):
+        """Events with everything the list serializers touch loaded in a fixed number of queries"""
+        return self.select_related('event_type').prefetch_related('questions').with_listing_annotations()
+
+
+class PostgresOnlyGinIndex(GinIndex):
+    """
+    GIN index that exists on PostgreSQL only.
+
+    Declared in Meta.indexes so migrations track it, while other databases
+    (SQLite in development, with its own FTS5 table) get a no-op statement
+    instead of SQL they cannot run.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return f'-- {self.name} is PostgreSQL only'
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return f'-- {self.name} is PostgreSQL only'
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
 class Event(models.Model):
     # Remove hardcoded EVENT_TYPE_CHOICES - now using dynamic EventCategory
     
@@ -163,13 +229,28 @@ class Event(models.Model):
         blank=True,
         help_text="Custom payment gateway credentials (JSON format)"
     )
+    confirmed_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Number of confirmed participants (maintained by participant signals)"
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text="Full-text search document on PostgreSQL (maintained by event signals)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventQuerySet.as_manager()
     
     class Meta:
         ordering = ['-event_date']
         verbose_name = "Event"
         verbose_name_plural = "Events"
+        indexes = [
+            PostgresOnlyGinIndex(fields=['search_vector'], name='event_event_search_vector_gin'),
+        ]
     
     def __str__(self):
         if hasattr(self.event_date, 'strftime'):
@@ -177,6 +258,10 @@ class Event(models.Model):
         else:
             return f"{self.event_name} - {self.event_date}"
     
+    def get_event_type_display(self):
+        """Display name of the event category"""
+        return self.event_type.display_name if self.event_type_id else None
+
     @property
     def is_upcoming(self):
         return self.event_date and self.event_date > timezone.now()
@@ -185,12 +270,100 @@ class Event(models.Model):
     def is_full(self):
         """Check if the event is full"""
         if self.max_participants and self.max_participants > 0:
-            return self.participants.filter(registration_status='confirmed').count() >= self.max_participants
+            return self.confirmed_count >= self.max_participants
         return False
 
     @property
     def get_current_participants(self):
-        return self.participants.filter(registration_status='confirmed').count()
+        return self.confirmed_count
+
+    @classmethod
+    def adjust_confirmed_count(cls, event_id, delta):
+        """Atomically add delta to an event's confirmed participant counter"""
+        if not delta:
+            return 0
+        events = cls.objects.filter(pk=event_id)
+        if delta < 0:
+            events = events.filter(confirmed_count__gte=-delta)
+        return events.update(confirmed_count=models.F('confirmed_count') + delta)
+
+    def reserve_seat(self):
+        """
+        Claim one confirmed seat with a conditional UPDATE on the counter row.
+
+        The capacity check and the increment happen in a single statement, so
+        concurrent registrations can never push confirmed_count past
+        max_participants. Call it inside the transaction that creates the
+        participant so the seat is released again if that insert fails. Make it
+        the transaction's first statement: on SQLite the write lock is taken
+        there, and concurrent registrations wait for it (SQLITE_TIMEOUT).
+
+        Returns:
+            bool: True if a seat was reserved, False if the event is full
+        """
+        has_room = (
+            models.Q(max_participants__isnull=True)
+            | models.Q(max_participants__lte=0)
+            | models.Q(confirmed_count__lt=models.F('max_participants'))
+        )
+        reserved = Event.objects.filter(pk=self.pk).filter(has_room).update(
+            confirmed_count=models.F('confirmed_count') + 1
+        )
+        if reserved:
+            self.confirmed_count += 1
+        return bool(reserved)
+
+    def reserve_seats(self, count):
+        """
+        Claim up to `count` confirmed seats at once, for bulk bookings.
+
+        Locks the event row so the seats left can be read and claimed together.
+        Call it inside the transaction that creates the participants.
+
+        Returns:
+            int: Number of seats reserved (less than count when the event fills up)
+        """
+        event = Event.objects.select_for_update().only('max_participants', 'confirmed_count').get(pk=self.pk)
+        if event.max_participants is None or event.max_participants <= 0:
+            granted = count
+        else:
+            granted = max(min(count, event.max_participants - event.confirmed_count), 0)
+        if granted:
+            Event.objects.filter(pk=self.pk).update(confirmed_count=models.F('confirmed_count') + granted)
+        self.confirmed_count = event.confirmed_count + granted
+        return granted
+
+    @classmethod
+    def reconcile_confirmed_counts(cls, queryset=None, dry_run=False):
+        """
+        Recompute confirmed_count from the participants table.
+
+        Args:
+            queryset: Events to check (default: all events)
+            dry_run: Only report drift, do not write
+
+        Returns:
+            list: (event, stored_count, actual_count) for every event that had drifted
+        """
+        queryset = cls.objects.all() if queryset is None else queryset
+        actual_counts = queryset.annotate(
+            actual=models.Count('participants', filter=models.Q(participants__registration_status='confirmed'))
+        )
+        drifted = []
+        for event in actual_counts:
+            if event.confirmed_count != event.actual:
+                drifted.append((event, event.confirmed_count, event.actual))
+                if dry_run:
+                    continue
+                # Recount inside the UPDATE so registrations racing with the repair are not lost
+                confirmed = Participant.objects.filter(
+                    event=models.OuterRef('pk'), registration_status='confirmed'
+                ).order_by().values('event').annotate(total=models.Count('pk')).values('total')
+                cls.objects.filter(pk=event.pk).update(
+                    confirmed_count=Coalesce(models.Subquery(confirmed), 0)
+                )
+                invalidate_event(event.pk)
+        return drifted
 
     @property
     def is_registration_open(self):
@@ -235,37 +408,26 @@ class Event(models.Model):
         - 'block': Time clash detected, block registration
         - None: No clash
         """
-        if not user or not self.event_date:
+        if not user:
             return None, None
 
-        if not hasattr(self, 'start_time') or not hasattr(self, 'end_time'):
+        interval = UserScheduleSlot.interval_for_event(self)
+        if interval is None:
             return None, None
 
-        if not self.start_time or not self.end_time:
-            return None, None
-
-        event_date = self.event_date.date()
-
-        from django.db.models import Q
-        user_registrations = Participant.objects.filter(
+        event_date, start_time, end_time = interval
+        clash = UserScheduleSlot.objects.filter(
             user=user,
-            registration_status='confirmed'
-        ).exclude(event=self).select_related('event').filter(
-            Q(event__event_date__date=event_date) 
-        )
-
-        for registration in user_registrations:
-            other_event = registration.event
+            date=event_date,
+            start_time__lt=end_time,
+            end_time__gt=start_time
+        ).exclude(event=self).select_related('event').only(
+            'start_time', 'end_time', 'event__event_name'
+        ).first()
 
-            if not hasattr(other_event, 'start_time') or not hasattr(other_event, 'end_time'):
-                continue
-            if not other_event.start_time or not other_event.end_time:
-                continue
-
-            if (self.start_time < other_event.end_time and
-                self.end_time > other_event.start_time):
-                message = f'Time clash detected! You are already registered for "{other_event.event_name}" from {other_event.start_time.strftime("%H:%M")} to {other_event.end_time.strftime("%H:%M")} on {event_date.strftime("%Y-%m-%d")}.'
-                return 'block', message
+        if clash:
+            message = f'Time clash detected! You are already registered for "{clash.event.event_name}" from {clash.start_time.strftime("%H:%M")} to {clash.end_time.strftime("%H:%M")} on {event_date.strftime("%Y-%m-%d")}.'
+            return 'block', message
 
         return None, None
 
@@ -303,6 +465,21 @@ class EventQuestion(models.Model):
         return f"{self.event.event_name} - {self.label}"
 
 
+class ParticipantQuerySet(models.QuerySet):
+    """Queryset helpers for participant listings"""
+
+    def with_od_fields(self):
+        """
+        Join the participant's OD entry once and expose its attendance and hash.
+
+        Adds od_attendance (None when no OD entry exists) and od_hash.
+        """
+        return self.annotate(
+            od_attendance=models.F('registered_participants__attendance'),
+            od_hash=models.F('registered_participants__hash'),
+        )
+
+
 class Participant(models.Model):
     """Event participant with registration details"""
 
@@ -320,6 +497,8 @@ class Participant(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     answers = models.JSONField(default=list, blank=True, help_text="User's answers to event questions")
 
+    objects = ParticipantQuerySet.as_manager()
+
     class Meta:
         unique_together = ('user', 'event')  # Prevent duplicate registrations
         verbose_name = "Event Participant"
@@ -358,7 +537,7 @@ class Participant(models.Model):
         """Get participant's department from profile"""
         try:
             if hasattr(self.user, 'profile') and self.user.profile:
-                return self.user.profile.get_department_display() or "N/A"
+                return self.user.profile.department_display or "N/A"
         except:
             pass
         return "N/A"
@@ -388,6 +567,128 @@ class Participant(models.Model):
         return True
     
 
+class UserScheduleSlot(models.Model):
+    """
+    Busy interval on a user's schedule, one per confirmed registration.
+
+    Maintained by the participant and event signals so time-clash checks are a
+    single indexed overlap query instead of a scan of the user's registrations.
+    """
+    participant = models.OneToOneField(Participant, on_delete=models.CASCADE, related_name='schedule_slot')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='schedule_slots')
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='schedule_slots')
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        verbose_name = "User Schedule Slot"
+        verbose_name_plural = "User Schedule Slots"
+        indexes = [
+            models.Index(fields=['user', 'date', 'start_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} busy {self.date} {self.start_time}-{self.end_time} ({self.event_id})"
+
+    @staticmethod
+    def interval_for_event(event):
+        """Return (date, start_time, end_time) for the event, or None if it has no fixed time"""
+        if not event.event_date or not event.start_time or not event.end_time:
+            return None
+        event_date = event.event_date
+        if timezone.is_aware(event_date):
+            event_date = timezone.localtime(event_date)
+        return event_date.date(), event.start_time, event.end_time
+
+    @classmethod
+    def sync_participant(cls, participant):
+        """Create, move or drop the participant's slot to match its registration"""
+        interval = None
+        if participant.registration_status == 'confirmed':
+            interval = cls.interval_for_event(participant.event)
+
+        if interval is None:
+            cls.objects.filter(participant=participant).delete()
+            return
+
+        date, start_time, end_time = interval
+        cls.objects.update_or_create(
+            participant=participant,
+            defaults={
+                'user_id': participant.user_id,
+                'event_id': participant.event_id,
+                'date': date,
+                'start_time': start_time,
+                'end_time': end_time,
+            }
+        )
+
+    @classmethod
+    def sync_event(cls, event):
+        """Move every slot of the event after its date or times change"""
+        interval = cls.interval_for_event(event)
+        if interval is None:
+            cls.objects.filter(event=event).delete()
+            return
+
+        date, start_time, end_time = interval
+        cls.objects.filter(event=event).exclude(
+            date=date, start_time=start_time, end_time=end_time
+        ).update(date=date, start_time=start_time, end_time=end_time)
+
+        missing = Participant.objects.filter(
+            event=event, registration_status='confirmed', schedule_slot__isnull=True
+        ).values_list('pk', 'user_id')
+        cls.objects.bulk_create(
+            [
+                cls(participant_id=participant_id, user_id=user_id, event=event,
+                    date=date, start_time=start_time, end_time=end_time)
+                for participant_id, user_id in missing
+            ],
+            ignore_conflicts=True
+        )
+
+    @classmethod
+    def find_clashes(cls, user, events):
+        """
+        Check several events against the user's schedule at once.
+
+        Args:
+            user: User instance
+            events: Iterable of Event instances
+
+        Returns:
+            dict: {event_id: UserScheduleSlot} for each event that overlaps a slot
+        """
+        intervals = {}
+        for event in events:
+            interval = cls.interval_for_event(event)
+            if interval:
+                intervals[event.pk] = interval
+        if not intervals or not user or not user.is_authenticated:
+            return {}
+
+        slots_by_date = {}
+        slots = cls.objects.filter(
+            user=user, date__in={date for date, _, _ in intervals.values()}
+        ).select_related('event').only(
+            'date', 'start_time', 'end_time', 'event_id', 'event__event_name'
+        ).order_by('date', 'start_time')
+        for slot in slots:
+            slots_by_date.setdefault(slot.date, []).append(slot)
+
+        clashes = {}
+        for event_id, (date, start_time, end_time) in intervals.items():
+            for slot in slots_by_date.get(date, ()):
+                if slot.start_time >= end_time:
+                    break
+                if slot.event_id != event_id and slot.end_time > start_time:
+                    clashes[event_id] = slot
+                    break
+        return clashes
+
+
 class ODList(models.Model):
     participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name='registered_participants')
     event = models.ForeignKey(Event , on_delete=models.CASCADE, related_name='od_lists')
@@ -395,6 +696,7 @@ class ODList(models.Model):
     attendance = models.BooleanField(default=False)
     hash = models.CharField(max_length=64, unique=True)
     attendance_marked_at = models.DateTimeField(null=True, blank=True)
+    scanned_by = models.CharField(max_length=64, blank=True, help_text="ID of the scanner device that marked attendance")
     
     class Meta:
         unique_together = ('participant',)
@@ -407,7 +709,7 @@ class ODList(models.Model):
     def save(self, *args, **kwargs):
         if not self.hash:
             hash_string = f"{self.participant.user.id}{self.participant.event.id}{timezone.now().timestamp()}"
-            self.hash = hashlib.sha256(hash_string.encode()).hexdigest()
+            self.hash = new_qr_value(self.participant.pk, self.participant.event_id, hash_string)
         super().save(*args, **kwargs)
     
     @property
@@ -419,6 +721,133 @@ class ODList(models.Model):
         return self.attendance
 
 
+class EventStats(models.Model):
+    """
+    Summary counters for one event, read by the admin, the analysis report and the staff APIs.
+
+    Kept current by the Participant/ODList/Payment signals, which apply the
+    difference each saved or deleted row makes. Bulk queryset updates skip
+    signals, so callers doing those run refresh() afterwards;
+    `python manage.py rebuild_event_stats` recomputes everything.
+    """
+    COUNTERS = ('registered', 'eligible', 'paid', 'od_created', 'qr_sent', 'attended', 'revenue')
+
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    registered = models.IntegerField(default=0, help_text="All participant rows")
+    eligible = models.IntegerField(default=0, help_text="Confirmed and paid participants")
+    paid = models.IntegerField(default=0, help_text="Participants with payment_status set")
+    od_created = models.IntegerField(default=0, help_text="OD list entries")
+    qr_sent = models.IntegerField(default=0, help_text="OD list entries whose QR email was sent")
+    attended = models.IntegerField(default=0, help_text="OD list entries marked present")
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0, help_text="Sum of successful payments")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Event Statistics"
+        verbose_name_plural = "Event Statistics"
+
+    def __str__(self):
+        return f"Stats for event {self.event_id}"
+
+    @property
+    def qr_pending(self):
+        return self.od_created - self.qr_sent
+
+    def summary(self):
+        """Counts in the shape returned by analytics.attendance_summary()"""
+        present = self.attended
+        return {
+            'registered': self.registered,
+            'present': present,
+            'absent': self.registered - present,
+            'paid': self.paid,
+            'unpaid': self.registered - self.paid,
+            'attendance_rate': round(present / self.registered * 100, 2) if self.registered else 0.0,
+            'payment_rate': round(self.paid / self.registered * 100, 2) if self.registered else 0.0,
+        }
+
+    def as_dict(self):
+        data = {name: getattr(self, name) for name in self.COUNTERS}
+        data['revenue'] = str(self.revenue)
+        data['qr_pending'] = self.qr_pending
+        data['updated_at'] = self.updated_at
+        return data
+
+    @classmethod
+    def for_event(cls, event):
+        """The event's stats row, building it if it does not exist yet"""
+        try:
+            return event.stats
+        except cls.DoesNotExist:
+            cls.refresh([event.pk])
+            return cls.objects.get(pk=event.pk)
+
+    @classmethod
+    def apply_delta(cls, event_id, **deltas):
+        """
+        Add signed deltas to an event's counters in one UPDATE.
+
+        A missing row is left alone; it is built from scratch the next time it is read.
+
+        Returns:
+            bool: Whether a stats row was updated
+        """
+        changes = {name: models.F(name) + delta for name, delta in deltas.items() if delta}
+        if not changes or event_id is None:
+            return False
+        return bool(cls.objects.filter(pk=event_id).update(updated_at=timezone.now(), **changes))
+
+    @classmethod
+    def refresh(cls, event_ids=None):
+        """
+        Recompute the counters from the source tables.
+
+        Args:
+            event_ids: Events to recompute (default: all events)
+
+        Returns:
+            int: Number of stats rows written
+        """
+        from django.apps import apps
+        Payment = apps.get_model('payment', 'Payment')
+
+        def count(model, **filters):
+            return Coalesce(models.Subquery(
+                model.objects.filter(event=models.OuterRef('pk'), **filters)
+                .order_by().values('event').annotate(total=models.Count('pk')).values('total')
+            ), 0)
+
+        revenue = Coalesce(models.Subquery(
+            Payment.objects.filter(event=models.OuterRef('pk'), status='success')
+            .order_by().values('event').annotate(total=models.Sum('amount')).values('total')
+        ), models.Value(0), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+
+        events = Event.objects.all() if event_ids is None else Event.objects.filter(pk__in=list(event_ids))
+        rows = events.order_by().annotate(
+            stat_registered=count(Participant),
+            stat_eligible=count(Participant, registration_status='confirmed', payment_status=True),
+            stat_paid=count(Participant, payment_status=True),
+            stat_od_created=count(ODList),
+            stat_qr_sent=count(ODList, qr_sent=True),
+            stat_attended=count(ODList, attendance=True),
+            stat_revenue=revenue,
+        ).values('pk', *(f'stat_{name}' for name in cls.COUNTERS))
+
+        now = timezone.now()
+        stats = [
+            cls(event_id=row['pk'], updated_at=now, **{name: row[f'stat_{name}'] for name in cls.COUNTERS})
+            for row in rows
+        ]
+        cls.objects.bulk_create(
+            stats,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['event'],
+            update_fields=[*cls.COUNTERS, 'updated_at'],
+        )
+        return len(stats)
+
+
 class EventGuide(models.Model):
     """Event guide with additional details and specifications"""
     
@@ -497,3 +926,41 @@ class EventGuide(models.Model):
     
     def __str__(self):
         return f"Guide for {self.event.event_name}"
+
+
+class EmailOutbox(models.Model):
+    """Queued outgoing emails, drained by the process_email_outbox worker"""
+
+    EMAIL_TYPE_CHOICES = [
+        ('registration_qr', 'Registration QR'),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    od_list = models.ForeignKey(ODList, on_delete=models.CASCADE, related_name='outbox_emails')
+    email_type = models.CharField(max_length=30, choices=EMAIL_TYPE_CHOICES, default='registration_qr')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of delivery attempts made")
+    max_attempts = models.PositiveIntegerField(default=5, help_text="Give up after this many attempts")
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the worker may try again")
+    locked_at = models.DateTimeField(null=True, blank=True, help_text="When a worker claimed this email")
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['created_at']
+        verbose_name = "Email Outbox Entry"
+        verbose_name_plural = "Email Outbox"
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_email_type_display()} for OD #{self.od_list_id} ({self.status})"
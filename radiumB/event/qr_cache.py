@@ -0,0 +1,143 @@
+"""
+QR code rendering cache
+
+Renders are keyed by the QR payload (the ODList hash). Each PNG is kept in a
+process-local LRU and, when QR_CACHE_DISK_STORE is enabled, in a
+content-addressed store under MEDIA_ROOT so the web workers, the email outbox
+worker and any download endpoint share a single render per payload.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+def render_qr_png(payload):
+    """Render a QR code PNG for the payload, as a 1-bit optimised image"""
+    qr = qrcode.QRCode(version=1, box_size=10, border=5)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill='black', back_color='white')
+
+    buffer = BytesIO()
+    img.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
+
+
+class QRCodeCache:
+    """LRU of rendered QR PNGs with an optional on-disk content-addressed store"""
+
+    def __init__(self, max_entries=512, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _disk_path(self, payload):
+        digest = hashlib.sha256(payload.encode()).hexdigest()
+        return os.path.join(self.disk_dir, digest[:2], f'{digest}.png')
+
+    def _read_disk(self, payload):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._disk_path(payload), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _write_disk(self, payload, png):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(payload)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file first so concurrent readers never see a partial PNG
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.warning("Failed to store QR render on disk at %s", path, exc_info=True)
+
+    def _remember(self, payload, png):
+        with self._lock:
+            self._entries[payload] = png
+            self._entries.move_to_end(payload)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_png(self, payload):
+        """Return PNG bytes for the payload, rendering it at most once"""
+        with self._lock:
+            png = self._entries.get(payload)
+            if png is not None:
+                self._entries.move_to_end(payload)
+                self.hits += 1
+                return png
+
+        png = self._read_disk(payload)
+        if png is not None:
+            with self._lock:
+                self.disk_hits += 1
+            self._remember(payload, png)
+            return png
+
+        with self._lock:
+            self.misses += 1
+        png = render_qr_png(payload)
+        self._write_disk(payload, png)
+        self._remember(payload, png)
+        return png
+
+    def warm(self, payload):
+        """Pre-render the payload so later sends are cache hits"""
+        self.get_png(payload)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'disk_store': bool(self.disk_dir),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+
+_qr_cache = None
+
+
+def get_qr_cache():
+    """Process-wide QR cache configured from settings"""
+    global _qr_cache
+    if _qr_cache is None:
+        disk_dir = None
+        if settings.QR_CACHE_DISK_STORE:
+            disk_dir = os.path.join(settings.MEDIA_ROOT, settings.QR_CACHE_DIR)
+        _qr_cache = QRCodeCache(max_entries=settings.QR_CACHE_SIZE, disk_dir=disk_dir)
+    return _qr_cache
+
+
+def get_qr_png(payload):
+    """PNG bytes for a QR payload, served from the cache when possible"""
+    return get_qr_cache().get_png(payload)
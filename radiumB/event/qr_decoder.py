@@ -0,0 +1,229 @@
+"""
+Headless QR decoding for uploaded gate photos and clips
+
+Gate phones without a live scanner upload still images or short video clips
+instead. Each upload is decoded in a process pool worker:
+
+- frames are downscaled (strided to at most QR_DECODE_MAX_SIDE pixels on the
+  long side) and converted to grayscale with NumPy before decoding
+- a frame whose 32x32 thumbnail barely differs from the last decoded frame is
+  skipped, so a clip held still on one QR is decoded once, not 30 times a second
+- decoding uses pyzbar like qr_scanner.py, falling back to OpenCV's QR detector
+  where the zbar shared library is not installed
+
+Workers only receive bytes and plain options and never touch Django, so the
+pool uses the spawn start method and is safe to start from a threaded server.
+The decoded values go through attendance_sync.sync_scans like an offline batch.
+"""
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import cv2
+import numpy as np
+
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.webm', '.avi', '.3gp', '.mkv')
+
+# Fixed-point BT.601 luma weights for OpenCV's BGR channel order, summing to 256
+_LUMA_WEIGHTS = np.array([29, 150, 77], dtype=np.uint16)
+_SIGNATURE_SIDE = 32
+
+_zbar = None
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def to_gray(frame, max_side):
+    """
+    Downscale a frame to at most max_side pixels on its long side and convert it to grayscale.
+
+    Args:
+        frame: uint8 or uint16 array, HxW (gray), HxWx3 (BGR) or HxWx4 (BGRA)
+        max_side: Long side limit in pixels
+
+    Returns:
+        numpy.ndarray: Contiguous uint8 HxW array
+    """
+    if frame.dtype != np.uint8:
+        # 16-bit PNGs
+        frame = (frame >> 8).astype(np.uint8)
+    height, width = frame.shape[:2]
+    step = -(-max(height, width) // max_side) if max_side else 1
+    if step > 1:
+        # QR modules span many pixels in a phone photo, so striding loses nothing the decoder needs
+        frame = frame[::step, ::step]
+    if frame.ndim == 3:
+        frame = ((frame[..., :3] @ _LUMA_WEIGHTS) >> 8).astype(np.uint8)
+    return np.ascontiguousarray(frame)
+
+
+def signature(gray):
+    """32x32 thumbnail used to spot near-duplicate frames"""
+    height, width = gray.shape
+    rows = np.linspace(0, height - 1, _SIGNATURE_SIDE).astype(np.intp)
+    cols = np.linspace(0, width - 1, _SIGNATURE_SIDE).astype(np.intp)
+    return gray[np.ix_(rows, cols)].astype(np.int16)
+
+
+def is_near_duplicate(current, previous, threshold):
+    """Whether two signatures differ by less than threshold grey levels on average"""
+    return previous is not None and float(np.abs(current - previous).mean()) < threshold
+
+
+def _zbar_decoder():
+    global _zbar
+    if _zbar is None:
+        try:
+            from pyzbar.pyzbar import ZBarSymbol, decode
+            _zbar = lambda gray: decode(gray, symbols=[ZBarSymbol.QRCODE])
+        except ImportError:
+            # pyzbar is installed but libzbar is missing on this host
+            _zbar = False
+    return _zbar
+
+
+def decode_gray(gray):
+    """
+    Decode every QR code in a grayscale frame.
+
+    Returns:
+        list: Decoded strings, in detection order
+    """
+    decoder = _zbar_decoder()
+    if decoder:
+        return [symbol.data.decode('utf-8', 'replace') for symbol in decoder(gray)]
+    found, values, _, _ = cv2.QRCodeDetector().detectAndDecodeMulti(gray)
+    return [value for value in values if value] if found else []
+
+
+def decode_frame(frame, max_side=0):
+    """Decode the QR codes of one camera or image frame"""
+    return decode_gray(to_gray(frame, max_side))
+
+
+def _image_frames(data):
+    frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if frame is None:
+        raise ValueError('Not a readable image')
+    yield frame
+
+
+def _video_frames(data, suffix, max_frames):
+    # OpenCV reads videos from a path, not from memory
+    with tempfile.NamedTemporaryFile(suffix=suffix) as clip:
+        clip.write(data)
+        clip.flush()
+        capture = cv2.VideoCapture(clip.name)
+        try:
+            if not capture.isOpened():
+                raise ValueError('Not a readable video')
+            read = 0
+            while read < max_frames:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                read += 1
+                yield frame
+        finally:
+            capture.release()
+
+
+def is_video(name, content_type=''):
+    return (content_type or '').startswith('video/') or os.path.splitext(name or '')[1].lower() in VIDEO_EXTENSIONS
+
+
+def decode_upload(name, data, content_type='', max_side=1024, duplicate_threshold=4.0, max_frames=300):
+    """
+    Decode one uploaded image or clip. Runs in a pool worker.
+
+    Args:
+        name: Upload file name (its extension tells videos from images)
+        data: File contents
+        content_type: Upload content type, if known
+        max_side: Downscale limit passed to to_gray()
+        duplicate_threshold: Mean grey level difference below which a frame is skipped
+        max_frames: Frames read at most from a clip
+
+    Returns:
+        dict: {'name', 'frames', 'decoded_frames', 'skipped_frames', 'values', 'error'}, where values
+              holds each distinct decoded string once, in first-seen order
+    """
+    result = {'name': name, 'frames': 0, 'decoded_frames': 0, 'skipped_frames': 0, 'values': [], 'error': None}
+    if is_video(name, content_type):
+        frames = _video_frames(data, os.path.splitext(name or '')[1] or '.mp4', max_frames)
+    else:
+        frames = _image_frames(data)
+
+    seen = set()
+    previous = None
+    try:
+        for frame in frames:
+            result['frames'] += 1
+            gray = to_gray(frame, max_side)
+            current = signature(gray)
+            if is_near_duplicate(current, previous, duplicate_threshold):
+                result['skipped_frames'] += 1
+                continue
+            previous = current
+            result['decoded_frames'] += 1
+            for value in decode_gray(gray):
+                if value not in seen:
+                    seen.add(value)
+                    result['values'].append(value)
+    except (ValueError, cv2.error) as e:
+        result['error'] = str(e)
+    return result
+
+
+def _init_worker():
+    # One OpenCV thread per worker process; the pool provides the parallelism
+    cv2.setNumThreads(1)
+
+
+def create_pool(workers):
+    """Process pool for decode_upload, using spawn so no server state is inherited"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context('spawn'), initializer=_init_worker)
+
+
+def get_pool(workers):
+    """Shared decoding pool of this process, created on first use"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = create_pool(workers)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def decode_uploads(uploads, workers=0, pool=None, **options):
+    """
+    Decode several uploads, in parallel when workers > 0.
+
+    Args:
+        uploads: Iterable of (name, data, content_type) tuples
+        workers: Pool size; 0 decodes in the calling process
+        pool: Executor to use instead of the shared pool
+        **options: Passed to decode_upload()
+
+    Returns:
+        list: One decode_upload() result per upload, in order
+    """
+    uploads = list(uploads)
+    if not workers and pool is None:
+        return [decode_upload(name, data, content_type, **options) for name, data, content_type in uploads]
+    pool = pool or get_pool(workers)
+    futures = [pool.submit(decode_upload, name, data, content_type, **options) for name, data, content_type in uploads]
+    return [future.result() for future in futures]
@@ -1,5 +1,6 @@
 import cv2
-from pyzbar.pyzbar import decode
+
+from event.qr_decoder import decode_frame
 
 def scan_qr_from_camera():
     """
@@ -15,8 +16,7 @@ def scan_qr_from_camera():
         if not ret:
             break
 
-        for barcode in decode(frame):
-            qr_hash = barcode.data.decode('utf-8')
+        for qr_hash in decode_frame(frame):
             print("QR Detected:", qr_hash)
             cap.release()
             cv2.destroyAllWindows()
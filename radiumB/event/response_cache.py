@@ -0,0 +1,153 @@
+"""
+Versioned response cache for the public event endpoints
+
+Cached responses are keyed on the view, the current version of every scope the
+response depends on, the scheme and host the request came in on (payloads hold
+absolute image URLs) and the normalised query string. Signals bump a scope's
+version whenever something it covers changes, so stale entries are never read
+again and simply age out. Only version counters are written on invalidation,
+which keeps it precise on a shared cache (file or Redis). With a per-process
+locmem cache a bump only reaches the worker that made it, so turn
+RESPONSE_CACHE_ENABLED on there only when a single process serves requests.
+
+Scopes:
+    'events'      anything shown in event listings
+    'event:<id>'  a single event's detail and guide
+    'categories'  the category list and every category display name
+
+Registrations and cancellations bump only the event's own scope, unless the
+event fills up or gets a free seat again (see invalidate_seats), so a
+registration rush does not flush every listing on each sign-up. Participant
+counts in listings may lag by up to RESPONSE_CACHE_TIMEOUT.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import urlencode
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'event_cache:version:{}'
+RESPONSE_KEY = 'event_cache:response:{}:{}:{}'
+
+
+def _fresh_version():
+    # Start from the clock rather than 1 so a version evicted from the cache can
+    # never come back as a number that old entries were stored under
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    """Current version of each scope, initialising missing ones"""
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _fresh_version(), None)
+            version = cache.get(key)
+        versions.append(str(version))
+    return versions
+
+
+def bump_version(*scopes):
+    """Invalidate every cached response that depends on any of the scopes"""
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _fresh_version(), None)
+
+
+def invalidate_event(event_id):
+    """An event changed in a way that shows up in listings and on its detail page"""
+    bump_version('events', f'event:{event_id}')
+
+
+def invalidate_seats(event_id, confirmed_count, max_participants, delta):
+    """
+    An event's confirmed participants changed by delta.
+
+    Args:
+        event_id: Event whose seats changed
+        confirmed_count: Confirmed participants after the change
+        max_participants: The event's capacity (None or 0 for unlimited)
+        delta: Change in confirmed participants
+    """
+    scopes = [f'event:{event_id}']
+    if max_participants and max_participants > 0:
+        # Listings show whether registration is open, which flips when the event fills up or frees a seat
+        if (confirmed_count >= max_participants) != (confirmed_count - delta >= max_participants):
+            scopes.append('events')
+    bump_version(*scopes)
+
+
+def normalise_query(query_dict):
+    """Stable representation of the query string: sorted, empty values dropped"""
+    items = sorted(
+        (key, value)
+        for key in query_dict
+        for value in query_dict.getlist(key)
+        if value != ''
+    )
+    return urlencode(items)
+
+
+def compute_etag(data):
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return '"{}"'.format(hashlib.md5(payload.encode()).hexdigest())
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    candidates = {value.strip().removeprefix('W/') for value in header.split(',')}
+    return '*' in candidates or etag in candidates
+
+
+def cache_response(*scopes):
+    """
+    Cache a GET handler's 200 responses under the given scopes.
+
+    Scopes may reference URL kwargs, e.g. 'event:{pk}'. Responses carry an ETag
+    and a matching If-None-Match gets an empty 304.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.RESPONSE_CACHE_ENABLED:
+                return method(self, request, *args, **kwargs)
+
+            resolved = [scope.format(**kwargs) for scope in scopes]
+            origin = request.build_absolute_uri('/')
+            query_hash = hashlib.md5(f'{origin}?{normalise_query(request.GET)}'.encode()).hexdigest()
+            key = RESPONSE_KEY.format(type(self).__name__, '.'.join(get_versions(resolved)), query_hash)
+
+            entry = cache.get(key)
+            if entry is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                entry = {'data': response.data, 'etag': compute_etag(response.data)}
+                cache.set(key, entry, settings.RESPONSE_CACHE_TIMEOUT)
+                cache_status = 'MISS'
+            else:
+                response = Response(entry['data'], status=status.HTTP_200_OK)
+                cache_status = 'HIT'
+
+            if _etag_matches(request, entry['etag']):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+
+            response['ETag'] = entry['etag']
+            response['X-Cache'] = cache_status
+            return response
+        return wrapper
+    return decorator
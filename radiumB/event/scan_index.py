@@ -0,0 +1,137 @@
+"""
+Attendance scan index
+
+At gate-open every OD entry of the event is written to the Django cache under
+its own key, scan:<event_id>:<hash>, holding the handful of fields the gate
+screen shows. A scan is then one cache read plus a conditional
+UPDATE ... WHERE attendance = false, which both marks the entry and tells a
+first scan from a repeat without a read-modify-write race between scanners.
+
+Entries only hold identity data, never attendance state, so they need no
+invalidation when attendance changes. A hash missing from the cache (OD entry
+created after gate-open, or evicted) falls back to a single indexed query and
+is cached for the next scan; deleted OD entries are dropped by a signal.
+
+Signed QR tokens (see qr_tokens.py) are checked before the cache: a forged
+token or one issued for another event is rejected without any lookup, and a
+genuine one missing from the cache is fetched by its participant ID.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import EventStats, ODList
+from .qr_tokens import check_scan
+
+ENTRY_KEY = 'scan:{}:{}'
+
+ENTRY_FIELDS = (
+    'id',
+    'participant_id',
+    'participant__user__first_name',
+    'participant__user__last_name',
+    'participant__user__username',
+    'participant__user__email',
+    'participant__user__profile__rollno',
+    'participant__user__profile__department',
+)
+
+
+def _entry(row):
+    """Compact gate payload for one OD entry"""
+    name = f"{row['participant__user__first_name']} {row['participant__user__last_name']}".strip()
+    return {
+        'od_id': row['id'],
+        'participant_id': row['participant_id'],
+        'name': name or row['participant__user__username'],
+        'email': row['participant__user__email'],
+        'rollno': row['participant__user__profile__rollno'] or '',
+        'department': row['participant__user__profile__department'] or '',
+    }
+
+
+def open_gate(event_id):
+    """
+    Load every OD entry of the event into the scan index.
+
+    Args:
+        event_id: Event ID
+
+    Returns:
+        int: Number of entries loaded
+    """
+    rows = ODList.objects.filter(event_id=event_id).values('hash', *ENTRY_FIELDS)
+    batch = {}
+    loaded = 0
+    for row in rows.iterator(chunk_size=settings.EXPORT_CHUNK_SIZE):
+        batch[ENTRY_KEY.format(event_id, row['hash'])] = _entry(row)
+        if len(batch) >= settings.SCAN_INDEX_BATCH_SIZE:
+            cache.set_many(batch, settings.SCAN_INDEX_TIMEOUT)
+            loaded += len(batch)
+            batch = {}
+    if batch:
+        cache.set_many(batch, settings.SCAN_INDEX_TIMEOUT)
+        loaded += len(batch)
+    return loaded
+
+
+def lookup(event_id, hash_value):
+    """
+    Find the OD entry for a scanned hash.
+
+    Returns:
+        dict: Compact entry, or None if the hash does not belong to the event
+    """
+    valid, claims = check_scan(event_id, hash_value)
+    if not valid:
+        return None
+
+    key = ENTRY_KEY.format(event_id, hash_value)
+    entry = cache.get(key)
+    if entry is not None:
+        return entry
+
+    if claims is not None:
+        # Resolved by the participant key; the stored value must still match in case the QR was reissued
+        row = (
+            ODList.objects.filter(participant_id=claims.participant_id, event_id=event_id)
+            .values('hash', *ENTRY_FIELDS)
+            .first()
+        )
+        if row is not None and row['hash'] != hash_value:
+            row = None
+    else:
+        row = ODList.objects.filter(event_id=event_id, hash=hash_value).values(*ENTRY_FIELDS).first()
+    if row is None:
+        return None
+    entry = _entry(row)
+    cache.set(key, entry, settings.SCAN_INDEX_TIMEOUT)
+    return entry
+
+
+def forget(event_id, hash_value):
+    cache.delete(ENTRY_KEY.format(event_id, hash_value))
+
+
+def mark_present(event_id, entry, scanner_id=''):
+    """
+    Mark the entry's attendance if it is not marked yet.
+
+    Args:
+        event_id: Event ID
+        entry: Entry returned by lookup()
+        scanner_id: Optional ID of the scanning device
+
+    Returns:
+        str: 'marked', 'already_marked' or 'missing' (entry deleted since it was cached)
+    """
+    marked = ODList.objects.filter(pk=entry['od_id'], attendance=False).update(
+        attendance=True, attendance_marked_at=timezone.now(), scanned_by=str(scanner_id or '')[:64]
+    )
+    if marked:
+        # Queryset updates skip the stats signals
+        EventStats.apply_delta(event_id, attended=1)
+        return 'marked'
+    if ODList.objects.filter(pk=entry['od_id']).exists():
+        return 'already_marked'
+    return 'missing'
@@ -0,0 +1,181 @@
+"""
+Full-text search over events
+
+One entry point, search_events(), backed by whichever index the database offers:
+
+- PostgreSQL: Event.search_vector (a weighted tsvector over name and
+  description) with a GIN index, ranked by ts_rank.
+- SQLite: an FTS5 table (event_search_fts) keyed by event ID, ranked by bm25.
+- Anything else: a plain icontains filter.
+
+Both indexes are kept in sync by the Event signals in signals.py and can be
+rebuilt with `python manage.py rebuild_search_index`.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import Event
+
+FTS_TABLE = 'event_search_fts'
+
+# Word characters without the underscore, which the tsquery parser would split on anyway
+_TERM_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+_sqlite_table_ready = False
+
+
+def search_backend():
+    """Name of the search backend used for the default database"""
+    if connection.vendor == 'postgresql':
+        return 'postgresql'
+    if connection.vendor == 'sqlite':
+        return 'sqlite_fts5'
+    return 'icontains'
+
+
+def parse_terms(query):
+    """Split a search box query into lowercase terms"""
+    return _TERM_RE.findall((query or '').lower())[:settings.SEARCH_MAX_TERMS]
+
+
+def tsquery_for(terms):
+    """
+    Raw PostgreSQL tsquery matching every term as a prefix.
+
+    Terms come from parse_terms(), so they contain no tsquery operators or quotes.
+    """
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def fts_match_for(terms):
+    """FTS5 MATCH expression matching every term as a prefix, each quoted as a string"""
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+def _ensure_sqlite_table(cursor):
+    """Create the FTS5 table on first use (also covers test databases built without migrations)"""
+    global _sqlite_table_ready
+    if _sqlite_table_ready:
+        return
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "event_name, description, tokenize='porter unicode61', prefix='2 3 4')"
+    )
+    # DDL inside a transaction can still be rolled back, so only trust it once committed
+    if not connection.in_atomic_block:
+        _sqlite_table_ready = True
+
+
+def _postgres_vector():
+    from django.contrib.postgres.search import SearchVector
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector('event_name', weight='A', config=config)
+        + SearchVector('description', weight='B', config=config)
+    )
+
+
+def index_event(event):
+    """Add or refresh one event in the search index"""
+    backend = search_backend()
+    if backend == 'postgresql':
+        Event.objects.filter(pk=event.pk).update(search_vector=_postgres_vector())
+    elif backend == 'sqlite_fts5':
+        with connection.cursor() as cursor:
+            _ensure_sqlite_table(cursor)
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [event.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, event_name, description) VALUES (%s, %s, %s)",
+                [event.pk, event.event_name or '', event.description or '']
+            )
+
+
+def unindex_event(event_id):
+    """Remove a deleted event from the search index"""
+    if search_backend() == 'sqlite_fts5':
+        with connection.cursor() as cursor:
+            _ensure_sqlite_table(cursor)
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [event_id])
+
+
+def rebuild_search_index():
+    """
+    Rebuild the search index for every event.
+
+    Returns:
+        int: Number of events indexed
+    """
+    backend = search_backend()
+    if backend == 'postgresql':
+        return Event.objects.update(search_vector=_postgres_vector())
+    if backend == 'sqlite_fts5':
+        with connection.cursor() as cursor:
+            _ensure_sqlite_table(cursor)
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, event_name, description) "
+                f"SELECT id, event_name, COALESCE(description, '') FROM {Event._meta.db_table}"
+            )
+            return cursor.rowcount
+    return 0
+
+
+def search_events(query, queryset=None, event_type=None, payment_type=None):
+    """
+    Search events by name and description.
+
+    Every term is matched as a prefix, so partial words typed into the search
+    box match, and all terms must match. Name matches rank above description
+    matches.
+
+    Args:
+        query: Raw search string
+        queryset: Events to search within (default: all events)
+        event_type: Optional category ID filter
+        payment_type: Optional 'free'/'paid' filter
+
+    Returns:
+        QuerySet: Matching events ordered by relevance, annotated with search_rank
+    """
+    events = Event.objects.all() if queryset is None else queryset
+    if event_type:
+        events = events.filter(event_type=event_type)
+    if payment_type:
+        events = events.filter(payment_type=payment_type)
+
+    terms = parse_terms(query)
+    if not terms:
+        return events
+
+    backend = search_backend()
+    if backend == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+        search_query = SearchQuery(
+            tsquery_for(terms),
+            search_type='raw',
+            config=settings.SEARCH_CONFIG
+        )
+        return events.filter(search_vector=search_query).annotate(
+            search_rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-search_rank', '-event_date')
+
+    if backend == 'sqlite_fts5':
+        with connection.cursor() as cursor:
+            _ensure_sqlite_table(cursor)
+        match = fts_match_for(terms)
+        # bm25() is lower-is-better and only available on the FTS table itself,
+        # so join it in rather than going through a subquery per row
+        return events.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {Event._meta.db_table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-bm25({FTS_TABLE}, 10.0, 1.0)'},
+        ).order_by('-search_rank', '-event_date')
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(event_name__icontains=term) | Q(description__icontains=term)
+    return events.filter(condition)
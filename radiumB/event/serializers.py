@@ -189,22 +189,45 @@ class EventSerializer(serializers.ModelSerializer):
         return data
 
 class EventListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for event listings"""
+    """
+    Lightweight serializer for event listings
+
+    Expects a queryset from Event.objects.for_listing() so the category, the
+    questions and the upcoming/registration-open flags come without per-row queries.
+    """
 
     event_type_display = serializers.CharField(source='get_event_type_display', read_only=True)
     payment_type_display = serializers.CharField(source='get_payment_type_display', read_only=True)
-    is_upcoming = serializers.ReadOnlyField()
+    is_upcoming = serializers.SerializerMethodField()
+    is_registration_open = serializers.SerializerMethodField()
+    get_current_participants = serializers.IntegerField(source='confirmed_count', read_only=True)
     event_image_url = serializers.SerializerMethodField()
     require_registration_form = serializers.BooleanField(read_only=True)
     questions = EventQuestionSerializer(many=True, read_only=True)
 
+    def get_is_upcoming(self, obj):
+        if hasattr(obj, 'annotated_is_upcoming'):
+            return obj.annotated_is_upcoming
+        return obj.is_upcoming
+
+    def get_is_registration_open(self, obj):
+        if hasattr(obj, 'annotated_is_registration_open'):
+            return obj.annotated_is_registration_open
+        return obj.is_registration_open
+
     def get_event_image_url(self, obj):
         """Return the full URL of the event image"""
         if obj.event_image:
+            url = obj.event_image.url
             request = self.context.get('request')
+            if request and url.startswith('/'):
+                # The child serializer is shared by every row, so the host is resolved once per response
+                if not hasattr(self, '_absolute_base'):
+                    self._absolute_base = request.build_absolute_uri('/').rstrip('/')
+                return self._absolute_base + url
             if request:
-                return request.build_absolute_uri(obj.event_image.url)
-            return obj.event_image.url
+                return request.build_absolute_uri(url)
+            return url
         return None
 
     class Meta:
@@ -212,7 +235,8 @@ class EventListSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'event_name', 'description', 'event_date', 'event_type', 'event_type_display',
             'payment_type', 'payment_type_display', 'venue', 'event_image', 'event_image_url', 'event_video', 'video_url',
-            'require_registration_form', 'questions', 'is_active', 'is_upcoming'
+            'require_registration_form', 'questions', 'is_active', 'is_upcoming', 'is_registration_open',
+            'get_current_participants'
         ]
 
 class ODListSerializer(serializers.ModelSerializer):
@@ -263,18 +287,26 @@ class ParticipantSerializer(serializers.ModelSerializer):
             'display_name': user.get_full_name() or user.username,
         }
 
+    def _od_entry(self, obj):
+        # .all() is served from prefetch_related('registered_participants') when present
+        return next(iter(obj.registered_participants.all()), None)
+
     def get_attendance(self, obj):
         """Return attendance status from ODList"""
+        if hasattr(obj, 'od_attendance'):
+            return bool(obj.od_attendance)
         try:
-            od_entry = obj.registered_participants.first()
+            od_entry = self._od_entry(obj)
             return od_entry.attendance if od_entry else False
         except:
             return False
 
     def get_hash(self, obj):
         """Return the QR hash from ODList"""
+        if hasattr(obj, 'od_hash'):
+            return obj.od_hash
         try:
-            od_entry = obj.registered_participants.first()
+            od_entry = self._od_entry(obj)
             return od_entry.hash if od_entry else None
         except:
             return None
@@ -283,6 +315,39 @@ class ParticipantSerializer(serializers.ModelSerializer):
         model = Participant
         fields = '__all__'
 
+
+class StaffParticipantSerializer(serializers.ModelSerializer):
+    """
+    Flat participant row for staff listings
+
+    Expects a queryset from Participant.objects.with_od_fields() with the user
+    selected; the event is serialized once by the view rather than per row.
+    """
+    user = serializers.SerializerMethodField()
+    attendance = serializers.SerializerMethodField()
+    hash = serializers.CharField(source='od_hash', read_only=True, allow_null=True)
+
+    def get_user(self, obj):
+        user = obj.user
+        return {
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'display_name': user.get_full_name() or user.username,
+        }
+
+    def get_attendance(self, obj):
+        return bool(obj.od_attendance)
+
+    class Meta:
+        model = Participant
+        fields = [
+            'id', 'user', 'registration_status', 'payment_status', 'registered_at',
+            'updated_at', 'answers', 'attendance', 'hash'
+        ]
+
 class ParticipantListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Participant
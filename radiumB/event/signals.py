@@ -0,0 +1,273 @@
+"""
+Signal handlers for the event app, connected in EventConfig.ready()
+"""
+import logging
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import (
+    Event, EventCategory, EventGuide, EventQuestion, EventStats, ODList, Participant, UserScheduleSlot
+)
+from .qr_cache import get_qr_cache
+from .response_cache import bump_version, invalidate_event, invalidate_seats
+from .scan_index import forget as forget_scan_entry
+from .search import index_event, unindex_event
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=ODList)
+def prerender_qr_code(sender, instance, created, **kwargs):
+    """Render the QR PNG once the new OD entry is committed so every send reuses it"""
+    if not created or not instance.hash:
+        return
+    if getattr(instance.event, 'event_mode', 'offline') == 'online':
+        return
+    od_list_id, payload = instance.pk, instance.hash
+
+    def warm():
+        try:
+            get_qr_cache().warm(payload)
+        except Exception:
+            # The email worker renders it on first use instead
+            logger.warning("Failed to pre-render QR for OD #%s", od_list_id, exc_info=True)
+
+    # Not inside the registration transaction, and not at all for a registration that rolls back
+    transaction.on_commit(warm)
+
+
+@receiver(post_delete, sender=ODList)
+def remove_scan_entry(sender, instance, **kwargs):
+    """Stop a deleted OD entry's QR from being accepted at the gate"""
+    forget_scan_entry(instance.event_id, instance.hash)
+
+
+_UNKNOWN = object()
+
+
+@receiver(post_init, sender=Participant)
+def remember_counted_status(sender, instance, **kwargs):
+    """Remember the status the confirmed counter currently reflects for this row"""
+    if not instance.pk:
+        instance._counted_status = instance._counted_event_id = None
+    else:
+        # Read through __dict__ so deferred fields are not fetched one row at a time
+        instance._counted_status = instance.__dict__.get('registration_status', _UNKNOWN)
+        instance._counted_event_id = instance.__dict__.get('event_id', _UNKNOWN)
+
+
+def _invalidate_seats(instance, event_id, delta):
+    event = instance._state.fields_cache.get('event')
+    if event is not None and event.pk == event_id and not (event.max_participants and event.max_participants > 0):
+        # Unlimited events never fill up, so the current count is not needed
+        invalidate_seats(event_id, event.confirmed_count, None, delta)
+        return
+    # A loaded event's counter may be behind other registrations, so read the row
+    row = Event.objects.filter(pk=event_id).values_list('confirmed_count', 'max_participants').first()
+    if row is None:
+        bump_version(f'event:{event_id}')
+    else:
+        invalidate_seats(event_id, row[0], row[1], delta)
+
+
+def _adjust_confirmed_count(instance, event_id, delta):
+    if Event.adjust_confirmed_count(event_id, delta):
+        _invalidate_seats(instance, event_id, delta)
+    # Keep an already loaded event in step so capacity checks later in the request see the new value
+    event = instance._state.fields_cache.get('event')
+    if event is not None and event.pk == event_id:
+        event.confirmed_count = max(event.confirmed_count + delta, 0)
+
+
+@receiver(post_save, sender=Participant)
+def update_schedule_slot(sender, instance, created, **kwargs):
+    """Keep the user's busy interval in step with the registration"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'registration_status', 'event'} & set(update_fields):
+        return
+    if (not created
+            and instance._counted_status == instance.registration_status
+            and instance._counted_event_id == instance.event_id):
+        return
+    UserScheduleSlot.sync_participant(instance)
+
+
+@receiver(post_save, sender=Event)
+def move_schedule_slots(sender, instance, created, **kwargs):
+    """Move participants' busy intervals when the event is rescheduled"""
+    if created:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'event_date', 'start_time', 'end_time'} & set(update_fields):
+        return
+    UserScheduleSlot.sync_event(instance)
+
+
+@receiver(post_save, sender=Participant)
+def update_confirmed_count_on_save(sender, instance, created, **kwargs):
+    """Keep Event.confirmed_count in step when a participant is created, confirmed or cancelled"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'registration_status', 'event'} & set(update_fields):
+        return
+    if _UNKNOWN in (instance._counted_status, instance._counted_event_id):
+        # Loaded with deferred fields; the reconcile command repairs any drift
+        instance._counted_status = instance.registration_status
+        instance._counted_event_id = instance.event_id
+        return
+
+    if created and getattr(instance, '_seat_reserved', False):
+        # The seat was already counted by Event.reserve_seat()
+        _invalidate_seats(instance, instance.event_id, 1)
+        instance._counted_status = instance.registration_status
+        instance._counted_event_id = instance.event_id
+        return
+
+    was_confirmed = instance._counted_status == 'confirmed'
+    is_confirmed = instance.registration_status == 'confirmed'
+
+    if was_confirmed and instance._counted_event_id != instance.event_id:
+        _adjust_confirmed_count(instance, instance._counted_event_id, -1)
+        was_confirmed = False
+
+    if is_confirmed and not was_confirmed:
+        _adjust_confirmed_count(instance, instance.event_id, 1)
+    elif was_confirmed and not is_confirmed:
+        _adjust_confirmed_count(instance, instance.event_id, -1)
+
+    instance._counted_status = instance.registration_status
+    instance._counted_event_id = instance.event_id
+
+
+@receiver(post_delete, sender=Participant)
+def update_confirmed_count_on_delete(sender, instance, **kwargs):
+    if instance._counted_status == 'confirmed':
+        _adjust_confirmed_count(instance, instance._counted_event_id, -1)
+    instance._counted_status = None
+
+
+@receiver(post_save, sender=Event)
+def update_search_index(sender, instance, created, **kwargs):
+    """Refresh the event's full-text search entry when its name or description may have changed"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'event_name', 'description'} & set(update_fields):
+        return
+    try:
+        index_event(instance)
+    except Exception:
+        logger.exception("Failed to index event #%s for search", instance.pk)
+
+
+@receiver(post_delete, sender=Event)
+def remove_from_search_index(sender, instance, **kwargs):
+    try:
+        unindex_event(instance.pk)
+    except Exception:
+        logger.exception("Failed to remove event #%s from the search index", instance.pk)
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def invalidate_event_responses(sender, instance, **kwargs):
+    invalidate_event(instance.pk)
+
+
+@receiver(post_save, sender=EventQuestion)
+@receiver(post_delete, sender=EventQuestion)
+def invalidate_question_responses(sender, instance, **kwargs):
+    # Questions are nested in both the listings and the detail page
+    invalidate_event(instance.event_id)
+
+
+@receiver(post_save, sender=EventGuide)
+@receiver(post_delete, sender=EventGuide)
+def invalidate_guide_responses(sender, instance, **kwargs):
+    bump_version(f'event:{instance.event_id}')
+
+
+@receiver(post_save, sender=EventCategory)
+@receiver(post_delete, sender=EventCategory)
+def invalidate_category_responses(sender, instance, **kwargs):
+    bump_version('categories')
+
+
+# ========== EVENT STATS ==========
+
+def _participant_stats(values):
+    eligible = values['registration_status'] == 'confirmed' and values['payment_status']
+    return {'registered': 1, 'eligible': int(bool(eligible)), 'paid': int(bool(values['payment_status']))}
+
+
+def _od_list_stats(values):
+    return {'od_created': 1, 'qr_sent': int(values['qr_sent']), 'attended': int(values['attendance'])}
+
+
+def _payment_stats(values):
+    return {'revenue': values['amount'] if values['status'] == 'success' else 0}
+
+
+# model label -> (fields the stats depend on, function turning their values into counter contributions)
+_STATS_SOURCES = {
+    'event.Participant': (('registration_status', 'payment_status'), _participant_stats),
+    'event.ODList': (('qr_sent', 'attendance'), _od_list_stats),
+    'payment.Payment': (('status', 'amount'), _payment_stats),
+}
+
+
+def _stats_values(instance, fields):
+    # Read through __dict__ so deferred fields are not fetched one row at a time
+    values = {name: instance.__dict__.get(name, _UNKNOWN) for name in ('event_id', *fields)}
+    return _UNKNOWN if _UNKNOWN in values.values() else values
+
+
+@receiver(post_init, sender=Participant)
+@receiver(post_init, sender=ODList)
+@receiver(post_init, sender='payment.Payment')
+def remember_stats_values(sender, instance, **kwargs):
+    """Remember the values the event stats currently reflect for this row"""
+    fields, _ = _STATS_SOURCES[sender._meta.label]
+    instance._stats_values = _stats_values(instance, fields)
+
+
+@receiver(post_save, sender=Participant)
+@receiver(post_save, sender=ODList)
+@receiver(post_save, sender='payment.Payment')
+def update_event_stats_on_save(sender, instance, created, **kwargs):
+    """Apply the difference this row makes to its event's stats"""
+    fields, contribution = _STATS_SOURCES[sender._meta.label]
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'event', *fields} & set(update_fields):
+        return
+
+    # Payments get their UUID before they are saved, so only `created` tells new rows apart
+    old = None if created else instance._stats_values
+    new = instance._stats_values = _stats_values(instance, fields)
+    if _UNKNOWN in (old, new):
+        # Loaded with deferred fields; rebuild_event_stats repairs any drift
+        return
+
+    deltas = {new['event_id']: contribution(new)}
+    if old is not None:
+        old_deltas = deltas.setdefault(old['event_id'], {})
+        for name, value in contribution(old).items():
+            old_deltas[name] = old_deltas.get(name, 0) - value
+    for event_id, event_deltas in deltas.items():
+        EventStats.apply_delta(event_id, **event_deltas)
+
+
+@receiver(post_delete, sender=Participant)
+@receiver(post_delete, sender=ODList)
+@receiver(post_delete, sender='payment.Payment')
+def update_event_stats_on_delete(sender, instance, **kwargs):
+    _, contribution = _STATS_SOURCES[sender._meta.label]
+    old = getattr(instance, '_stats_values', _UNKNOWN)
+    if old is not _UNKNOWN:
+        EventStats.apply_delta(old['event_id'], **{name: -value for name, value in contribution(old).items()})
+    instance._stats_values = None
+
+
+@receiver(post_save, sender=Event)
+def create_event_stats(sender, instance, created, **kwargs):
+    if created:
+        EventStats.objects.get_or_create(event_id=instance.pk)
@@ -1 +1,797 @@
-from django.test import TestCase
+import smtplib
+import struct
+from datetime import time, timedelta
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from .bulk_booking import _create_users, _prepare_users, bulk_book
+from .email_services import (
+    claim_outbox_batch, create_participant_with_od, enqueue_qr_email, process_email_outbox
+)
+from .models import EmailOutbox, Event, EventCategory, EventGuide, EventQuestion, EventStats, ODList, Participant
+from . import scan_index
+from .attendance_sync import FLAG_ATTENDED, FLAG_PACKED_HEX, MANIFEST_MAGIC, sync_scans
+from .qr_tokens import MAX_TOKEN_ID, issue_token, new_qr_value, verify_token
+from .search import fts_match_for, parse_terms, search_events, tsquery_for
+
+User = get_user_model()
+
+
+class EventListQueryBudgetTests(TestCase):
+    """The event list endpoints must issue a fixed number of queries regardless of page size"""
+
+    # Pagination count, the page of events with their category, and the questions prefetch
+    LIST_QUERY_BUDGET = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.categories = [
+            EventCategory.objects.create(code=f'cat{i}', display_name=f'Category {i}')
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def _create_events(self, count, **overrides):
+        events = []
+        for i in range(count):
+            data = dict(
+                event_name=f'Event {i}',
+                description='Description',
+                event_date=timezone.now() + timedelta(days=i + 1),
+                start_time=time(10, 0),
+                end_time=time(12, 0),
+                event_type=self.categories[i % len(self.categories)],
+                event_image=f'event_images/event_{i}.png',
+            )
+            data.update(overrides)
+            event = Event.objects.create(**data)
+            EventQuestion.objects.create(event=event, label='Name', question_type='short_text')
+            EventQuestion.objects.create(event=event, label='Team', question_type='short_text')
+            events.append(event)
+        return events
+
+    def test_list_query_count_is_constant(self):
+        self._create_events(5)
+        with self.assertNumQueries(self.LIST_QUERY_BUDGET):
+            response = self.client.get(reverse('event:event_list'), {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 5)
+
+        self._create_events(40)
+        with self.assertNumQueries(self.LIST_QUERY_BUDGET):
+            response = self.client.get(reverse('event:event_list'), {'page_size': 100})
+        self.assertEqual(len(response.data['results']), 45)
+
+    def test_upcoming_query_count_is_constant(self):
+        self._create_events(30)
+        with self.assertNumQueries(self.LIST_QUERY_BUDGET):
+            response = self.client.get(reverse('event:upcoming_events'), {'page_size': 100})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 30)
+
+    def test_list_payload(self):
+        event = self._create_events(1)[0]
+        response = self.client.get(reverse('event:event_list'))
+        row = response.data['results'][0]
+
+        self.assertEqual(row['event_type_display'], event.event_type.display_name)
+        self.assertEqual(len(row['questions']), 2)
+        self.assertTrue(row['event_image_url'].startswith('http://testserver/media/event_images/'))
+        self.assertTrue(row['is_upcoming'])
+        self.assertTrue(row['is_registration_open'])
+        self.assertEqual(row['get_current_participants'], 0)
+
+    def test_annotations_match_model_properties(self):
+        now = timezone.now()
+        cases = [
+            dict(event_date=now + timedelta(days=3)),
+            dict(event_date=now - timedelta(days=3)),
+            dict(event_date=now + timedelta(days=3), registration_deadline=now - timedelta(days=1)),
+            dict(event_date=now + timedelta(days=3), registration_deadline=now + timedelta(days=1)),
+            dict(event_date=now - timedelta(days=3), registration_deadline=now + timedelta(hours=1)),
+            dict(event_date=now + timedelta(days=3), max_participants=0),
+            dict(event_date=now + timedelta(days=3), max_participants=2),
+        ]
+        for overrides in cases:
+            self._create_events(1, **overrides)
+
+        full = Event.objects.get(max_participants=2)
+        Event.objects.filter(pk=full.pk).update(confirmed_count=2)
+
+        for event in Event.objects.for_listing():
+            self.assertEqual(event.annotated_is_upcoming, event.is_upcoming, event.event_date)
+            self.assertEqual(event.annotated_is_registration_open, event.is_registration_open, event.registration_deadline)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'response-cache-tests'}},
+    RESPONSE_CACHE_ENABLED=True,
+)
+class EventResponseCacheTests(TestCase):
+    """Public event endpoints are served from the response cache until something they show changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        self.event = Event.objects.create(
+            event_name='Robotics',
+            description='Description',
+            event_date=timezone.now() + timedelta(days=3),
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            event_type=self.category,
+        )
+
+    def test_list_is_cached_and_invalidated_on_save(self):
+        url = reverse('event:event_list')
+        first = self.client.get(url, {'page': 1, 'search': ''})
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(url, {'page': '1'})
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+        self.event.event_name = 'Robotics 2.0'
+        self.event.save()
+        third = self.client.get(url, {'page': 1})
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(third.data['results'][0]['event_name'], 'Robotics 2.0')
+
+    def test_etag_returns_not_modified(self):
+        url = reverse('event:event_detail', args=[self.event.pk])
+        first = self.client.get(url)
+        etag = first['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        EventQuestion.objects.create(event=self.event, label='Team', question_type='short_text')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_hosts_are_cached_separately(self):
+        url = reverse('event:event_detail', args=[self.event.pk])
+        self.assertEqual(self.client.get(url, HTTP_HOST='127.0.0.1')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url, HTTP_HOST='127.0.0.1')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(url, HTTP_HOST='localhost')['X-Cache'], 'MISS')
+
+    def test_invalidation_is_scoped(self):
+        other = Event.objects.create(
+            event_name='Other',
+            description='Description',
+            event_date=timezone.now() + timedelta(days=4),
+            event_type=self.category,
+        )
+        detail_url = reverse('event:event_detail', args=[self.event.pk])
+        categories_url = reverse('event:event_categories')
+        self.client.get(detail_url)
+        self.client.get(categories_url)
+
+        EventGuide.objects.create(event=other)
+        self.assertEqual(self.client.get(detail_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(categories_url)['X-Cache'], 'HIT')
+
+        self.category.display_name = 'Hands-on Workshop'
+        self.category.save()
+        self.assertEqual(self.client.get(categories_url)['X-Cache'], 'MISS')
+        response = self.client.get(detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['data']['event_type_display'], 'Hands-on Workshop')
+
+    def test_registration_keeps_listings_until_event_fills(self):
+        self.event.max_participants = 2
+        self.event.save()
+        list_url = reverse('event:event_list')
+        detail_url = reverse('event:event_detail', args=[self.event.pk])
+        self.client.get(list_url)
+        self.client.get(detail_url)
+
+        first = create_participant_with_od(User.objects.create_user(username='first'), self.event, send_email=False)
+        self.assertEqual(self.client.get(list_url)['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get(detail_url)['X-Cache'], 'MISS')
+
+        # The second seat fills the event, which listings show as registration closed
+        create_participant_with_od(User.objects.create_user(username='second'), self.event, send_email=False)
+        response = self.client.get(list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertFalse(response.data['results'][0]['is_registration_open'])
+
+        # Cancelling frees a seat and reopens registration
+        first['participant'].delete()
+        response = self.client.get(list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertTrue(response.data['results'][0]['is_registration_open'])
+
+
+class EventStatsTests(TestCase):
+    """EventStats is kept current incrementally and always agrees with a full recount"""
+
+    def setUp(self):
+        category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        self.event = Event.objects.create(
+            event_name='Robotics',
+            description='Description',
+            event_date=timezone.now() + timedelta(days=3),
+            event_type=category,
+            payment_type='paid',
+            price=100,
+        )
+        self.participants = [
+            Participant.objects.create(
+                user=User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com'),
+                event=self.event,
+                registration_status='confirmed' if i % 2 else 'pending',
+                payment_status=i < 3,
+            )
+            for i in range(6)
+        ]
+
+    def _counters(self):
+        stats = EventStats.objects.get(pk=self.event.pk)
+        return {name: getattr(stats, name) for name in EventStats.COUNTERS}
+
+    def assertMatchesRecount(self):
+        incremental = self._counters()
+        EventStats.refresh([self.event.pk])
+        self.assertEqual(incremental, self._counters())
+        return incremental
+
+    def test_counters_follow_saves_and_deletes(self):
+        stats = self.assertMatchesRecount()
+        self.assertEqual((stats['registered'], stats['eligible'], stats['paid']), (6, 1, 3))
+
+        first, second = self.participants[:2]
+        first.registration_status = 'confirmed'
+        first.save()
+        od_list = ODList.objects.create(participant=second, event=self.event)
+        od_list.qr_sent = True
+        od_list.attendance = True
+        od_list.save()
+        stats = self.assertMatchesRecount()
+        self.assertEqual((stats['eligible'], stats['od_created'], stats['qr_sent'], stats['attended']), (2, 1, 1, 1))
+
+        second.delete()
+        stats = self.assertMatchesRecount()
+        self.assertEqual((stats['registered'], stats['od_created'], stats['attended']), (5, 0, 0))
+
+    def test_missing_row_is_built_on_read(self):
+        EventStats.objects.all().delete()
+        Participant.objects.create(
+            user=User.objects.create_user(username='late', email='late@example.com'), event=self.event
+        )
+        self.assertEqual(EventStats.for_event(self.event).registered, 7)
+
+
+@override_settings(QR_TOKEN_FORMAT='signed')
+class SignedQRTokenTests(TestCase):
+    """Signed tokens are verified before any lookup and legacy hashes keep scanning"""
+
+    def setUp(self):
+        cache.clear()
+        category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        self.event, self.other_event = [
+            Event.objects.create(
+                event_name=name, description='Description', event_date=timezone.now() + timedelta(days=3),
+                event_type=category,
+            )
+            for name in ('Robotics', 'Quiz')
+        ]
+        self.participant = Participant.objects.create(
+            user=User.objects.create_user(username='scanned', email='scanned@example.com'),
+            event=self.event, registration_status='confirmed', payment_status=True,
+        )
+        self.od_list = ODList.objects.create(participant=self.participant, event=self.event)
+        scanner = User.objects.create_user(username='gate', email='gate@example.com', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(scanner)
+
+    def _scan(self, value, event=None):
+        url = reverse('event:attendance_qr', args=[(event or self.event).id])
+        return self.client.put(url, {'hash': value}, format='json')
+
+    def test_new_entries_get_compact_tokens(self):
+        claims = verify_token(self.od_list.hash)
+        self.assertEqual(len(self.od_list.hash), 37)
+        self.assertEqual((claims.participant_id, claims.event_id), (self.participant.id, self.event.id))
+
+    def test_ids_beyond_32_bits_fall_back_to_hash(self):
+        claims = verify_token(issue_token(MAX_TOKEN_ID, MAX_TOKEN_ID))
+        self.assertEqual((claims.participant_id, claims.event_id), (MAX_TOKEN_ID, MAX_TOKEN_ID))
+        with self.assertRaises(ValueError):
+            issue_token(MAX_TOKEN_ID + 1, self.event.id)
+        self.assertEqual(len(new_qr_value(self.participant.id, MAX_TOKEN_ID + 1, 'seed')), 64)
+
+        participant = Participant.objects.create(
+            id=MAX_TOKEN_ID + 1, user=User.objects.create_user(username='big', email='big@example.com'),
+            event=self.event, registration_status='confirmed', payment_status=True,
+        )
+        od_list = ODList.objects.create(participant=participant, event=self.event)
+        self.assertRegex(od_list.hash, r'^[0-9a-f]{64}$')
+        self.assertEqual(self._scan(od_list.hash).status_code, 200)
+
+    def test_forged_and_cross_event_tokens_never_reach_the_database(self):
+        forged = self.od_list.hash[:-2] + ('AA' if not self.od_list.hash.endswith('AA') else 'BB')
+        foreign = issue_token(self.participant.id, self.other_event.id)
+        for value, event in ((forged, self.event), (foreign, self.event), (self.od_list.hash, self.other_event)):
+            with self.assertNumQueries(0):
+                self.assertIsNone(scan_index.lookup(event.id, value))
+        self.assertEqual(self._scan(forged).status_code, 404)
+
+    def test_token_and_legacy_hash_scan(self):
+        self.assertEqual(self._scan(self.od_list.hash).status_code, 200)
+        self.assertEqual(self._scan(self.od_list.hash).status_code, 208)
+
+        legacy = ODList.objects.create(
+            participant=Participant.objects.create(
+                user=User.objects.create_user(username='legacy', email='legacy@example.com'), event=self.event
+            ),
+            event=self.event,
+            hash='ab' * 32,
+        )
+        self.assertEqual(self._scan(legacy.hash).status_code, 200)
+
+
+class SeatReservationTests(TestCase):
+    """confirmed_count never passes max_participants and stays equal to the confirmed participants"""
+
+    def setUp(self):
+        cache.clear()
+        category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        self.event = Event.objects.create(
+            event_name='Robotics',
+            description='Description',
+            event_date=timezone.now() + timedelta(days=3),
+            event_type=category,
+            max_participants=2,
+        )
+        self.users = [
+            User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com') for i in range(3)
+        ]
+
+    def _confirmed_count(self):
+        return Event.objects.get(pk=self.event.pk).confirmed_count
+
+    def test_full_event_rejects_registration(self):
+        for user in self.users[:2]:
+            self.assertTrue(create_participant_with_od(user, self.event)['success'])
+
+        result = create_participant_with_od(self.users[2], self.event)
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['reason'], 'event_full')
+        self.assertEqual(self._confirmed_count(), 2)
+        self.assertFalse(Participant.objects.filter(user=self.users[2]).exists())
+        self.assertEqual(self.event.reserve_seats(5), 0)
+
+    def test_reserve_seats_grants_what_is_left(self):
+        create_participant_with_od(self.users[0], self.event)
+
+        self.assertEqual(self.event.reserve_seats(5), 1)
+        self.assertEqual(self._confirmed_count(), 2)
+        self.assertFalse(self.event.reserve_seat())
+
+    def test_concurrent_duplicate_releases_the_seat(self):
+        existing = create_participant_with_od(self.users[0], self.event)['participant']
+        original_first = QuerySet.first
+        calls = []
+
+        def first_misses_once(queryset):
+            # The duplicate check runs before the other request's insert is visible
+            calls.append(queryset)
+            return None if len(calls) == 1 else original_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', autospec=True, side_effect=first_misses_once):
+            result = create_participant_with_od(self.users[0], self.event)
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['reason'], 'already_registered')
+        self.assertEqual(result['participant'], existing)
+        self.assertEqual(self._confirmed_count(), 1)
+        self.assertEqual(self.event.confirmed_count, 1)
+
+    def test_reconcile_confirmed_counts(self):
+        create_participant_with_od(self.users[0], self.event)
+        Participant.objects.create(user=self.users[1], event=self.event, registration_status='pending')
+        Event.objects.filter(pk=self.event.pk).update(confirmed_count=5)
+
+        drifted = Event.reconcile_confirmed_counts(dry_run=True)
+        self.assertEqual([(event.pk, stored, actual) for event, stored, actual in drifted], [(self.event.pk, 5, 1)])
+        self.assertEqual(self._confirmed_count(), 5)
+
+        Event.reconcile_confirmed_counts()
+        self.assertEqual(self._confirmed_count(), 1)
+        self.assertEqual(Event.reconcile_confirmed_counts(), [])
+
+
+class BulkBookingTests(TestCase):
+    """bulk_book matches existing users, creates the rest and books everyone the event has room for"""
+
+    def setUp(self):
+        cache.clear()
+        category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        self.event = Event.objects.create(
+            event_name='Robotics',
+            description='Description',
+            event_date=timezone.now() + timedelta(days=3),
+            event_type=category,
+            payment_type='paid',
+            price=100,
+            max_participants=4,
+        )
+
+    def _statuses(self, report):
+        return [result['status'] for result in report['results']]
+
+    def test_existing_users_are_matched_case_insensitively(self):
+        existing = User.objects.create_user(username='asha', email='Asha@Example.com')
+
+        report = bulk_book(self.event, [{'email': 'ASHA@example.com'}, {'user_id': str(existing.pk)}])
+
+        self.assertEqual(self._statuses(report), ['booked', 'duplicate'])
+        self.assertEqual(report['users_created'], 0)
+        self.assertEqual(report['results'][0]['user_id'], existing.pk)
+        self.assertTrue(Participant.objects.filter(event=self.event, user=existing, payment_status=True).exists())
+
+    def test_new_users_get_unique_usernames(self):
+        User.objects.create_user(username='john', email='john@other.com')
+
+        report = bulk_book(self.event, [
+            {'email': 'john@example.com', 'first_name': 'John', 'rollno': '2310'},
+            {'email': 'john@example.org'},
+        ])
+
+        self.assertEqual(report['users_created'], 2)
+        self.assertEqual([result['username'] for result in report['results']], ['john1', 'john2'])
+        created = User.objects.get(username='john1')
+        self.assertTrue(created.check_password('john1@2310'))
+        self.assertEqual(created.profile.rollno, '2310')
+
+    def test_username_taken_after_hashing_is_picked_again(self):
+        rows = [{'email': 'mira@example.com', 'first_name': 'Mira', 'last_name': 'K', 'rollno': ''}]
+        for field in ('department', 'degree', 'college_name', 'phone_number'):
+            rows[0][field] = ''
+        usernames, passwords = _prepare_users(rows)
+        User.objects.create_user(username=usernames[0], email='someone@else.com')
+
+        [user] = _create_users(rows, usernames, passwords)
+
+        self.assertEqual(user.username, 'mira1')
+        self.assertTrue(user.check_password('mirak@mira1'))
+
+    def test_invalid_duplicate_and_full_rows(self):
+        report = bulk_book(self.event, [
+            {'email': 'a@example.com'},
+            {'email': 'not-an-email'},
+            {'email': 'A@example.com'},
+            {'user_id': 'abc'},
+            {'user_id': '999999'},
+            {},
+            {'email': 'b@example.com'},
+            {'email': 'c@example.com'},
+            {'email': 'd@example.com'},
+            {'email': 'e@example.com'},
+        ])
+
+        self.assertEqual(self._statuses(report), [
+            'booked', 'invalid', 'duplicate', 'invalid', 'not_found', 'invalid',
+            'booked', 'booked', 'booked', 'event_full',
+        ])
+        self.assertEqual((report['booked'], report['event_full'], report['invalid']), (4, 1, 3))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.confirmed_count, 4)
+        self.assertEqual(Participant.objects.filter(event=self.event).count(), 4)
+
+    def test_unpaid_registration_is_approved(self):
+        user = User.objects.create_user(username='unpaid', email='unpaid@example.com')
+        participant = Participant.objects.create(user=user, event=self.event, payment_status=False)
+        paid = Participant.objects.create(
+            user=User.objects.create_user(username='paid', email='paid@example.com'),
+            event=self.event, payment_status=True,
+        )
+
+        report = bulk_book(self.event, [{'email': 'unpaid@example.com'}, {'email': 'paid@example.com'}])
+
+        self.assertEqual(self._statuses(report), ['booked', 'already_registered'])
+        self.assertEqual(report['results'][0]['participant_id'], participant.pk)
+        participant.refresh_from_db()
+        self.assertTrue(participant.payment_status)
+        self.assertTrue(ODList.objects.filter(participant=participant).exists())
+        self.assertFalse(ODList.objects.filter(participant=paid).exists())
+
+    def test_od_entries_outbox_and_stats(self):
+        report = bulk_book(self.event, [{'email': f'user{i}@example.com'} for i in range(3)])
+
+        self.assertEqual(report['emails_queued'], 3)
+        od_lists = ODList.objects.filter(event=self.event)
+        self.assertEqual(od_lists.count(), 3)
+        self.assertEqual(EmailOutbox.objects.filter(od_list__in=od_lists, status='pending').count(), 3)
+        stats = EventStats.objects.get(pk=self.event.pk)
+        self.assertEqual((stats.registered, stats.eligible, stats.paid, stats.od_created), (3, 3, 3, 3))
+
+        report = bulk_book(self.event, [{'email': 'user9@example.com'}], send_email=False)
+        self.assertEqual(report['emails_queued'], 0)
+        self.assertEqual(EmailOutbox.objects.count(), 3)
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Email backend whose every send fails, like an SMTP server rejecting the message"""
+
+    def send_messages(self, email_messages):
+        raise smtplib.SMTPException('Mailbox unavailable')
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_MAX_ATTEMPTS=3,
+    EMAIL_OUTBOX_BACKOFF_SECONDS=30,
+)
+class EmailOutboxTests(TestCase):
+    """Queued QR emails are sent by the worker, retried with backoff and reclaimed from crashed workers"""
+
+    def setUp(self):
+        category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        self.event = Event.objects.create(
+            event_name='Robotics', description='Description', event_date=timezone.now() + timedelta(days=3),
+            event_type=category,
+        )
+        participant = Participant.objects.create(
+            user=User.objects.create_user(username='mailed', email='mailed@example.com'),
+            event=self.event, registration_status='confirmed', payment_status=True,
+        )
+        self.od_list = ODList.objects.create(participant=participant, event=self.event)
+        self.entry = enqueue_qr_email(self.od_list)
+
+    def _make_due(self):
+        EmailOutbox.objects.filter(pk=self.entry.pk).update(next_attempt_at=timezone.now())
+
+    def test_sent_email_marks_qr_sent(self):
+        self.assertEqual(enqueue_qr_email(self.od_list), self.entry)
+
+        self.assertEqual(process_email_outbox(), {'claimed': 1, 'sent': 1, 'retrying': 0, 'failed': 0})
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['mailed@example.com'])
+        self.entry.refresh_from_db()
+        self.od_list.refresh_from_db()
+        self.assertEqual((self.entry.status, self.entry.attempts), ('sent', 1))
+        self.assertIsNotNone(self.entry.sent_at)
+        self.assertTrue(self.od_list.qr_sent)
+        self.assertEqual(EventStats.objects.get(pk=self.event.pk).qr_sent, 1)
+        self.assertIsNone(enqueue_qr_email(self.od_list))
+        self.assertEqual(process_email_outbox()['claimed'], 0)
+
+    @override_settings(EMAIL_BACKEND='event.tests.FailingEmailBackend')
+    def test_failures_back_off_then_give_up(self):
+        self.assertEqual(process_email_outbox(), {'claimed': 1, 'sent': 0, 'retrying': 1, 'failed': 0})
+        self.entry.refresh_from_db()
+        self.assertEqual((self.entry.status, self.entry.attempts), ('pending', 1))
+        self.assertIn('Mailbox unavailable', self.entry.last_error)
+        first_delay = self.entry.next_attempt_at - timezone.now()
+        self.assertGreater(first_delay, timedelta(seconds=25))
+        self.assertLessEqual(first_delay, timedelta(seconds=60))
+
+        # Not due yet
+        self.assertEqual(process_email_outbox()['claimed'], 0)
+
+        self._make_due()
+        self.assertEqual(process_email_outbox()['retrying'], 1)
+        self.entry.refresh_from_db()
+        self.assertGreater(self.entry.next_attempt_at - timezone.now(), timedelta(seconds=55))
+
+        self._make_due()
+        self.assertEqual(process_email_outbox(), {'claimed': 1, 'sent': 0, 'retrying': 0, 'failed': 1})
+        self.entry.refresh_from_db()
+        self.od_list.refresh_from_db()
+        self.assertEqual((self.entry.status, self.entry.attempts), ('failed', 3))
+        self.assertFalse(self.od_list.qr_sent)
+        self._make_due()
+        self.assertEqual(process_email_outbox()['claimed'], 0)
+
+    def test_claimed_entries_are_not_claimed_twice(self):
+        self.assertEqual(len(claim_outbox_batch(10)), 1)
+        self.assertEqual(claim_outbox_batch(10), [])
+
+    def test_expired_lease_is_reclaimed(self):
+        claim_outbox_batch(10)
+        EmailOutbox.objects.filter(pk=self.entry.pk).update(
+            locked_at=timezone.now() - timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS + 1)
+        )
+
+        self.assertEqual(process_email_outbox()['sent'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+
+@override_settings(QR_TOKEN_FORMAT='signed')
+class AttendanceSyncTests(TestCase):
+    """Offline scan batches keep the earliest scan per QR and reject what the device should not have"""
+
+    def setUp(self):
+        category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        self.event, self.other_event = [
+            Event.objects.create(
+                event_name=name, description='Description', event_date=timezone.now() + timedelta(days=3),
+                event_type=category,
+            )
+            for name in ('Robotics', 'Quiz')
+        ]
+        self.od_lists = []
+        for i in range(3):
+            participant = Participant.objects.create(
+                user=User.objects.create_user(username=f'user{i}', email=f'user{i}@example.com', first_name=f'U{i}'),
+                event=self.event, registration_status='confirmed', payment_status=True,
+            )
+            self.od_lists.append(ODList.objects.create(participant=participant, event=self.event))
+        self.legacy = self.od_lists[2]
+        ODList.objects.filter(pk=self.legacy.pk).update(hash='ab' * 32, attendance=True)
+        EventStats.refresh([self.event.pk])
+        self.legacy.refresh_from_db()
+
+    def _at(self, minutes_ago):
+        return timezone.now() - timedelta(minutes=minutes_ago)
+
+    def test_earliest_scan_wins_within_a_batch(self):
+        first, second = self.od_lists[:2]
+        report = sync_scans(self.event.id, [
+            {'hash': first.hash, 'scanned_at': self._at(5).isoformat(), 'scanner_id': 'gate-b'},
+            {'hash': first.hash, 'scanned_at': self._at(20).isoformat(), 'scanner_id': 'gate-a'},
+            {'hash': second.hash},
+        ])
+
+        self.assertEqual([result['status'] for result in report['results']], ['duplicate', 'marked', 'marked'])
+        self.assertEqual((report['marked'], report['duplicate']), (2, 1))
+        first.refresh_from_db()
+        self.assertTrue(first.attendance)
+        self.assertEqual(first.scanned_by, 'gate-a')
+        self.assertLess(first.attendance_marked_at, self._at(19))
+        self.assertEqual(EventStats.objects.get(pk=self.event.pk).attended, 3)
+
+    def test_already_marked_entry_keeps_the_earlier_time(self):
+        first = self.od_lists[0]
+        sync_scans(self.event.id, [{'hash': first.hash, 'scanned_at': self._at(5).isoformat(), 'scanner_id': 'a'}])
+        first.refresh_from_db()
+        marked_at = first.attendance_marked_at
+
+        report = sync_scans(self.event.id, [
+            {'hash': first.hash, 'scanned_at': self._at(1).isoformat(), 'scanner_id': 'late'},
+        ])
+        self.assertEqual(report['results'][0]['status'], 'already_marked')
+        first.refresh_from_db()
+        self.assertEqual((first.attendance_marked_at, first.scanned_by), (marked_at, 'a'))
+
+        report = sync_scans(self.event.id, [
+            {'hash': first.hash, 'scanned_at': self._at(30).isoformat(), 'scanner_id': 'offline'},
+        ])
+        self.assertEqual(report['already_marked'], 1)
+        first.refresh_from_db()
+        self.assertEqual(first.scanned_by, 'offline')
+        self.assertLess(first.attendance_marked_at, marked_at)
+        self.assertEqual(EventStats.objects.get(pk=self.event.pk).attended, 2)
+
+    def test_invalid_foreign_and_unknown_scans(self):
+        foreign_token = issue_token(self.od_lists[0].participant_id, self.other_event.id)
+        value = self.od_lists[0].hash
+        forged = value[:-2] + ('AA' if not value.endswith('AA') else 'BB')
+        report = sync_scans(self.event.id, [
+            {'hash': foreign_token},
+            {'hash': forged},
+            {'hash': ''},
+            'not a scan',
+            {'hash': self.od_lists[0].hash, 'scanned_at': 'yesterday'},
+            {'hash': 'cd' * 32},
+            {'hash': self.legacy.hash},
+        ])
+
+        self.assertEqual([result['status'] for result in report['results']], [
+            'invalid', 'invalid', 'invalid', 'invalid', 'invalid', 'not_found', 'already_marked',
+        ])
+        self.assertFalse(ODList.objects.filter(pk=self.od_lists[0].pk, attendance=True).exists())
+
+        # The event's own QR is not accepted for another event
+        report = sync_scans(self.other_event.id, [{'hash': self.od_lists[1].hash}])
+        self.assertEqual(report['invalid'], 1)
+
+    def test_future_scan_time_is_clamped(self):
+        first = self.od_lists[0]
+        sync_scans(self.event.id, [{'hash': first.hash, 'scanned_at': (timezone.now() + timedelta(hours=2)).isoformat()}])
+        first.refresh_from_db()
+        self.assertLessEqual(first.attendance_marked_at, timezone.now())
+
+    def test_binary_manifest(self):
+        scanner = User.objects.create_user(username='gate', email='gate@example.com', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(scanner)
+
+        response = client.get(reverse('event:attendance_manifest', args=[self.event.id]), {'encoding': 'binary'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/octet-stream')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(body[:4], MANIFEST_MAGIC)
+        version, event_id, generated_at = struct.unpack('>BIQ', body[4:17])
+        self.assertEqual((version, event_id), (1, self.event.id))
+        self.assertAlmostEqual(generated_at, timezone.now().timestamp(), delta=60)
+
+        records, offset = [], 17
+        while offset < len(body):
+            flags, length = body[offset], body[offset + 1]
+            raw = body[offset + 2:offset + 2 + length]
+            offset += 2 + length
+            value = raw.hex() if flags & FLAG_PACKED_HEX else raw.decode()
+            records.append((value, bool(flags & FLAG_ATTENDED), bool(flags & FLAG_PACKED_HEX)))
+
+        self.assertEqual(records, [
+            (self.od_lists[0].hash, False, False),
+            (self.od_lists[1].hash, False, False),
+            (self.legacy.hash, True, True),
+        ])
+
+    def test_manifest_rejects_unknown_encoding(self):
+        scanner = User.objects.create_user(username='gate', email='gate@example.com', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(scanner)
+        response = client.get(reverse('event:attendance_manifest', args=[self.event.id]), {'encoding': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class EventSearchTests(TestCase):
+    """Search box input is reduced to plain terms, each matched as a prefix"""
+
+    def setUp(self):
+        category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        self.events = {
+            name: Event.objects.create(
+                event_name=name, description=description, event_date=timezone.now() + timedelta(days=3),
+                event_type=category,
+            )
+            for name, description in (
+                ('Robotics Workshop', 'Build a line follower'),
+                ('Quiz Night', 'General quiz with robotics questions'),
+                ('Hackathon', 'Twenty four hours of coding'),
+            )
+        }
+
+    def test_user_input_is_reduced_to_terms(self):
+        self.assertEqual(parse_terms('Robo & !hack | "quiz":* (x)'), ['robo', 'hack', 'quiz', 'x'])
+        self.assertEqual(parse_terms("o'brien c++ snake_case"), ['o', 'brien', 'c', 'snake', 'case'])
+        self.assertEqual(parse_terms('   '), [])
+        with override_settings(SEARCH_MAX_TERMS=2):
+            self.assertEqual(parse_terms('a b c'), ['a', 'b'])
+
+    def test_query_builders_match_prefixes(self):
+        terms = parse_terms('Robo & !work:*')
+        self.assertEqual(tsquery_for(terms), 'robo:* & work:*')
+        self.assertEqual(fts_match_for(terms), '"robo"* "work"*')
+        self.assertEqual(fts_match_for(['say"hi']), '"say""hi"*')
+
+    def test_prefix_search_requires_every_term(self):
+        names = lambda query: [event.event_name for event in search_events(query)]
+
+        self.assertEqual(names('robo work'), ['Robotics Workshop'])
+        self.assertEqual(set(names('robo')), {'Robotics Workshop', 'Quiz Night'})
+        self.assertEqual(names('hack"; DROP TABLE event_event; --'), [])
+        self.assertEqual(names('HACK'), ['Hackathon'])
+        self.assertEqual(search_events('!!!').count(), 3)
+
+    @skipUnless(connection.vendor == 'postgresql', 'ranking by ts_rank needs PostgreSQL')
+    def test_name_matches_rank_first_on_postgresql(self):
+        results = list(search_events('robotics'))
+        self.assertEqual([event.event_name for event in results], ['Robotics Workshop', 'Quiz Night'])
+        self.assertGreater(results[0].search_rank, results[1].search_rank)
@@ -9,6 +9,7 @@ urlpatterns = [
     path('events/', views.EventListAPIView.as_view(), name='event_list'),
     path('events/<int:pk>/', views.EventDetailAPIView.as_view(), name='event_detail'),
     path('events/upcoming/', views.UpcomingEventsAPIView.as_view(), name='upcoming_events'),
+    path('events/search/', views.EventSearchAPIView.as_view(), name='event_search'),
     
     # Protected endpoints (Admin only)
     path('events/create/', views.EventCreateAPIView.as_view(), name='event_create'),
@@ -22,6 +23,9 @@ urlpatterns = [
     # Admin-only unregister (Admin can remove any user's registration)
     path('events/<int:event_id>/admin-unregister/', views.EventAdminUnregisterAPIView.as_view(), name='admin_event_unregister'),
     path('events/<int:event_id>/registration-status/', views.EventRegistrationStatusAPIView.as_view(), name='event_registration_status'),
+
+    # Bulk time-clash check against the user's schedule (User authentication required)
+    path('events/clashes/', views.EventTimeClashesAPIView.as_view(), name='event_time_clashes'),
     
     # User registrations
     path('user/registrations/', views.UserRegistrationsAPIView.as_view(), name='user_registrations'),
@@ -31,12 +35,14 @@ urlpatterns = [
 
     # Internal booking - Admin can add participants bypassing payment (Admin only)
     path('events/<int:event_id>/internal-book/', views.InternalBookingAPIView.as_view(), name='internal_booking'),
+    path('events/<int:event_id>/internal-book/bulk/', views.BulkInternalBookingAPIView.as_view(), name='bulk_internal_booking'),
     
     # Available users for internal booking (Admin only)
     path('events/<int:event_id>/available-users/', views.AvailableUsersForBookingAPIView.as_view(), name='event_available_users'),
     
     # Event analysis (Admin only)
     path('events/<int:event_id>/analysis/download/', views.EventAnalysisDownloadAPIView.as_view(), name='event_analysis_download'),
+    path('events/<int:event_id>/analytics/', views.EventAnalyticsAPIView.as_view(), name='event_analytics'),
 
     # Event OD list (Staff only)
     path('events/<int:event_id>/od-list/', views.EventODListAPIView.as_view(), name='event_od_list'),
@@ -51,6 +57,10 @@ urlpatterns = [
 
     # Scan and mark attendance
     path('events/<int:event_id>/mark-attendance/' , views.Scanner.as_view() , name='attendance_qr'),
+    path('events/<int:event_id>/scanner/open/', views.ScannerGateOpenAPIView.as_view(), name='scanner_gate_open'),
+    path('events/<int:event_id>/attendance/sync/', views.AttendanceSyncAPIView.as_view(), name='attendance_sync'),
+    path('events/<int:event_id>/attendance/upload/', views.AttendanceUploadAPIView.as_view(), name='attendance_upload'),
+    path('events/<int:event_id>/attendance/manifest/', views.AttendanceManifestAPIView.as_view(), name='attendance_manifest'),
     
     # ========== EVENT QUESTIONS ENDPOINTS ==========
     # Manage event questions (Admin creates, users can view)
@@ -71,4 +81,7 @@ urlpatterns = [
     path('events/categories/create/', views.EventCategoryCreateAPIView.as_view(), name='event_category_create'),
     path('events/categories/<int:category_id>/update/', views.EventCategoryUpdateAPIView.as_view(), name='event_category_update'),
     path('events/categories/<int:category_id>/delete/', views.EventCategoryDeleteAPIView.as_view(), name='event_category_delete'),
+
+    # QR render cache counters (Admin only)
+    path('events/qr-cache/stats/', views.QRCacheStatsAPIView.as_view(), name='qr_cache_stats'),
 ]
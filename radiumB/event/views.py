@@ -1,25 +1,34 @@
+import logging
+
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, BasePermission
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 from django.contrib.auth import get_user_model
+from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
-from .models import Event, Participant, ODList, EventGuide, EventQuestion
-from .serializers import EventSerializer, EventListSerializer, ParticipantSerializer, EventGuideSerializer, EventQuestionSerializer, FormResponseSerializer
+from .models import Event, Participant, ODList, EventGuide, EventQuestion, UserScheduleSlot, EventStats
+from .serializers import EventSerializer, EventListSerializer, ParticipantSerializer, StaffParticipantSerializer, EventGuideSerializer, EventQuestionSerializer, FormResponseSerializer
 from rest_framework.generics import ListAPIView, RetrieveAPIView
 from rest_framework import serializers
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.throttling import UserRateThrottle
 from django.db.models import Q
-from .email_services import create_participant_with_od, format_csv_row, create_error_response, create_success_response, _extract_year_from_email
+from .search import search_events
+from .exports import stream_csv_response, event_analysis_rows, od_list_rows
+from .analytics import DIMENSIONS as ANALYTICS_DIMENSIONS, event_analytics
+from . import scan_index
+from .attendance_sync import manifest_response, sync_scans, sync_uploads
+from .bulk_booking import BookingRowError, bulk_book, parse_booking_csv
+from .response_cache import cache_response
+from .email_services import create_participant_with_od, create_error_response, create_success_response
 from django.db.models import Q
-from django.http import HttpResponse
-import csv
-from collections import defaultdict
 from authentication.models import UserProfile
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 class IsEventStaffOrAdmin(BasePermission):
@@ -63,11 +72,23 @@ class IsQRScannerOrAdmin(BasePermission):
         except UserProfile.DoesNotExist:
             return False
 
+class ScanRateThrottle(UserRateThrottle):
+    scope = 'scan'
+
+
 class EventPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+
+class ParticipantCursorPagination(CursorPagination):
+    """Keyset paging for participant lists, so deep pages cost the same as the first"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-registered_at', '-id')
+
 # ========== CLASS-BASED VIEWS ==========
 
 class EventListAPIView(APIView):
@@ -77,9 +98,10 @@ class EventListAPIView(APIView):
     """
     permission_classes = [AllowAny]
     
+    @cache_response('events', 'categories')
     def get(self, request):
         try:
-            events = Event.objects.all()
+            events = Event.objects.for_listing()
             
             event_type = request.GET.get('event_type')
             if event_type:
@@ -104,10 +126,7 @@ class EventListAPIView(APIView):
             
             search = request.GET.get('search')
             if search:
-                events = events.filter(
-                    Q(event_name__icontains=search) | 
-                    Q(description__icontains=search)
-                )
+                events = search_events(search, queryset=events)
             
             is_active = request.GET.get('is_active')
             if is_active and is_active.lower() == 'true':
@@ -131,6 +150,7 @@ class EventDetailAPIView(APIView):
     """
     permission_classes = [AllowAny]
     
+    @cache_response('event:{pk}', 'categories')
     def get(self, request, pk):
         try:
             event = get_object_or_404(Event, pk=pk)
@@ -310,10 +330,11 @@ class UpcomingEventsAPIView(APIView):
     """
     permission_classes = [AllowAny]
     
+    @cache_response('events', 'categories')
     def get(self, request):
         try:
             now = timezone.now()
-            events = Event.objects.filter(
+            events = Event.objects.for_listing().filter(
                 event_date__gt=now,
                 is_active=True
             ).order_by('event_date')
@@ -324,10 +345,7 @@ class UpcomingEventsAPIView(APIView):
             
             search = request.GET.get('search')
             if search:
-                events = events.filter(
-                    Q(event_name__icontains=search) | 
-                    Q(description__icontains=search)
-                )
+                events = search_events(search, queryset=events)
             
             paginator = EventPagination()
             paginated_events = paginator.paginate_queryset(events, request)
@@ -342,6 +360,38 @@ class UpcomingEventsAPIView(APIView):
             )
 
 
+class EventSearchAPIView(APIView):
+    """
+    Full-text search over active events, ranked by relevance
+    GET /api/events/search/?q=<text>&event_type=<category_id>&payment_type=<free|paid>
+
+    Every word is matched as a prefix, so it can be called on each keystroke.
+    """
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            query = request.GET.get('q', '').strip()
+            if not query:
+                return create_error_response('Query parameter q is required', 400)
+
+            events = search_events(
+                query,
+                queryset=Event.objects.for_listing().filter(is_active=True),
+                event_type=request.GET.get('event_type'),
+                payment_type=request.GET.get('payment_type'),
+            )
+
+            paginator = EventPagination()
+            paginated_events = paginator.paginate_queryset(events, request)
+
+            serializer = EventListSerializer(paginated_events, many=True, context={'request': request})
+            return paginator.get_paginated_response(serializer.data)
+
+        except Exception as e:
+            return create_error_response(f'Failed to search events: {str(e)}', 500)
+
+
 # ========== PARTICIPANT REGISTRATION VIEWS ==========
 
 class EventRegistrationAPIView(APIView):
@@ -402,7 +452,7 @@ class EventRegistrationAPIView(APIView):
                         response_data['clash_type'] = 'warn'
                     return Response(response_data, status=status.HTTP_201_CREATED)
                 else:
-                    return Response({'error': result['message']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                    return Response({'error': result['message']}, status=self._failure_status(result))
             else:
                 # Free event: create participant as usual
                 result = create_participant_with_od(request.user, event, send_email=True, answers=answers_snapshot)
@@ -417,9 +467,16 @@ class EventRegistrationAPIView(APIView):
                         response_data['clash_type'] = 'warn'
                     return Response(response_data, status=status.HTTP_201_CREATED)
                 else:
-                    return Response({'error': result['message']}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                    return Response({'error': result['message']}, status=self._failure_status(result))
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    @staticmethod
+    def _failure_status(result):
+        """Full events and duplicate registrations are client errors, anything else is a server error"""
+        if result.get('reason') in ('event_full', 'already_registered'):
+            return status.HTTP_400_BAD_REQUEST
+        return status.HTTP_500_INTERNAL_SERVER_ERROR
     
     def _validate_answers(self, answers_data, questions):
         """Validate user's answers against event questions"""
@@ -522,6 +579,45 @@ class EventRegistrationStatusAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class EventTimeClashesAPIView(APIView):
+    """
+    Check which of the listed events clash with the user's schedule
+    GET /api/events/clashes/?event_ids=1,2,3
+
+    Kept separate from the event list so the list stays the same for every user.
+    """
+    permission_classes = [IsAuthenticated]
+    max_events = 100
+
+    def get(self, request):
+        try:
+            raw_ids = request.GET.get('event_ids', '')
+            try:
+                event_ids = {int(value) for value in raw_ids.split(',') if value.strip()}
+            except ValueError:
+                return create_error_response('event_ids must be a comma separated list of integers', 400)
+            if not event_ids:
+                return create_error_response('event_ids is required', 400)
+            if len(event_ids) > self.max_events:
+                return create_error_response(f'At most {self.max_events} events can be checked at once', 400)
+
+            events = Event.objects.filter(pk__in=event_ids).only('id', 'event_date', 'start_time', 'end_time')
+            clashes = UserScheduleSlot.find_clashes(request.user, events)
+
+            return create_success_response(data={
+                str(event_id): {
+                    'clash_type': 'block',
+                    'event_id': slot.event_id,
+                    'event_name': slot.event.event_name,
+                    'start_time': slot.start_time.strftime('%H:%M'),
+                    'end_time': slot.end_time.strftime('%H:%M'),
+                }
+                for event_id, slot in clashes.items()
+            })
+        except Exception as e:
+            return create_error_response(f'Failed to check time clashes: {str(e)}', 500)
+
+
 class EventAdminUnregisterAPIView(APIView):
     """
     Admin endpoint to unregister a user from an event
@@ -581,7 +677,13 @@ class UserRegistrationsAPIView(APIView):
     def get(self, request):
         """Get all event registrations for authenticated user"""
         try:
-            participants = Participant.objects.filter(user=request.user).select_related('event')
+            participants = (
+                Participant.objects
+                .filter(user=request.user)
+                .select_related('user', 'event', 'event__event_type')
+                .prefetch_related('event__questions')
+                .with_od_fields()
+            )
 
             status_filter = request.GET.get('status')
             if status_filter:
@@ -616,13 +718,15 @@ class EventParticipantsAPIView(APIView):
     def get(self, request, event_id):
         """Get all participants for an event"""
         try:
-            event = get_object_or_404(Event, id=event_id)
+            event = get_object_or_404(
+                Event.objects.select_related('event_type', 'stats').prefetch_related('questions'), id=event_id
+            )
 
             participants = (
                 Participant.objects
                 .filter(event=event)
                 .select_related('user')
-                .prefetch_related('registered_participants')
+                .with_od_fields()
             )
 
             status_filter = request.GET.get('status')
@@ -631,23 +735,19 @@ class EventParticipantsAPIView(APIView):
 
             attended_filter = request.GET.get('attendance')
             if attended_filter is not None:
-                attended_bool = attended_filter.lower() == 'true'
-
-                attended_participant_ids = ODList.objects.filter(
-                    event=event,
-                    attendance=True
-                ).values_list('participant_id', flat=True)
-
-                if attended_bool:
-                    participants = participants.filter(id__in=attended_participant_ids)
+                if attended_filter.lower() == 'true':
+                    participants = participants.filter(od_attendance=True)
                 else:
-                    participants = participants.exclude(id__in=attended_participant_ids)
+                    participants = participants.filter(Q(od_attendance=False) | Q(od_attendance__isnull=True))
 
-            paginator = EventPagination()
+            paginator = ParticipantCursorPagination()
             paginated_participants = paginator.paginate_queryset(participants, request)
 
-            serializer = ParticipantSerializer(paginated_participants, many=True)
-            return paginator.get_paginated_response(serializer.data)
+            serializer = StaffParticipantSerializer(paginated_participants, many=True)
+            response = paginator.get_paginated_response(serializer.data)
+            response.data['event'] = EventSerializer(event, context={'request': request}).data
+            response.data['stats'] = EventStats.for_event(event).as_dict()
+            return response
 
         except Exception as e:
             return Response(
@@ -760,7 +860,7 @@ class InternalBookingAPIView(APIView):
             else:
                 return Response({
                     'error': result['message']
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+                }, status=EventRegistrationAPIView._failure_status(result))
 
         except Exception as e:
             import traceback
@@ -772,6 +872,55 @@ class InternalBookingAPIView(APIView):
             )
 
 
+class BulkInternalBookingAPIView(APIView):
+    """
+    Admin endpoint to internally book many people for an event at once, bypassing payment gateway
+    POST /api/events/<event_id>/internal-book/bulk/
+    Body: {"users": [{"email": "...", "first_name": "...", "rollno": "...", ...} or {"user_id": 1}], "send_email": true}
+          or multipart with a CSV "file" (header row: email or user_id, then optional profile columns)
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, event_id):
+        try:
+            event = get_object_or_404(Event, pk=event_id, is_active=True)
+
+            if not event.is_registration_open:
+                return create_error_response('Registration is closed for this event', 400)
+
+            uploaded = request.FILES.get('file')
+            if uploaded:
+                try:
+                    rows = parse_booking_csv(uploaded)
+                except BookingRowError as e:
+                    return create_error_response(str(e), 400)
+            else:
+                rows = request.data.get('users')
+                if not isinstance(rows, list):
+                    return create_error_response('Provide a users list or a CSV file', 400)
+
+            if not rows:
+                return create_error_response('No users to book', 400)
+            if len(rows) > settings.BULK_BOOKING_MAX_ROWS:
+                return create_error_response(f'At most {settings.BULK_BOOKING_MAX_ROWS} users can be booked per request', 400)
+
+            send_email = str(request.data.get('send_email', 'true')).lower() != 'false'
+            report = bulk_book(event, rows, send_email=send_email)
+            logger.info(
+                "Bulk booked %d of %d rows for event %s, %d users created, %d emails queued",
+                report['booked'], len(rows), event.id, report['users_created'], report['emails_queued']
+            )
+            return create_success_response(
+                message=f"{report['booked']} booked for {event.event_name}",
+                data={'event_id': event.id, **report},
+                status_code=201 if report['booked'] else 200
+            )
+
+        except Exception as e:
+            logger.exception("Bulk internal booking failed for event %s", event_id)
+            return create_error_response(f'Failed to process bulk booking: {str(e)}', 500)
+
+
 class EventAnalysisDownloadAPIView(APIView):
     """
     Download comprehensive event analysis as CSV (Admin only)
@@ -782,7 +931,7 @@ class EventAnalysisDownloadAPIView(APIView):
     def get(self, request, event_id):
         """Generate and download event analysis CSV"""
         try:
-            event = get_object_or_404(Event, id=event_id)
+            event = get_object_or_404(Event.objects.select_related('event_type', 'stats'), id=event_id)
 
             now = timezone.now()
             if event.event_date > now:
@@ -791,24 +940,14 @@ class EventAnalysisDownloadAPIView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            participants = Participant.objects.filter(event=event).select_related(
-                'user', 'user__profile'
-            ).prefetch_related('registered_participants')
-
-            if not participants.exists():
+            if not EventStats.for_event(event).registered:
                 return Response(
                     {'error': 'No participants found for this event'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            response = HttpResponse(content_type='text/csv')
-            response['Content-Disposition'] = f'attachment; filename="{event.event_name}_analysis_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-
-            writer = csv.writer(response)
-
-            self._write_analysis_to_csv(writer, event, participants)
-
-            return response
+            filename = f'{event.event_name}_analysis_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv'
+            return stream_csv_response(event_analysis_rows(event), filename)
 
         except Exception as e:
             return Response(
@@ -817,6 +956,32 @@ class EventAnalysisDownloadAPIView(APIView):
             )
 
 
+class EventAnalyticsAPIView(APIView):
+    """
+    Attendance analytics for dashboards (Admin/Staff only)
+    GET /api/events/<event_id>/analytics/?dimensions=department,year,college,payment
+    """
+    permission_classes = [IsEventStaffOrAdmin]
+
+    def get(self, request, event_id):
+        try:
+            event = get_object_or_404(Event.objects.select_related('stats'), id=event_id)
+
+            dimensions = [d.strip() for d in request.GET.get('dimensions', '').split(',') if d.strip()]
+            unknown = [d for d in dimensions if d not in ANALYTICS_DIMENSIONS]
+            if unknown:
+                return create_error_response(
+                    f'Unknown dimensions: {", ".join(unknown)}. Choose from: {", ".join(ANALYTICS_DIMENSIONS)}', 400
+                )
+
+            data = event_analytics(event, dimensions)
+            data['event'] = {'id': event.id, 'event_name': event.event_name, 'event_date': event.event_date}
+            return create_success_response(data=data)
+
+        except Exception as e:
+            return create_error_response(f'Failed to compute analytics: {str(e)}', 500)
+
+
 class EventODListAPIView(APIView):
     """
     Get event OD list data as JSON (Admin/Staff only)
@@ -827,8 +992,7 @@ class EventODListAPIView(APIView):
     def get(self, request, event_id):
         """Return event OD list data as JSON."""
         try:
-            print(f"[OD_LIST_JSON_DEBUG] Starting OD list JSON fetch for event_id: {event_id}")
-            print(f"[OD_LIST_JSON_DEBUG] User: {request.user.username}, is_staff: {request.user.is_staff}, is_superuser: {request.user.is_superuser}")
+            logger.debug("OD list JSON fetch for event %s by %s", event_id, request.user.username)
 
             # Check if user has event staff permissions or is superuser
             try:
@@ -838,14 +1002,13 @@ class EventODListAPIView(APIView):
                 has_permission = request.user.is_superuser
 
             if not has_permission:
-                print(f"[OD_LIST_JSON_DEBUG] Access denied - user does not have event staff permissions")
+                logger.debug("OD list JSON access denied for %s", request.user.username)
                 return Response(
                     {'error': 'Only staff members can view OD lists'},
                     status=status.HTTP_403_FORBIDDEN
                 )
 
-            event = get_object_or_404(Event, id=event_id)
-            print(f"[OD_LIST_JSON_DEBUG] Event found: {event.event_name} (ID: {event.id})")
+            event = get_object_or_404(Event.objects.select_related('stats'), id=event_id)
 
             # Get all ODList entries for the event
             od_list_entries = (
@@ -853,7 +1016,6 @@ class EventODListAPIView(APIView):
                 .select_related('participant', 'participant__user', 'participant__user__profile')
                 .order_by('participant__user__first_name', 'participant__user__last_name')
             )
-            print(f"[OD_LIST_JSON_DEBUG] Found {od_list_entries.count()} OD list entries")
 
             # Format data for frontend
             od_list_data = []
@@ -874,18 +1036,17 @@ class EventODListAPIView(APIView):
                     'registration_date': participant.registered_at.isoformat() if participant.registered_at else None
                 })
 
-            print(f"[OD_LIST_JSON_DEBUG] Returning {len(od_list_data)} OD list entries")
+            logger.debug("Returning %d OD list entries for event %s", len(od_list_data), event.id)
             return Response({
                 'event_id': event.id,
                 'event_name': event.event_name,
                 'od_list': od_list_data,
-                'total_count': len(od_list_data)
+                'total_count': len(od_list_data),
+                'stats': EventStats.for_event(event).as_dict()
             })
 
         except Exception as e:
-            print(f"[OD_LIST_JSON_DEBUG] Error in OD list JSON fetch: {str(e)}")
-            import traceback
-            print(f"[OD_LIST_JSON_DEBUG] Full traceback: {traceback.format_exc()}")
+            logger.exception("OD list JSON fetch failed for event %s", event_id)
             return Response(
                 {'error': f'Failed to fetch OD list: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -902,8 +1063,7 @@ class EventODListDownloadAPIView(APIView):
     def get(self, request, event_id):
         """Generate and download event OD list CSV (only for attended participants)."""
         try:
-            print(f"[OD_LIST_DEBUG] Starting OD list download for event_id: {event_id}")
-            print(f"[OD_LIST_DEBUG] User: {request.user.username}, is_staff: {request.user.is_staff}, is_superuser: {request.user.is_superuser}")
+            logger.debug("OD list download for event %s by %s", event_id, request.user.username)
 
             # Check if user has event staff permissions or is superuser
             try:
@@ -913,14 +1073,13 @@ class EventODListDownloadAPIView(APIView):
                 has_permission = request.user.is_superuser
 
             if not has_permission:
-                print(f"[OD_LIST_DEBUG] Access denied - user does not have event staff permissions")
+                logger.debug("OD list download denied for %s", request.user.username)
                 return Response(
                     {'error': 'Only staff members can download OD lists'},
                     status=status.HTTP_403_FORBIDDEN
                 )
 
             event = get_object_or_404(Event, id=event_id)
-            print(f"[OD_LIST_DEBUG] Event found: {event.event_name} (ID: {event.id})")
 
             # Get all ODList entries for the event (not just attended ones)
             od_list_entries = (
@@ -928,249 +1087,23 @@ class EventODListDownloadAPIView(APIView):
                 .select_related('participant', 'participant__user', 'participant__user__profile')
                 .order_by('participant__user__first_name', 'participant__user__last_name')
             )
-            print(f"[OD_LIST_DEBUG] Found {od_list_entries.count()} OD list entries")
-
             if not od_list_entries.exists():
-                print(f"[OD_LIST_DEBUG] No participants registered for event {event_id}")
                 return Response(
                     {'error': 'No participants registered for this event'},
                     status=status.HTTP_404_NOT_FOUND
                 )
 
-            print(f"[OD_LIST_DEBUG] Generating CSV for {od_list_entries.count()} participants")
-            response = HttpResponse(content_type='text/csv')
             filename = f"{event.event_name}_od_list_{timezone.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-            print(f"[OD_LIST_DEBUG] CSV filename: {filename}")
-
-            writer = csv.writer(response)
-            self._write_od_list_to_csv(writer, event, od_list_entries)
-            print(f"[OD_LIST_DEBUG] CSV generation completed successfully")
-
-            return response
+            logger.debug("Streaming OD list CSV %s", filename)
+            return stream_csv_response(od_list_rows(event, od_list_entries), filename)
 
         except Exception as e:
-            print(f"[OD_LIST_DEBUG] Error in OD list download: {str(e)}")
-            import traceback
-            print(f"[OD_LIST_DEBUG] Full traceback: {traceback.format_exc()}")
+            logger.exception("OD list download failed for event %s", event_id)
             return Response(
                 {'error': f'Failed to generate OD list: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _write_od_list_to_csv(self, writer, event, od_list_entries):
-        """Write event OD list to CSV"""
-        print(f"[OD_LIST_DEBUG] Writing CSV for event: {event.event_name}")
-        print(f"[OD_LIST_DEBUG] Number of OD list entries to write: {od_list_entries.count()}")
-
-        # Header
-        writer.writerow([f'{event.event_name} - OD list'])
-        writer.writerow([])  # Empty row
-
-        # Column headers
-        writer.writerow([
-            'Username',
-            'User Email',
-            'Roll Number',
-            'Degree',
-            'Year',
-            'Department',
-            'College Name',
-            'Attended'
-        ])
-        print(f"[OD_LIST_DEBUG] CSV headers written")
-
-        # OD list entry data
-        entry_count = 0
-        for od_entry in od_list_entries:
-            participant = od_entry.participant
-            profile = getattr(participant.user, 'profile', None)
-            entry_count += 1
-
-            row_data = [
-                participant.user.username,
-                participant.user.email,
-                profile.rollno if profile else 'Unknown',
-                profile.degree if profile and profile.degree else 'Unknown',
-                profile.year if profile and profile.year else 'Unknown',
-                profile.department if profile and profile.department else 'Unknown',
-                profile.college_name if profile else 'Unknown',
-                'Yes' if od_entry.attendance else 'No'
-            ]
-
-            writer.writerow(row_data)
-            print(f"[OD_LIST_DEBUG] Wrote row {entry_count}: {row_data}")
-
-        print(f"[OD_LIST_DEBUG] Completed writing {entry_count} OD list entries to CSV")
-    
-    def _write_analysis_to_csv(self, writer, event, participants):
-        """Write comprehensive event analysis to CSV"""
-        
-        # SECTION 1: Event Summary
-        writer.writerow(['=' * 80])
-        writer.writerow([f'EVENT ANALYSIS REPORT: {event.event_name}'])
-        writer.writerow(['=' * 80])
-        writer.writerow(['Generated on:', timezone.now().strftime('%Y-%m-%d %H:%M:%S')])
-        writer.writerow(['Event Date:', event.event_date.strftime('%Y-%m-%d %H:%M:%S')])
-        writer.writerow(['Event Type:', event.get_event_type_display()])
-        writer.writerow(['Payment Type:', event.get_payment_type_display()])
-        writer.writerow(['Participation Type:', event.get_participation_type_display()])
-        writer.writerow([])
-        
-        # Calculate summary statistics using ODList for attendance
-        total_registered = participants.count()
-        
-        # Get attendance from ODList
-        attended_participants = ODList.objects.filter(
-            participant__event=event,
-            attendance=True
-        ).count()
-        
-        total_present = attended_participants
-        total_absent = total_registered - total_present
-        attendance_rate = (total_present / total_registered * 100) if total_registered > 0 else 0
-        
-        writer.writerow(['📊 EVENT SUMMARY'])
-        writer.writerow(['-' * 40])
-        writer.writerow(['Total Registrations:', total_registered])
-        writer.writerow(['Total Present:', total_present])
-        writer.writerow(['Total Absent:', total_absent])
-        writer.writerow(['Attendance Rate:', f'{attendance_rate:.2f}%'])
-        writer.writerow([])
-        
-        # SECTION 2: Department-wise Analysis
-        writer.writerow(['🏛️ DEPARTMENT-WISE ANALYSIS'])
-        writer.writerow(['-' * 50])
-        writer.writerow(['Department', 'Registered', 'Present', 'Absent', 'Attendance %'])
-        
-        dept_stats = self._get_department_stats(participants)
-        for dept, stats in dept_stats.items():
-            attendance_pct = (stats['present'] / stats['total'] * 100) if stats['total'] > 0 else 0
-            writer.writerow([
-                dept, 
-                stats['total'], 
-                stats['present'], 
-                stats['absent'], 
-                f'{attendance_pct:.1f}%'
-            ])
-        writer.writerow([])
-        
-        # SECTION 3: Year-wise Analysis
-        writer.writerow(['📅 YEAR-WISE ANALYSIS'])
-        writer.writerow(['-' * 40])
-        writer.writerow(['Year', 'Registered', 'Present', 'Absent', 'Attendance %'])
-        
-        year_stats = self._get_year_stats(participants)
-        for year, stats in sorted(year_stats.items()):
-            attendance_pct = (stats['present'] / stats['total'] * 100) if stats['total'] > 0 else 0
-            writer.writerow([
-                year, 
-                stats['total'], 
-                stats['present'], 
-                stats['absent'], 
-                f'{attendance_pct:.1f}%'
-            ])
-        writer.writerow([])
-        
-        # SECTION 4: College-wise Analysis
-        writer.writerow(['🏫 COLLEGE-WISE ANALYSIS'])
-        writer.writerow(['-' * 40])
-        writer.writerow(['College', 'Registered', 'Present', 'Absent', 'Attendance %'])
-        
-        college_stats = self._get_college_stats(participants)
-        for college, stats in college_stats.items():
-            attendance_pct = (stats['present'] / stats['total'] * 100) if stats['total'] > 0 else 0
-            writer.writerow([
-                college, 
-                stats['total'], 
-                stats['present'], 
-                stats['absent'], 
-                f'{attendance_pct:.1f}%'
-            ])
-        writer.writerow([])
-        
-        # SECTION 5: Payment Analysis (if applicable)
-        if event.payment_type == 'paid':
-            writer.writerow(['💳 PAYMENT ANALYSIS'])
-            writer.writerow(['-' * 30])
-            paid_count = participants.filter(payment_status=True).count()
-            unpaid_count = participants.filter(payment_status=False).count()
-            payment_rate = (paid_count / total_registered * 100) if total_registered > 0 else 0
-            
-            writer.writerow(['Total Paid:', paid_count])
-            writer.writerow(['Total Unpaid:', unpaid_count])
-            writer.writerow(['Payment Rate:', f'{payment_rate:.2f}%'])
-            writer.writerow([])
-        
-        # SECTION 6: Complete Participants List
-        writer.writerow(['👥 COMPLETE PARTICIPANTS LIST'])
-        writer.writerow(['=' * 80])
-        writer.writerow([
-            'S.No', 'Name', 'Email', 'Roll No', 'Degree', 'Year', 'Department',
-            'College', 'Phone', 'Registration Date', 'Attendance Status',
-            'Payment Status', 'Team Name', 'Special Requirements'
-        ])
-        
-        for idx, participant in enumerate(participants.order_by('user__first_name'), 1):
-            row_data = format_csv_row(participant, event, idx)
-            writer.writerow(row_data)
-    
-    def _get_department_stats(self, participants):
-        """Calculate department-wise statistics"""
-        dept_stats = defaultdict(lambda: {'total': 0, 'present': 0, 'absent': 0})
-        
-        for participant in participants:
-            profile = getattr(participant.user, 'profile', None)
-            dept = profile.get_department_display() if profile and profile.department else 'Unknown'
-            
-            dept_stats[dept]['total'] += 1
-            
-            # Check attendance from prefetched ODList data
-            od_entry = participant.registered_participants.first()
-            if od_entry and od_entry.attendance:
-                dept_stats[dept]['present'] += 1
-            else:
-                dept_stats[dept]['absent'] += 1
-        
-        return dict(dept_stats)
-    
-    def _get_year_stats(self, participants):
-        """Calculate year-wise statistics"""
-        year_stats = defaultdict(lambda: {'total': 0, 'present': 0, 'absent': 0})
-        
-        for participant in participants:
-            year = _extract_year_from_email(participant.user.email)
-            
-            year_stats[year]['total'] += 1
-            
-            # Check attendance from prefetched ODList data
-            od_entry = participant.registered_participants.first()
-            if od_entry and od_entry.attendance:
-                year_stats[year]['present'] += 1
-            else:
-                year_stats[year]['absent'] += 1
-        
-        return dict(year_stats)
-    
-    def _get_college_stats(self, participants):
-        """Calculate college-wise statistics"""
-        college_stats = defaultdict(lambda: {'total': 0, 'present': 0, 'absent': 0})
-        
-        for participant in participants:
-            profile = getattr(participant.user, 'profile', None)
-            college = profile.college_name if profile else 'Unknown'
-            
-            college_stats[college]['total'] += 1
-            
-            # Check attendance from prefetched ODList data
-            od_entry = participant.registered_participants.first()
-            if od_entry and od_entry.attendance:
-                college_stats[college]['present'] += 1
-            else:
-                college_stats[college]['absent'] += 1
-        
-        return dict(college_stats)
-
 
 # ========== EVENT GUIDE ENDPOINTS ==========
 
@@ -1417,14 +1350,17 @@ class EventQuestionDetailAPIView(APIView):
 
 class Scanner(APIView):
     """
-    Scan the attendance QR and mark present/absent
-    PUT/PATCH /api/events/<int:event_id>/mark-attendance/
+    Scan the attendance QR and mark present
+    PUT /api/events/<int:event_id>/mark-attendance/
+
+    Hashes are resolved through the scan index (see ScannerGateOpenAPIView), so
+    a scan costs one cache read and one conditional UPDATE.
     """
     permission_classes = [IsQRScannerOrAdmin]
+    throttle_classes = [ScanRateThrottle]
 
     def put(self, request, event_id):
         try:
-            event = get_object_or_404(Event, id=event_id)
             hash_value = request.data.get('hash')
 
             if not hash_value:
@@ -1433,38 +1369,34 @@ class Scanner(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            od_obj = ODList.objects.get(hash=hash_value, participant__event=event)
-            if hash_value == od_obj.hash:
-                from .serializers import ParticipantSerializer
-                participant_data = ParticipantSerializer(od_obj.participant).data
-                if od_obj.attendance == True:
-                    return Response(
-                        {
-                            'message': 'Attendance was already marked',
-                            'participant': participant_data
-                        },
-                        status=status.HTTP_208_ALREADY_REPORTED
-                    )
-                od_obj.attendance = True
-                od_obj.attendance_marked_at = timezone.now()
-                od_obj.save()
-                participant_data = ParticipantSerializer(od_obj.participant).data
+            entry = scan_index.lookup(event_id, hash_value)
+            if entry is None:
                 return Response(
-                    {
-                        'message': 'Attendance marked successfully',
-                        'participant': participant_data
-                    },
-                    status=status.HTTP_200_OK
+                    {'error': 'Invalid hash or participant not found for this event'},
+                    status=status.HTTP_404_NOT_FOUND
                 )
-            else:
+
+            result = scan_index.mark_present(event_id, entry, request.data.get('scanner_id', ''))
+            if result == 'missing':
+                scan_index.forget(event_id, hash_value)
                 return Response(
-                    {'error': 'Invalid hash'},
-                    status=status.HTTP_400_BAD_REQUEST
+                    {'error': 'Invalid hash or participant not found for this event'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if result == 'already_marked':
+                return Response(
+                    {
+                        'message': 'Attendance was already marked',
+                        'participant': entry
+                    },
+                    status=status.HTTP_208_ALREADY_REPORTED
                 )
-        except ODList.DoesNotExist:
             return Response(
-                {'error': 'Invalid hash or participant not found for this event'},
-                status=status.HTTP_404_NOT_FOUND
+                {
+                    'message': 'Attendance marked successfully',
+                    'participant': entry
+                },
+                status=status.HTTP_200_OK
             )
         except Exception as e:
             return Response(
@@ -1473,6 +1405,117 @@ class Scanner(APIView):
             )
 
 
+class AttendanceSyncAPIView(APIView):
+    """
+    Upload a batch of scans recorded while a scanner device was offline
+    POST /api/events/<int:event_id>/attendance/sync/
+    Body: {"scans": [{"hash": "...", "scanned_at": "2025-01-01T09:00:00Z", "scanner_id": "gate-2"}, ...]}
+    """
+    permission_classes = [IsQRScannerOrAdmin]
+
+    def post(self, request, event_id):
+        try:
+            event = get_object_or_404(Event, id=event_id)
+            scans = request.data.get('scans')
+
+            if not isinstance(scans, list) or not scans:
+                return create_error_response('scans must be a non-empty list', 400)
+            if len(scans) > settings.ATTENDANCE_SYNC_MAX_BATCH:
+                return create_error_response(
+                    f'At most {settings.ATTENDANCE_SYNC_MAX_BATCH} scans can be synced per request', 400
+                )
+
+            report = sync_scans(event.id, scans)
+            logger.info(
+                "Synced %d scans for event %s: %d marked, %d already marked, %d not found, %d invalid",
+                len(scans), event.id, report['marked'], report['already_marked'], report['not_found'], report['invalid']
+            )
+            return create_success_response(data={'event_id': event.id, **report})
+
+        except Exception as e:
+            logger.exception("Failed to sync attendance for event %s", event_id)
+            return create_error_response(f'Failed to sync attendance: {str(e)}', 500)
+
+
+class AttendanceUploadAPIView(APIView):
+    """
+    Decode QR codes from gate photos or short clips and mark attendance
+    POST /api/events/<int:event_id>/attendance/upload/
+    Multipart: one or more "files" (images or videos), optional "scanner_id" and "scanned_at"
+    """
+    permission_classes = [IsQRScannerOrAdmin]
+
+    def post(self, request, event_id):
+        try:
+            event = get_object_or_404(Event, id=event_id)
+            files = request.FILES.getlist('files')
+
+            if not files:
+                return create_error_response('Upload at least one image or video as files', 400)
+            if len(files) > settings.QR_DECODE_MAX_FILES:
+                return create_error_response(f'At most {settings.QR_DECODE_MAX_FILES} files can be uploaded per request', 400)
+            if sum(f.size for f in files) > settings.QR_DECODE_MAX_UPLOAD_BYTES:
+                return create_error_response('Uploads are too large', 400)
+
+            uploads = [(f.name, f.read(), f.content_type) for f in files]
+            report = sync_uploads(
+                event.id, uploads,
+                scanner_id=str(request.data.get('scanner_id') or '')[:64],
+                scanned_at=request.data.get('scanned_at') or None,
+            )
+            logger.info(
+                "Decoded %d uploads for event %s: %d marked, %d already marked, %d not found, %d invalid",
+                len(files), event.id, report['marked'], report['already_marked'], report['not_found'], report['invalid']
+            )
+            return create_success_response(data={'event_id': event.id, **report})
+
+        except Exception as e:
+            logger.exception("Failed to process attendance uploads for event %s", event_id)
+            return create_error_response(f'Failed to process uploads: {str(e)}', 500)
+
+
+class AttendanceManifestAPIView(APIView):
+    """
+    Download an event's QR hash manifest for offline validation on scanner devices
+    GET /api/events/<int:event_id>/attendance/manifest/?encoding=ndjson|binary
+    """
+    permission_classes = [IsQRScannerOrAdmin]
+
+    def get(self, request, event_id):
+        try:
+            event = get_object_or_404(Event, id=event_id)
+            encoding = request.GET.get('encoding', 'ndjson')
+
+            if encoding not in ('ndjson', 'binary'):
+                return create_error_response('encoding must be ndjson or binary', 400)
+
+            return manifest_response(event, encoding)
+
+        except Exception as e:
+            return create_error_response(f'Failed to export manifest: {str(e)}', 500)
+
+
+class ScannerGateOpenAPIView(APIView):
+    """
+    Load an event's QR hashes into the scan index before scanning starts
+    POST /api/events/<int:event_id>/scanner/open/
+    """
+    permission_classes = [IsQRScannerOrAdmin]
+
+    def post(self, request, event_id):
+        try:
+            event = get_object_or_404(Event, id=event_id)
+            loaded = scan_index.open_gate(event.id)
+            logger.debug("Gate opened for event %s: %d OD entries indexed", event.id, loaded)
+            return create_success_response(
+                data={'event_id': event.id, 'event_name': event.event_name, 'indexed': loaded},
+                message=f'Gate opened with {loaded} attendees indexed'
+            )
+        except Exception as e:
+            logger.exception("Failed to open gate for event %s", event_id)
+            return create_error_response(f'Failed to open gate: {str(e)}', 500)
+
+
 
 # ========== EVENT GUIDE VIEWS ==========
 
@@ -1483,6 +1526,7 @@ class EventGuideDetailAPIView(APIView):
     """
     permission_classes = [AllowAny]
 
+    @cache_response('event:{event_id}')
     def get(self, request, event_id):
         """Get event guide for a specific event"""
         try:
@@ -1648,18 +1692,13 @@ class EventCategoryListAPIView(APIView):
     """
     permission_classes = [AllowAny]
     
+    @cache_response('categories')
     def get(self, request):
         """Get all active event categories"""
         try:
-            from .models import EventCategory
-            categories = EventCategory.objects.filter(is_active=True).order_by('order')
-            
-            data = [{
-                'code': cat.code,
-                'display_name': cat.display_name,
-                'description': cat.description
-            } for cat in categories]
-            
+            from users.choice_registry import get_choice_set
+            data = get_choice_set('event_category').rows
+
             return create_success_response(data=data)
             
         except Exception as e:
@@ -1808,4 +1847,15 @@ class EventCategoryDeleteAPIView(APIView):
             )
             
         except Exception as e:
-            return create_error_response(f'Failed to delete event category: {str(e)}', 500)
\ No newline at end of file
+            return create_error_response(f'Failed to delete event category: {str(e)}', 500)
+
+class QRCacheStatsAPIView(APIView):
+    """
+    QR render cache hit/miss counters for this worker process (Admin only)
+    GET /api/events/qr-cache/stats/
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        from .qr_cache import get_qr_cache
+        return create_success_response(data=get_qr_cache().stats())
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.utils import timezone
 from import_export.admin import ImportExportModelAdmin
 from import_export import resources
 from .models import Payment, PaymentWebhook
@@ -17,7 +18,8 @@ class PaymentWebhookResource(resources.ModelResource):
     """Resource for importing/exporting PaymentWebhook data"""
     class Meta:
         model = PaymentWebhook
-        fields = ('id', 'payment__id', 'payment__cf_payment_id', 'webhook_type', 'created_at')
+        fields = ('id', 'payment__id', 'payment__cf_payment_id', 'gateway', 'gateway_event_id', 'order_id',
+                  'webhook_type', 'status', 'attempts', 'created_at', 'processed_at')
         export_order = fields
 
 
@@ -33,7 +35,16 @@ class PaymentAdmin(ImportExportModelAdmin):
 @admin.register(PaymentWebhook)
 class PaymentWebhookAdmin(ImportExportModelAdmin):
     resource_class = PaymentWebhookResource
-    list_display = ('id', 'payment', 'webhook_type', 'created_at')
-    list_filter = ('webhook_type', 'created_at')
-    search_fields = ('payment__id', 'payment__cf_payment_id')
-    readonly_fields = ('id', 'payment', 'webhook_type', 'payload', 'signature', 'created_at')
+    list_display = ('id', 'order_id', 'payment', 'webhook_type', 'status', 'attempts', 'created_at')
+    list_filter = ('status', 'gateway', 'webhook_type', 'created_at')
+    search_fields = ('order_id', 'gateway_event_id', 'payment__id', 'payment__cf_payment_id')
+    readonly_fields = ('id', 'payment', 'gateway', 'gateway_event_id', 'order_id', 'webhook_type', 'payload',
+                       'signature', 'attempts', 'last_error', 'processed_at', 'created_at')
+    actions = ['retry_webhooks']
+
+    @admin.action(description='Retry selected webhooks')
+    def retry_webhooks(self, request, queryset):
+        updated = queryset.exclude(status='processed').update(
+            status='pending', attempts=0, next_attempt_at=timezone.now(), locked_at=None
+        )
+        self.message_user(request, f'{updated} webhook(s) queued for processing again.')
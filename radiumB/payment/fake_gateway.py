@@ -0,0 +1,204 @@
+"""
+Local fake payment gateway for tests and benchmarks
+
+Speaks just enough of the Cashfree PG API (create order, get order, create
+payment link) and PayU's verify_payment postservice for CashfreeService and
+PayUService to run against it. It keeps connections alive like the real
+gateways, can add latency and fail a share of requests with HTTP 503, and
+counts requests and TCP connections so connection reuse can be checked.
+
+    with FakeGateway(latency_ms=20) as gateway:
+        settings.PAYMENT_GATEWAY_BASE_URLS = {'cashfree': gateway.cashfree_base_url, 'payu': gateway.base_url}
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class _Handler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests, as the real gateways do
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this, Nagle's algorithm stalls keep-alive responses
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.gateway._count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status_code, payload):
+        body = json.dumps(payload).encode()
+        try:
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client timed out and hung up while we were sleeping
+            self.close_connection = True
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _handle(self, method):
+        gateway = self.server.gateway
+        body = self._body()
+        gateway._count('requests')
+        if gateway.latency_ms:
+            time.sleep(gateway.latency_ms / 1000)
+        if gateway.failure_rate and gateway._random() < gateway.failure_rate:
+            gateway._count('failures')
+            return self._send(503, {'message': 'Service temporarily unavailable', 'code': 'service_unavailable'})
+
+        path = urlparse(self.path).path.rstrip('/')
+        if method == 'POST' and path == '/pg/orders':
+            return self._send(*gateway.create_order(json.loads(body or b'{}')))
+        if method == 'GET' and path.startswith('/pg/orders/'):
+            order = gateway.orders.get(path.rsplit('/', 1)[-1])
+            if order is None:
+                return self._send(404, {'message': 'order not found', 'code': 'order_not_found'})
+            return self._send(200, order)
+        if method == 'POST' and path == '/pg/links':
+            return self._send(*gateway.create_link(json.loads(body or b'{}')))
+        if method == 'POST' and path == '/merchant/postservice.php':
+            form = {key: values[0] for key, values in parse_qs(body.decode()).items()}
+            return self._send(*gateway.verify_payment(form))
+        return self._send(404, {'message': f'Unknown endpoint {method} {path}'})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+class FakeGateway:
+    """Fake Cashfree/PayU server running on a background thread"""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, failure_rate=0.0, seed=None):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self.orders = {}
+        self.links = {}
+        self.payu_transactions = {}
+        self.counters = {'requests': 0, 'connections': 0, 'failures': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self):
+        return f'http://{self.host}:{self.port}'
+
+    @property
+    def cashfree_base_url(self):
+        return f'{self.base_url}/pg'
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def _random(self):
+        with self._lock:
+            return self._rng.random()
+
+    def create_order(self, data):
+        order_id = str(data.get('order_id') or '')
+        if not order_id or not data.get('order_amount'):
+            return 400, {'message': 'order_id and order_amount are required', 'code': 'request_invalid'}
+        with self._lock:
+            if order_id in self.orders:
+                return 409, {'message': 'order with same id is already present', 'code': 'order_already_exists'}
+            order = self.orders[order_id] = {
+                'cf_order_id': str(uuid.uuid4().int)[:10],
+                'order_id': order_id,
+                'order_amount': data['order_amount'],
+                'order_currency': data.get('order_currency', 'INR'),
+                'order_status': 'ACTIVE',
+                'payment_session_id': f'session_{uuid.uuid4().hex}',
+                'customer_details': data.get('customer_details', {}),
+                'order_meta': data.get('order_meta', {}),
+            }
+        return 200, order
+
+    def create_link(self, data):
+        link_id = str(data.get('link_id') or '')
+        if not link_id:
+            return 400, {'message': 'link_id is required', 'code': 'request_invalid'}
+        with self._lock:
+            link = self.links[link_id] = {
+                'link_id': link_id,
+                'cf_link_id': str(uuid.uuid4().int)[:10],
+                'link_status': 'ACTIVE',
+                'link_amount': data.get('link_amount'),
+                'link_currency': data.get('link_currency', 'INR'),
+                'link_url': f'{self.base_url}/links/{link_id}',
+            }
+        return 200, link
+
+    def verify_payment(self, form):
+        if form.get('command') != 'verify_payment':
+            return 200, {'status': 0, 'msg': 'Invalid command'}
+        txnid = form.get('var1', '')
+        details = self.payu_transactions.get(txnid)
+        if details is None:
+            return 200, {'status': 0, 'msg': '0 out of 1 Transactions Fetched Successfully',
+                         'transaction_details': {txnid: {'mihpayid': 'Not Found', 'status': 'Not Found'}}}
+        return 200, {'status': 1, 'msg': '1 out of 1 Transactions Fetched Successfully',
+                     'transaction_details': {txnid: details}}
+
+    def set_order_status(self, order_id, order_status):
+        """Change a Cashfree order's status, e.g. to 'PAID' or 'EXPIRED'"""
+        with self._lock:
+            self.orders[order_id]['order_status'] = order_status
+
+    def set_payu_status(self, txnid, payu_status, amount='0.00'):
+        """Record a PayU transaction with status 'success', 'failure' or 'pending'"""
+        with self._lock:
+            self.payu_transactions[txnid] = {
+                'mihpayid': str(uuid.uuid4().int)[:12], 'txnid': txnid, 'status': payu_status, 'amt': amount,
+            }
+
+    def _bind(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.gateway = self
+        self.port = self._server.server_address[1]
+
+    def start(self):
+        self._bind()
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+
+    def serve_forever(self):
+        """Serve in the calling thread until interrupted"""
+        self._bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,188 @@
+"""
+Payment gateway HTTP client
+
+One pooled requests.Session per gateway, shared by every thread of the
+process, so payment initiation reuses open TCP/TLS connections instead of
+handshaking with the gateway on every request.
+
+Every call has a (connect, read) timeout from settings and is retried a
+bounded number of times with full jitter backoff:
+
+- failures to connect (refused, DNS, connect timeout) and HTTP 429/503 are always
+  retried: the gateway never saw or never processed the request
+- read timeouts, connections dropped after the request was sent and HTTP 502/504
+  are retried only for idempotent calls, since the gateway may already have acted
+  on the request (e.g. created the order)
+
+Latency of every attempt is recorded in a per (gateway, operation) histogram,
+readable with latency_stats().
+"""
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from radiumB.metrics import LatencyHistogram
+
+ALWAYS_RETRY_STATUSES = {429, 503}
+IDEMPOTENT_RETRY_STATUSES = {502, 504}
+
+_clients = {}
+_histograms = {}
+_lock = threading.Lock()
+
+
+class GatewayError(Exception):
+    """Raised when a gateway call fails after all retries"""
+
+    def __init__(self, message, status_code=None, body=''):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+def _request_not_sent(error):
+    """Whether a ConnectionError happened while connecting, before any of the request was sent"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _histogram(gateway, operation):
+    key = (gateway, operation)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(key, LatencyHistogram())
+    return histogram
+
+
+def latency_stats():
+    """
+    Latency histograms of this process, per gateway and operation.
+
+    Returns:
+        dict: {gateway: {operation: snapshot}}
+    """
+    stats = {}
+    for (gateway, operation), histogram in sorted(_histograms.items()):
+        stats.setdefault(gateway, {})[operation] = histogram.snapshot()
+    return stats
+
+
+def reset_latency_stats():
+    with _lock:
+        _histograms.clear()
+
+
+class GatewayClient:
+    """Pooled, retrying HTTP client for one payment gateway"""
+
+    def __init__(self, gateway, timeout=None, retries=None, backoff=None, pool_size=None):
+        self.gateway = gateway
+        self.timeout = timeout or settings.PAYMENT_GATEWAY_TIMEOUTS.get(
+            gateway, settings.PAYMENT_GATEWAY_TIMEOUTS['default']
+        )
+        self.retries = settings.PAYMENT_GATEWAY_RETRIES if retries is None else retries
+        self.backoff = settings.PAYMENT_GATEWAY_BACKOFF_SECONDS if backoff is None else backoff
+        pool_size = pool_size or settings.PAYMENT_GATEWAY_POOL_SIZE
+
+        self.session = requests.Session()
+        # Retries are handled in request() so that every attempt is timed and jittered
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def base_url(self, default):
+        """Gateway base URL, unless overridden in settings (e.g. to point at the fake gateway)"""
+        return (settings.PAYMENT_GATEWAY_BASE_URLS.get(self.gateway) or default).rstrip('/')
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter: spreads retries from many workers instead of retrying in lockstep
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def request(self, method, url, operation, idempotent=False, **kwargs):
+        """
+        Send a request to the gateway with timeout and bounded retries.
+
+        Args:
+            method: HTTP method
+            url: Full URL
+            operation: Name the latency is recorded under (e.g. 'create_order')
+            idempotent: Whether repeating the request is harmless if the gateway already acted on it
+            **kwargs: Passed to requests (json, data, headers, params)
+
+        Returns:
+            requests.Response: Final response, whatever its status code
+
+        Raises:
+            GatewayError: If no response could be obtained
+        """
+        histogram = _histogram(self.gateway, operation)
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.ReadTimeout as e:
+                histogram.observe(time.perf_counter() - started, 'timeout')
+                if not idempotent or attempt >= self.retries:
+                    raise GatewayError(f'{self.gateway} {operation} timed out: {e}')
+            except requests.exceptions.ConnectionError as e:
+                histogram.observe(time.perf_counter() - started, 'connection_error')
+                if not (idempotent or _request_not_sent(e)) or attempt >= self.retries:
+                    raise GatewayError(f'{self.gateway} {operation} connection failed: {e}')
+            except requests.exceptions.RequestException as e:
+                histogram.observe(time.perf_counter() - started, 'error')
+                raise GatewayError(f'{self.gateway} {operation} failed: {e}')
+            else:
+                histogram.observe(time.perf_counter() - started, str(response.status_code))
+                retryable = response.status_code in ALWAYS_RETRY_STATUSES or (
+                    idempotent and response.status_code in IDEMPOTENT_RETRY_STATUSES
+                )
+                if not retryable or attempt >= self.retries:
+                    return response
+            attempt += 1
+            self._sleep_before_retry(attempt - 1)
+
+    def get(self, url, operation, **kwargs):
+        return self.request('GET', url, operation, idempotent=True, **kwargs)
+
+    def post(self, url, operation, idempotent=False, **kwargs):
+        return self.request('POST', url, operation, idempotent=idempotent, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def get_client(gateway):
+    """
+    Shared client for a gateway, created on first use.
+
+    Args:
+        gateway: 'cashfree' or 'payu'
+
+    Returns:
+        GatewayClient: Process-wide client for the gateway
+    """
+    client = _clients.get(gateway)
+    if client is None:
+        with _lock:
+            client = _clients.get(gateway)
+            if client is None:
+                client = _clients[gateway] = GatewayClient(gateway)
+    return client
+
+
+def reset_clients():
+    """Close the shared clients so the next call picks up changed settings"""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
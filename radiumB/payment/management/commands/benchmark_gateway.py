@@ -0,0 +1,142 @@
+"""
+Management command to measure payment gateway call throughput
+
+Starts the fake gateway in-process and creates orders through
+CashfreeService.create_order from parallel threads, once with the shared
+pooled client and once with every call opening a new connection (the old
+requests.post behaviour). Reports calls per second, TCP connections opened
+and the client's latency histogram.
+"""
+import contextlib
+import io
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from payment import gateway_client
+from payment.fake_gateway import FakeGateway
+from payment.views import CashfreeService
+
+CUSTOMER = {
+    'customer_id': 'bench',
+    'customer_email': 'bench@example.com',
+    'customer_phone': '9876543210',
+    'customer_name': 'Benchmark User',
+}
+
+
+class Command(BaseCommand):
+    help = 'Create orders against a local fake gateway and report calls per second and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--calls',
+            type=int,
+            default=500,
+            help='Orders to create per run (default: 500)',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=8,
+            help='Parallel callers (default: 8)',
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=5,
+            help='Latency added by the fake gateway (default: 5)',
+        )
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0,
+            help='Share of gateway responses that are HTTP 503, to exercise retries (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        if options['calls'] < 1 or options['threads'] < 1:
+            raise CommandError('--calls and --threads must be positive.')
+
+        with FakeGateway(latency_ms=options['latency_ms'], failure_rate=options['failure_rate'], seed=1) as gateway:
+            overrides = override_settings(
+                PAYMENT_GATEWAY_BASE_URLS={'cashfree': gateway.cashfree_base_url, 'payu': gateway.base_url},
+                CASHFREE_CONFIG={
+                    'APP_ID': 'bench', 'SECRET_KEY': 'bench', 'ENVIRONMENT': 'TEST', 'WEBHOOK_SECRET': 'bench',
+                    'RETURN_URL': 'https://example.com/return', 'NOTIFY_URL': 'https://example.com/notify',
+                },
+                PAYMENT_GATEWAY_POOL_SIZE=options['threads'],
+            )
+            with overrides:
+                try:
+                    unpooled = self._run(gateway, options, pooled=False)
+                    gateway_client.reset_latency_stats()
+                    pooled = self._run(gateway, options, pooled=True)
+                finally:
+                    gateway_client.reset_clients()
+
+        for label, result in (('Pooled client', pooled), ('New connection per call', unpooled)):
+            self.stdout.write(
+                f'{label}: {result["ok"]}/{options["calls"]} orders in {result["elapsed"]:.2f}s '
+                f'({result["rate"]:.0f} calls/sec), {result["connections"]} connections opened'
+            )
+            if result['errors']:
+                self.stdout.write(self.style.WARNING(f'  {result["errors"]} failed: {result["first_error"]}'))
+
+        histogram = gateway_client.latency_stats().get('cashfree', {}).get('create_order')
+        if histogram:
+            self.stdout.write(
+                f'Pooled create_order latency: p50 <= {histogram["p50_ms"]} ms, p95 <= {histogram["p95_ms"]} ms, '
+                f'p99 <= {histogram["p99_ms"]} ms, max {histogram["max_ms"]} ms'
+            )
+            self.stdout.write(f'  Attempts by outcome: {histogram["outcomes"]}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Pooled client: {pooled["rate"]:.0f} calls/sec vs {unpooled["rate"]:.0f} without pooling'
+        ))
+
+    def _run(self, gateway, options, pooled):
+        service = CashfreeService()
+        gateway_client.reset_clients()
+        if not pooled:
+            # Same code path, but the gateway closes the connection after every response
+            gateway_client.get_client('cashfree').session.headers['Connection'] = 'close'
+        lanes = [range(index, options['calls'], options['threads']) for index in range(options['threads'])]
+        outcome = {'ok': 0, 'errors': 0, 'first_error': None}
+        lock = threading.Lock()
+        connections_before = gateway.counters['connections']
+
+        def call(lane):
+            ok, errors, first_error = 0, 0, None
+            for _ in lane:
+                order_id = f'bench_{uuid.uuid4().hex[:16]}'
+                try:
+                    service.create_order(order_id, 100.0, CUSTOMER)
+                    ok += 1
+                except Exception as e:
+                    errors += 1
+                    first_error = first_error or str(e)
+            with lock:
+                outcome['ok'] += ok
+                outcome['errors'] += errors
+                outcome['first_error'] = outcome['first_error'] or first_error
+
+        threads = [threading.Thread(target=call, args=(lane,)) for lane in lanes if lane]
+        # CashfreeService logs every request to stderr; keep the report readable
+        with contextlib.redirect_stderr(io.StringIO()):
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+        return {
+            **outcome,
+            'elapsed': elapsed,
+            'rate': outcome['ok'] / elapsed if elapsed > 0 else 0.0,
+            'connections': gateway.counters['connections'] - connections_before,
+        }
@@ -0,0 +1,62 @@
+"""
+Management command to apply queued payment webhooks
+
+Run it as a separate long-lived process next to the web workers:
+    python manage.py process_payment_webhooks
+"""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from payment.webhooks import process_payment_webhooks
+
+
+class Command(BaseCommand):
+    help = 'Apply stored payment webhooks to their payments, exactly once, with retries and backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Apply all currently due webhooks and exit instead of polling forever',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.PAYMENT_WEBHOOK_BATCH_SIZE,
+            help=f'Webhooks claimed per batch (default: {settings.PAYMENT_WEBHOOK_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=1.0,
+            help='Seconds to sleep when the queue is empty (default: 1)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        interval = options['interval']
+        totals = {'processed': 0, 'retrying': 0, 'failed': 0}
+
+        self.stdout.write(f'Processing payment webhooks (batch size {batch_size})...')
+
+        try:
+            while True:
+                stats = process_payment_webhooks(batch_size=batch_size)
+                for key in totals:
+                    totals[key] += stats[key]
+
+                if stats['claimed']:
+                    self.stdout.write(
+                        f"Batch: {stats['processed']} processed, {stats['retrying']} retrying, {stats['failed']} failed"
+                    )
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted, stopping worker'))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Done: {totals['processed']} processed, {totals['retrying']} scheduled for retry, {totals['failed']} failed permanently"
+        ))
@@ -0,0 +1,99 @@
+"""
+Management command to reconcile stale pending payments with the gateways
+
+Meant to run periodically (e.g. every 15 minutes from cron):
+    python manage.py reconcile_payments
+Use --dry-run to see what would change without writing anything.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from payment.reconciliation import reconcile_payments
+
+
+class Command(BaseCommand):
+    help = 'Query the gateway for stale pending payments and apply the outcome in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            default=settings.PAYMENT_RECONCILE_AFTER_MINUTES,
+            help=f'Minutes a payment must have been pending (default: {settings.PAYMENT_RECONCILE_AFTER_MINUTES})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Payments per batch (default: 100)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.PAYMENT_RECONCILE_WORKERS,
+            help=f'Concurrent gateway requests (default: {settings.PAYMENT_RECONCILE_WORKERS})',
+        )
+        parser.add_argument(
+            '--gateway',
+            choices=['cashfree', 'payu'],
+            help='Only reconcile payments made through this gateway',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            help='Stop after this many payments',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Query the gateways and report, without changing anything',
+        )
+        parser.add_argument(
+            '--no-email',
+            action='store_true',
+            help='Do not queue QR emails for the OD entries created',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive.')
+
+        dry_run = options['dry_run']
+        if dry_run:
+            self.stdout.write(self.style.WARNING('DRY RUN - no payments will be changed'))
+
+        def report(results, counts):
+            for result in results:
+                payment = result['payment']
+                if dry_run or result['status'] == 'error':
+                    detail = result['details'] if result['status'] == 'error' else result['gateway_status']
+                    self.stdout.write(
+                        f"  {payment.order_id} ({payment.gateway}): pending -> {result['status']} [{detail}]"
+                    )
+            if not dry_run:
+                self.stdout.write(
+                    f"Batch: {len(results)} checked, {counts['success']} successful, "
+                    f"{counts['failed'] + counts['cancelled']} failed/cancelled, {counts['skipped']} changed meanwhile"
+                )
+
+        totals = reconcile_payments(
+            older_than_minutes=options['older_than'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            gateway=options['gateway'],
+            limit=options['limit'],
+            dry_run=dry_run,
+            send_email=not options['no_email'],
+            on_batch=report,
+        )
+
+        verb = 'would be' if dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {totals['checked']} stale pending payment(s) checked: "
+            f"{totals['success']} {verb} marked successful, {totals['failed']} failed, {totals['cancelled']} cancelled, "
+            f"{totals['pending']} still pending at the gateway, {totals['errors']} could not be checked"
+        ))
+        if dry_run:
+            self.stdout.write(f"{totals['od_missing']} paid participant(s) without an OD entry would get one")
+        else:
+            self.stdout.write(f"{totals['od_created']} OD entr(ies) created")
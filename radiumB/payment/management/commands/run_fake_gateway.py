@@ -0,0 +1,51 @@
+"""
+Management command to run the fake payment gateway for local development
+"""
+from django.core.management.base import BaseCommand
+
+from payment.fake_gateway import FakeGateway
+
+
+class Command(BaseCommand):
+    help = 'Serve a fake Cashfree/PayU API locally until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--host',
+            default='127.0.0.1',
+            help='Interface to listen on (default: 127.0.0.1)',
+        )
+        parser.add_argument(
+            '--port',
+            type=int,
+            default=8765,
+            help='Port to listen on (default: 8765)',
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=0,
+            help='Delay added to every response (default: 0)',
+        )
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0,
+            help='Share of requests answered with HTTP 503, between 0 and 1 (default: 0)',
+        )
+
+    def handle(self, *args, **options):
+        gateway = FakeGateway(
+            host=options['host'],
+            port=options['port'],
+            latency_ms=options['latency_ms'],
+            failure_rate=options['failure_rate'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'✓ Fake gateway listening on http://{options["host"]}:{options["port"]}'))
+        self.stdout.write('Point the backend at it with:')
+        self.stdout.write(f'  CASHFREE_API_BASE_URL=http://{options["host"]}:{options["port"]}/pg')
+        self.stdout.write(f'  PAYU_API_BASE_URL=http://{options["host"]}:{options["port"]}')
+        try:
+            gateway.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(f'\nStopped after {gateway.counters["requests"]} requests')
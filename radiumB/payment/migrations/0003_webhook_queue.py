@@ -0,0 +1,77 @@
+# Generated by Django 5.2.7 on 2026-10-18 03:18
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def settle_existing_webhooks(apps, schema_editor):
+    # Webhooks stored before the queue existed were handled inline; keep the worker off them
+    PaymentWebhook = apps.get_model('payment', 'PaymentWebhook')
+    PaymentWebhook.objects.filter(processed=True).update(status='processed')
+    PaymentWebhook.objects.filter(processed=False).update(
+        status='failed', last_error='Received before webhook queueing; not processed'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0002_alter_paymentconfiguration_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, help_text='Number of processing attempts made'),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='gateway',
+            field=models.CharField(default='cashfree', help_text='Gateway that sent the webhook', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='gateway_event_id',
+            field=models.CharField(blank=True, help_text="Gateway's identity for this event; retries of the same webhook share it", max_length=200, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='locked_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker claimed this webhook', null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Earliest time the worker may try again'),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='order_id',
+            field=models.CharField(blank=True, help_text='Order ID named in the payload', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='paymentwebhook',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='paymentwebhook',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='payment_pay_status_bc1274_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='paymentwebhook',
+            constraint=models.UniqueConstraint(fields=('gateway', 'gateway_event_id'), name='unique_gateway_webhook_event'),
+        ),
+        migrations.RunPython(settle_existing_webhooks, migrations.RunPython.noop),
+    ]
@@ -206,7 +206,7 @@ class Payment(models.Model):
 
 
 class PaymentWebhook(models.Model):
-    """Store payment webhooks for audit and debugging"""
+    """Store payment webhooks for audit and debugging, and queue them for the process_payment_webhooks worker"""
 
     WEBHOOK_TYPE_CHOICES = [
         ('payment_success', 'Payment Success'),
@@ -215,9 +215,23 @@ class PaymentWebhook(models.Model):
         ('order_failed', 'Order Failed'),
     ]
 
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     payment = models.ForeignKey(Payment, on_delete=models.CASCADE, related_name='webhooks', null=True, blank=True)
 
+    gateway = models.CharField(max_length=20, default='cashfree', help_text="Gateway that sent the webhook")
+    gateway_event_id = models.CharField(
+        max_length=200, null=True, blank=True,
+        help_text="Gateway's identity for this event; retries of the same webhook share it"
+    )
+    order_id = models.CharField(max_length=100, blank=True, help_text="Order ID named in the payload")
+
     webhook_type = models.CharField(max_length=20, choices=WEBHOOK_TYPE_CHOICES)
     payload = models.JSONField(help_text="Raw webhook payload")
     signature = models.TextField(blank=True, help_text="Webhook signature for verification")
@@ -225,12 +239,25 @@ class PaymentWebhook(models.Model):
     is_verified = models.BooleanField(default=False, help_text="Whether webhook signature was verified")
     processed = models.BooleanField(default=False, help_text="Whether webhook was processed")
 
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0, help_text="Number of processing attempts made")
+    next_attempt_at = models.DateTimeField(default=timezone.now, help_text="Earliest time the worker may try again")
+    locked_at = models.DateTimeField(null=True, blank=True, help_text="When a worker claimed this webhook")
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Payment Webhook"
         verbose_name_plural = "Payment Webhooks"
+        constraints = [
+            models.UniqueConstraint(fields=['gateway', 'gateway_event_id'], name='unique_gateway_webhook_event'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
 
     def __str__(self):
-        return f"Webhook {self.webhook_type} - {self.payment.order_id}"
+        return f"Webhook {self.webhook_type} - {self.payment.order_id if self.payment else self.order_id}"
@@ -0,0 +1,228 @@
+"""
+Payment reconciliation
+
+Payments stay 'pending' when the gateway's webhook never arrives. The
+reconcile_payments command walks stale pending payments in batches, asks
+the gateway for each order's status over a bounded thread pool (HTTP only,
+no database work in the threads) and applies the outcomes per batch:
+
+- success: payment marked successful, participant marked paid, OD entry created
+  and its QR email queued in the outbox
+- failed/cancelled: payment marked failed or cancelled
+- pending: left alone for a later run
+
+Successful payments whose participant still has no OD entry (the webhook
+only marks the participant paid) get one at the end of the run.
+
+Payments are re-read under a row lock before they change, so a webhook
+applied in the meantime wins. Bulk updates skip model signals, so event stats
+and cached event responses are refreshed explicitly.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from event.bulk_booking import new_od_hash
+from event.models import EmailOutbox, EventStats, ODList, Participant
+from event.response_cache import bump_version
+
+from .gateway_client import GatewayError
+from .models import Payment
+from .views import CashfreeService, PayUService
+
+CASHFREE_ORDER_STATUSES = {'PAID': 'success', 'ACTIVE': 'pending', 'EXPIRED': 'failed', 'TERMINATED': 'cancelled'}
+PAYU_STATUSES = {'success': 'success', 'pending': 'pending', 'failure': 'failed', 'failed': 'failed'}
+
+
+def stale_pending_payments(older_than, batch_size, gateway=None):
+    """
+    Yield batches of pending payments created before older_than, oldest first.
+
+    Batches are taken with a (created_at, id) keyset, so payments that stay
+    pending are not read again and new ones do not shift the batches.
+    """
+    queryset = Payment.objects.filter(status='pending', created_at__lt=older_than).order_by('created_at', 'id')
+    if gateway:
+        queryset = queryset.filter(gateway=gateway)
+
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.id))
+        batch = list(page[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+def fetch_gateway_status(payment):
+    """
+    Ask the payment's gateway for the order status. Safe to call from worker threads.
+
+    Returns:
+        dict: {'payment': payment, 'status': 'success'|'failed'|'cancelled'|'pending'|'error',
+               'gateway_status': raw status, 'details': gateway data or error message}
+    """
+    result = {'payment': payment, 'status': 'error', 'gateway_status': '', 'details': {}}
+    try:
+        if payment.gateway == 'payu':
+            details = PayUService(credentials=payment.gateway_credentials).verify_payment(payment.order_id)
+            gateway_status = details.get('status') or 'Not Found'
+            # A transaction PayU never saw means the checkout form was never submitted
+            status = PAYU_STATUSES.get(gateway_status.lower(), 'failed')
+        else:
+            details = CashfreeService(credentials=payment.gateway_credentials).get_order(payment.order_id)
+            gateway_status = (details or {}).get('order_status') or 'NOT_FOUND'
+            status = CASHFREE_ORDER_STATUSES.get(gateway_status, 'failed' if details is None else 'pending')
+        result.update(status=status, gateway_status=gateway_status, details=details or {})
+    except (GatewayError, ValueError) as e:
+        result['details'] = str(e)
+    return result
+
+
+def missing_od_participants(gateway=None):
+    """Confirmed participants with a successful payment but no OD entry"""
+    queryset = Participant.objects.filter(
+        payment__status='success', registration_status='confirmed', registered_participants__isnull=True
+    )
+    if gateway:
+        queryset = queryset.filter(payment__gateway=gateway)
+    return queryset
+
+
+def _create_od_entries(participant_ids, send_email):
+    """bulk_create OD entries (and outbox emails) for confirmed participants that have none"""
+    participants = list(
+        Participant.objects.filter(
+            pk__in=participant_ids, registration_status='confirmed', payment_status=True,
+            registered_participants__isnull=True
+        )
+    )
+    if not participants:
+        return 0
+
+    ODList.objects.bulk_create(
+        [ODList(participant_id=p.pk, event_id=p.event_id, hash=new_od_hash(p)) for p in participants],
+        ignore_conflicts=True
+    )
+    if send_email:
+        od_list_ids = ODList.objects.filter(
+            participant_id__in=[p.pk for p in participants], qr_sent=False
+        ).exclude(outbox_emails__status__in=['pending', 'sending']).values_list('pk', flat=True)
+        EmailOutbox.objects.bulk_create([
+            EmailOutbox(od_list_id=od_list_id, email_type='registration_qr', max_attempts=settings.EMAIL_OUTBOX_MAX_ATTEMPTS)
+            for od_list_id in od_list_ids
+        ])
+    return len(participants)
+
+
+def apply_gateway_results(results, send_email=True):
+    """
+    Apply fetched gateway statuses to their payments in bulk.
+
+    Returns:
+        dict: Counts of 'success', 'failed', 'cancelled' transitions, 'od_created', and
+              'skipped' (payment no longer pending when locked)
+    """
+    outcomes = {result['payment'].pk: result for result in results if result['status'] in ('success', 'failed', 'cancelled')}
+    counts = {'success': 0, 'failed': 0, 'cancelled': 0, 'od_created': 0, 'skipped': 0}
+    if not outcomes:
+        return counts
+
+    now = timezone.now()
+    with transaction.atomic():
+        payments = list(Payment.objects.select_for_update().filter(pk__in=list(outcomes)))
+        changed, paid_participant_ids, event_ids = [], [], set()
+        for payment in payments:
+            if payment.status != 'pending':
+                counts['skipped'] += 1
+                continue
+            result = outcomes[payment.pk]
+            payment.status = result['status']
+            payment.updated_at = now
+            if isinstance(result['details'], dict) and result['details']:
+                payment.payment_details = result['details']
+            if payment.status == 'success':
+                payment.paid_at = now
+                if payment.participant_id:
+                    paid_participant_ids.append(payment.participant_id)
+            changed.append(payment)
+            event_ids.add(payment.event_id)
+            counts[payment.status] += 1
+        counts['skipped'] += len(outcomes) - len(payments)
+
+        Payment.objects.bulk_update(changed, ['status', 'paid_at', 'payment_details', 'updated_at'])
+        Participant.objects.filter(pk__in=paid_participant_ids, payment_status=False).update(payment_status=True)
+        counts['od_created'] = _create_od_entries(paid_participant_ids, send_email)
+
+        # Bulk updates skip the stats signals and cache invalidation
+        if event_ids:
+            EventStats.refresh(list(event_ids))
+        # Payment status only shows on the event's own pages, not in listings
+        bump_version(*(f'event:{event_id}' for event_id in event_ids))
+
+    return counts
+
+
+def reconcile_payments(older_than_minutes=30, batch_size=100, workers=8, gateway=None, limit=None,
+                       dry_run=False, send_email=True, on_batch=None):
+    """
+    Reconcile stale pending payments with their gateways.
+
+    Args:
+        older_than_minutes: Only payments pending for at least this long
+        batch_size: Payments per batch (one thread pool round and one transaction)
+        workers: Concurrent gateway requests
+        gateway: Only payments of this gateway ('cashfree' or 'payu')
+        limit: Stop after this many payments
+        dry_run: Query the gateways but change nothing
+        send_email: Queue QR emails for created OD entries
+        on_batch: Optional callback(results, counts) after every batch, for reporting
+
+    Returns:
+        dict: Totals: 'checked', 'success', 'failed', 'cancelled', 'pending', 'errors', 'od_created', 'skipped',
+              and 'od_missing' (paid participants left without an OD entry; non-zero only in a dry run)
+    """
+    older_than = timezone.now() - timedelta(minutes=older_than_minutes)
+    totals = dict.fromkeys(('checked', 'success', 'failed', 'cancelled', 'pending', 'errors', 'od_created', 'skipped'), 0)
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        for batch in stale_pending_payments(older_than, batch_size, gateway):
+            if limit is not None:
+                batch = batch[:max(limit - totals['checked'], 0)]
+                if not batch:
+                    break
+            results = list(pool.map(fetch_gateway_status, batch))
+            totals['checked'] += len(results)
+            totals['pending'] += sum(1 for result in results if result['status'] == 'pending')
+            totals['errors'] += sum(1 for result in results if result['status'] == 'error')
+
+            if dry_run:
+                counts = {
+                    status: sum(1 for result in results if result['status'] == status)
+                    for status in ('success', 'failed', 'cancelled')
+                }
+            else:
+                counts = apply_gateway_results(results, send_email=send_email)
+            for key, value in counts.items():
+                totals[key] += value
+
+            if on_batch:
+                on_batch(results, counts)
+
+    totals['od_missing'] = missing_od_participants(gateway).count()
+    if not dry_run and totals['od_missing']:
+        with transaction.atomic():
+            participant_ids = list(missing_od_participants(gateway).values_list('pk', flat=True))
+            Participant.objects.filter(pk__in=participant_ids, payment_status=False).update(payment_status=True)
+            totals['od_created'] += _create_od_entries(participant_ids, send_email)
+            event_ids = set(Participant.objects.filter(pk__in=participant_ids).values_list('event_id', flat=True))
+            EventStats.refresh(list(event_ids))
+        totals['od_missing'] = 0
+    return totals
@@ -91,15 +91,13 @@ class PaymentStatusSerializer(serializers.Serializer):
 class PaymentWebhookSerializer(serializers.ModelSerializer):
     """Serializer for PaymentWebhook model"""
 
-    order_id = serializers.CharField(source='payment.order_id', read_only=True)
-
     class Meta:
         model = PaymentWebhook
         fields = [
             'id', 'order_id', 'webhook_type', 'payload',
-            'is_verified', 'processed', 'created_at'
+            'is_verified', 'processed', 'status', 'attempts', 'created_at'
         ]
-        read_only_fields = ['id', 'is_verified', 'processed', 'created_at']
+        read_only_fields = ['id', 'is_verified', 'processed', 'status', 'attempts', 'created_at']
 
 
 class PaymentInitiateSerializer(serializers.Serializer):
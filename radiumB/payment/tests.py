@@ -0,0 +1,409 @@
+import importlib
+import json
+import socket
+import threading
+from datetime import time, timedelta
+from decimal import Decimal
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from event.models import EmailOutbox, Event, EventCategory, EventStats, ODList, Participant
+from .fake_gateway import FakeGateway
+from .gateway_client import GatewayClient, GatewayError, latency_stats, reset_clients, reset_latency_stats
+from .models import Payment, PaymentWebhook
+from .views import CashfreeService
+from .reconciliation import apply_gateway_results, fetch_gateway_status, reconcile_payments
+from .webhooks import ingest_webhook, process_payment_webhooks
+
+User = get_user_model()
+
+
+def cashfree_webhook(order_id, payment_status, cf_payment_id='111'):
+    return {
+        'type': 'PAYMENT_SUCCESS_WEBHOOK' if payment_status == 'SUCCESS' else 'PAYMENT_FAILED_WEBHOOK',
+        'data': {
+            'order': {'order_id': order_id, 'cf_order_id': 'cf-' + order_id},
+            'payment': {
+                'cf_payment_id': cf_payment_id,
+                'payment_status': payment_status,
+                'payment_method': {'upi': {}},
+            },
+        },
+    }
+
+
+class PaymentTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        category = EventCategory.objects.create(code='workshop', display_name='Workshop')
+        cls.event = Event.objects.create(
+            event_name='Paid workshop',
+            description='Description',
+            event_date=timezone.now() + timedelta(days=3),
+            start_time=time(10, 0),
+            end_time=time(12, 0),
+            event_type=category,
+            payment_type='paid',
+            price=Decimal('100.00'),
+        )
+
+    def _create_payment(self, order_id, status='pending', email='231001001@rajalakshmi.edu.in'):
+        user = User.objects.create_user(username=email.split('@')[0], email=email)
+        participant = Participant.objects.create(user=user, event=self.event, payment_status=False)
+        return Payment.objects.create(
+            order_id=order_id,
+            user=user,
+            event=self.event,
+            participant=participant,
+            amount=Decimal('100.00'),
+            status=status,
+            gateway_credentials={'app_id': 'test_app', 'secret_key': 'test_secret', 'environment': 'TEST'},
+        )
+
+
+class FakeGatewayMixin:
+    """Runs a FakeGateway for each test and points the gateway clients at it"""
+
+    def setUp(self):
+        super().setUp()
+        self.gateway = FakeGateway().start()
+        self.addCleanup(self.gateway.stop)
+        base_urls = override_settings(
+            PAYMENT_GATEWAY_BASE_URLS={'cashfree': self.gateway.cashfree_base_url, 'payu': self.gateway.base_url},
+            PAYMENT_GATEWAY_BACKOFF_SECONDS=0,
+        )
+        base_urls.enable()
+        self.addCleanup(base_urls.disable)
+        reset_clients()
+        self.addCleanup(reset_clients)
+
+
+def _dropping_server():
+    """Server that reads each request and closes the connection without answering"""
+    listener = socket.create_server(('127.0.0.1', 0))
+
+    def serve():
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            with connection:
+                connection.recv(65536)
+
+    threading.Thread(target=serve, daemon=True).start()
+    return listener
+
+
+class GatewayClientTests(FakeGatewayMixin, TestCase):
+    """GatewayClient retries only what is safe to repeat and keeps its connections open"""
+
+    def setUp(self):
+        super().setUp()
+        reset_latency_stats()
+        self.addCleanup(reset_latency_stats)
+        self.client = GatewayClient('cashfree', timeout=(1, 0.2), retries=2, backoff=0)
+        self.addCleanup(self.client.close)
+        self.orders_url = f'{self.gateway.cashfree_base_url}/orders'
+
+    def _outcomes(self, operation):
+        return latency_stats()['cashfree'][operation]['outcomes']
+
+    def test_read_timeout_retried_only_when_idempotent(self):
+        self.gateway.latency_ms = 500
+
+        with self.assertRaises(GatewayError):
+            self.client.get(f'{self.orders_url}/order_1', 'get_order')
+        self.assertEqual(self.gateway.counters['requests'], 3)
+
+        with self.assertRaises(GatewayError):
+            self.client.post(self.orders_url, 'create_order', json={'order_id': 'order_1', 'order_amount': 100})
+        self.assertEqual(self.gateway.counters['requests'], 4)
+        self.assertEqual(self._outcomes('create_order'), {'timeout': 1})
+
+    def test_503_retried_for_every_call(self):
+        self.gateway.failure_rate = 1.0
+
+        response = self.client.post(self.orders_url, 'create_order', json={'order_id': 'order_1', 'order_amount': 100})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(self.gateway.counters['requests'], 3)
+        self.assertEqual(self._outcomes('create_order'), {'503': 3})
+
+    def test_refused_connection_retried_for_every_call(self):
+        # Nothing listens on a port that was just released
+        with socket.create_server(('127.0.0.1', 0)) as listener:
+            port = listener.getsockname()[1]
+
+        with self.assertRaises(GatewayError):
+            self.client.post(f'http://127.0.0.1:{port}/pg/orders', 'create_order', json={})
+        self.assertEqual(self._outcomes('create_order'), {'connection_error': 3})
+
+    def test_dropped_connection_retried_only_when_idempotent(self):
+        listener = _dropping_server()
+        self.addCleanup(listener.close)
+        url = f'http://127.0.0.1:{listener.getsockname()[1]}/pg/orders'
+
+        with self.assertRaises(GatewayError):
+            self.client.post(url, 'create_order', json={})
+        self.assertEqual(self._outcomes('create_order'), {'connection_error': 1})
+
+        with self.assertRaises(GatewayError):
+            self.client.get(f'{url}/order_1', 'get_order')
+        self.assertEqual(self._outcomes('get_order'), {'connection_error': 3})
+
+    def test_connection_reused_between_requests(self):
+        for _ in range(10):
+            self.assertEqual(self.client.get(f'{self.orders_url}/missing', 'get_order').status_code, 404)
+
+        self.assertEqual(self.gateway.counters['requests'], 10)
+        self.assertEqual(self.gateway.counters['connections'], 1)
+
+
+class CashfreeCreateOrderTests(FakeGatewayMixin, TestCase):
+    """create_order picks up an order that an earlier, unanswered attempt already created"""
+
+    def test_existing_order_is_reused(self):
+        service = CashfreeService({'app_id': 'test_app', 'secret_key': 'test_secret', 'environment': 'TEST'})
+        customer = {
+            'customer_id': '1', 'customer_email': '231001001@rajalakshmi.edu.in',
+            'customer_phone': '9876543210', 'customer_name': 'Student',
+        }
+
+        first, _ = service.create_order('order_1', 100, customer)
+        second, payment_url = service.create_order('order_1', 100, customer)
+
+        self.assertEqual(second.data.cf_order_id, first.data.cf_order_id)
+        self.assertEqual(second.data.payment_session_id, first.data.payment_session_id)
+        self.assertIn(first.data.cf_order_id, payment_url)
+        self.assertEqual(len(self.gateway.orders), 1)
+
+
+@override_settings(CASHFREE_CONFIG={**settings.CASHFREE_CONFIG, 'ENVIRONMENT': 'TEST'})
+class PaymentWebhookTests(PaymentTestMixin, TestCase):
+    """Webhooks are stored once, applied once and only ever move a payment forward"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _post(self, data):
+        return self.client.post(reverse('payment:payment_webhook'), json.dumps(data), content_type='application/json')
+
+    def test_view_only_stores_the_event(self):
+        payment = self._create_payment('order_0')
+
+        response = self._post(cashfree_webhook('order_0', 'SUCCESS'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaymentWebhook.objects.get().status, 'pending')
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+    def test_repeated_event_is_stored_once(self):
+        payment = self._create_payment('order_1')
+        data = cashfree_webhook('order_1', 'SUCCESS')
+
+        first = self._post(data)
+        second = self._post(data)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.data['duplicate'])
+        self.assertTrue(second.data['duplicate'])
+        self.assertEqual(PaymentWebhook.objects.count(), 1)
+
+        self.assertEqual(process_payment_webhooks()['processed'], 1)
+        webhook = PaymentWebhook.objects.get()
+        self.assertEqual(webhook.status, 'processed')
+        self.assertEqual(webhook.attempts, 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+        self.assertTrue(Participant.objects.get(id=payment.participant_id).payment_status)
+
+    def test_late_failure_does_not_undo_success(self):
+        payment = self._create_payment('order_2')
+        self._post(cashfree_webhook('order_2', 'SUCCESS'))
+        process_payment_webhooks()
+        self._post(cashfree_webhook('order_2', 'FAILED', cf_payment_id='112'))
+        process_payment_webhooks()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+        self.assertEqual(PaymentWebhook.objects.filter(status='processed').count(), 2)
+
+    def test_failure_of_pending_payment_is_applied(self):
+        payment = self._create_payment('order_3')
+        self._post(cashfree_webhook('order_3', 'USER_DROPPED'))
+        process_payment_webhooks()
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'failed')
+
+    @override_settings(PAYMENT_WEBHOOK_MAX_ATTEMPTS=3, PAYMENT_WEBHOOK_BACKOFF_SECONDS=10)
+    def test_unknown_order_is_retried_with_backoff_then_failed(self):
+        self._post(cashfree_webhook('order_unknown', 'SUCCESS'))
+        self.assertEqual(process_payment_webhooks(), {'claimed': 1, 'processed': 0, 'retrying': 1, 'failed': 0})
+        webhook = PaymentWebhook.objects.get()
+        self.assertEqual(webhook.status, 'pending')
+        self.assertEqual(webhook.attempts, 1)
+        self.assertIn('order_unknown', webhook.last_error)
+        first_delay = webhook.next_attempt_at - timezone.now()
+        self.assertGreater(first_delay, timedelta(seconds=5))
+        self.assertLessEqual(first_delay, timedelta(seconds=10))
+
+        # Not due yet: the worker leaves it alone
+        self.assertEqual(process_payment_webhooks()['claimed'], 0)
+
+        PaymentWebhook.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_payment_webhooks(), {'claimed': 1, 'processed': 0, 'retrying': 1, 'failed': 0})
+        webhook.refresh_from_db()
+        self.assertEqual(webhook.attempts, 2)
+        self.assertGreater(webhook.next_attempt_at - timezone.now(), timedelta(seconds=15))
+
+        PaymentWebhook.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_payment_webhooks(), {'claimed': 1, 'processed': 0, 'retrying': 0, 'failed': 1})
+        webhook.refresh_from_db()
+        self.assertEqual(webhook.status, 'failed')
+        self.assertEqual(webhook.attempts, 3)
+        self.assertEqual(process_payment_webhooks()['claimed'], 0)
+
+    def test_worker_applies_event_once_payment_exists(self):
+        self._post(cashfree_webhook('order_4', 'SUCCESS'))
+        self.assertEqual(process_payment_webhooks()['retrying'], 1)
+        payment = self._create_payment('order_4')
+
+        PaymentWebhook.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(process_payment_webhooks()['processed'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+        self.assertEqual(PaymentWebhook.objects.get().payment_id, payment.id)
+
+    def test_stale_processing_lease_is_reclaimed(self):
+        payment = self._create_payment('order_5')
+        webhook, _ = ingest_webhook('cashfree', 'evt_5', cashfree_webhook('order_5', 'SUCCESS'))
+        PaymentWebhook.objects.filter(id=webhook.id).update(
+            status='processing',
+            locked_at=timezone.now() - timedelta(seconds=settings.PAYMENT_WEBHOOK_LEASE_SECONDS + 1),
+        )
+
+        self.assertEqual(process_payment_webhooks()['processed'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+
+    def test_migration_settles_existing_webhooks(self):
+        handled = PaymentWebhook.objects.create(
+            webhook_type='payment_success', order_id='old_1', payload={}, processed=True, status='pending'
+        )
+        unhandled = PaymentWebhook.objects.create(
+            webhook_type='payment_failed', order_id='old_2', payload={}, processed=False, status='pending'
+        )
+
+        migration = importlib.import_module('payment.migrations.0003_webhook_queue')
+        migration.settle_existing_webhooks(django_apps, None)
+
+        handled.refresh_from_db()
+        unhandled.refresh_from_db()
+        self.assertEqual(handled.status, 'processed')
+        self.assertEqual(unhandled.status, 'failed')
+        self.assertTrue(unhandled.last_error)
+        self.assertEqual(process_payment_webhooks()['claimed'], 0)
+
+
+class ReconcilePaymentsTests(FakeGatewayMixin, PaymentTestMixin, TestCase):
+    """reconcile_payments settles stale pending payments from the gateway's order status"""
+
+    def _stale_payment(self, order_id, order_status, email):
+        payment = self._create_payment(order_id, email=email)
+        Payment.objects.filter(pk=payment.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        if order_status is not None:
+            self.gateway.create_order({'order_id': order_id, 'order_amount': 100})
+            self.gateway.set_order_status(order_id, order_status)
+        return payment
+
+    def _create_payments(self):
+        return {
+            order_status or 'MISSING': self._stale_payment(
+                f'order_{index}', order_status, f'23100100{index}@rajalakshmi.edu.in'
+            )
+            for index, order_status in enumerate(['PAID', 'EXPIRED', 'ACTIVE', 'TERMINATED', None])
+        }
+
+    def test_statuses_are_applied(self):
+        payments = self._create_payments()
+
+        totals = reconcile_payments(batch_size=2, workers=2)
+
+        self.assertEqual(totals['checked'], 5)
+        self.assertEqual(totals['success'], 1)
+        self.assertEqual(totals['failed'], 2)
+        self.assertEqual(totals['cancelled'], 1)
+        self.assertEqual(totals['pending'], 1)
+        self.assertEqual(totals['errors'], 0)
+        self.assertEqual(totals['od_created'], 1)
+        statuses = {key: Payment.objects.get(pk=payment.pk).status for key, payment in payments.items()}
+        self.assertEqual(statuses, {
+            'PAID': 'success', 'EXPIRED': 'failed', 'ACTIVE': 'pending', 'TERMINATED': 'cancelled', 'MISSING': 'failed',
+        })
+
+        paid = Payment.objects.get(pk=payments['PAID'].pk)
+        self.assertIsNotNone(paid.paid_at)
+        self.assertTrue(Participant.objects.get(pk=paid.participant_id).payment_status)
+        od_entry = ODList.objects.get(participant_id=paid.participant_id)
+        self.assertEqual(EmailOutbox.objects.filter(od_list=od_entry, status='pending').count(), 1)
+        self.assertEqual(ODList.objects.count(), 1)
+        self.assertEqual(EventStats.objects.get(event=self.event).paid, 1)
+
+    def test_recent_payments_are_left_alone(self):
+        payment = self._create_payment('order_recent')
+        self.gateway.create_order({'order_id': 'order_recent', 'order_amount': 100})
+        self.gateway.set_order_status('order_recent', 'PAID')
+
+        self.assertEqual(reconcile_payments()['checked'], 0)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+        self.assertEqual(self.gateway.counters['requests'], 0)
+
+    def test_dry_run_changes_nothing(self):
+        payments = self._create_payments()
+
+        totals = reconcile_payments(dry_run=True)
+
+        self.assertEqual((totals['success'], totals['failed'], totals['cancelled']), (1, 2, 1))
+        self.assertEqual(totals['od_created'], 0)
+        self.assertEqual(
+            set(Payment.objects.filter(pk__in=[p.pk for p in payments.values()]).values_list('status', flat=True)),
+            {'pending'}
+        )
+        self.assertFalse(ODList.objects.exists())
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    def test_webhook_applied_meanwhile_wins(self):
+        payment = self._stale_payment('order_race', 'EXPIRED', '231001009@rajalakshmi.edu.in')
+        result = fetch_gateway_status(payment)
+        self.assertEqual(result['status'], 'failed')
+
+        # The success webhook lands between the gateway query and the row lock
+        webhook, _ = ingest_webhook('cashfree', 'evt_race', cashfree_webhook('order_race', 'SUCCESS'))
+        process_payment_webhooks()
+
+        counts = apply_gateway_results([result])
+        self.assertEqual(counts['skipped'], 1)
+        self.assertEqual(counts['failed'], 0)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'success')
+
+    def test_gateway_errors_are_counted_not_applied(self):
+        payment = self._stale_payment('order_down', 'PAID', '231001008@rajalakshmi.edu.in')
+        self.gateway.failure_rate = 1.0
+
+        totals = reconcile_payments()
+
+        self.assertEqual(totals['errors'], 1)
+        self.assertEqual(totals['success'], 0)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
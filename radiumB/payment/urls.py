@@ -18,6 +18,7 @@ urlpatterns = [
     path('process-confirmation/', views.process_payment_confirmation, name='process_payment_confirmation'),
     path('debug/', views.payment_debug, name='payment_debug'),
     path('cleanup/', views.cleanup_corrupted_payments, name='cleanup_corrupted_payments'),
+    path('gateway-latency/', views.gateway_latency, name='gateway_latency'),
     # PayU response handlers
     path('payu/success/', views.payu_success_response, name='payu_success'),
     path('payu/failure/', views.payu_failure_response, name='payu_failure'),
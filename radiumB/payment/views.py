@@ -1,12 +1,14 @@
+import logging
 import uuid
 import hashlib
 import hmac
+import json
 from decimal import Decimal
 from django.conf import settings
 from django.shortcuts import get_object_or_404, redirect
 from django.utils import timezone
 from django.http import JsonResponse
-from django.db import models
+from django.db import models, transaction
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -15,7 +17,9 @@ from rest_framework.decorators import api_view, permission_classes
 from django.views.decorators.csrf import csrf_exempt
 
 
-from .models import Payment, PaymentWebhook, PaymentConfiguration
+from .gateway_client import GatewayError, get_client, latency_stats
+from .models import Payment, PaymentConfiguration
+from .webhooks import cashfree_event_id, ingest_webhook
 from .serializers import (
     PaymentSerializer, PaymentCreateSerializer,
     PaymentStatusSerializer, PaymentInitiateSerializer,
@@ -34,6 +38,8 @@ try:
 except ImportError:
     CASHFREE_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
 
 class PayUService:
     """PayU payment service"""
@@ -45,8 +51,6 @@ class PayUService:
     def create_order(self, order_id, amount, customer_details, return_url=None, notify_url=None):
         """Create a PayU order using direct API call"""
         try:
-            import requests
-            
             import sys
             
             # Get PayU credentials (custom or default)
@@ -137,6 +141,37 @@ class PayUService:
         except Exception as e:
             raise Exception(f"Failed to create PayU order: {str(e)}")
 
+    def verify_payment(self, txnid):
+        """
+        Look up a transaction with PayU's verify_payment API.
+
+        Args:
+            txnid: Transaction ID sent with the order (our order_id)
+
+        Returns:
+            dict: PayU transaction details, whose 'status' is 'success', 'failure' or 'pending'
+                  (empty if PayU does not know the transaction)
+
+        Raises:
+            GatewayError: If PayU cannot be reached or answers with an error
+        """
+        merchant_key = self.credentials.get('merchant_key') or settings.PAYU_CONFIG.get('MERCHANT_KEY')
+        merchant_salt = self.credentials.get('merchant_salt') or settings.PAYU_CONFIG.get('MERCHANT_SALT')
+        if not merchant_key or not merchant_salt:
+            raise GatewayError("PayU credentials not configured")
+
+        command = 'verify_payment'
+        hash_value = hashlib.sha512(f"{merchant_key}|{command}|{txnid}|{merchant_salt}".encode('utf-8')).hexdigest()
+        client = get_client('payu')
+        base_url = client.base_url("https://test.payu.in" if settings.PAYU_CONFIG.get('ENVIRONMENT') == 'TEST' else "https://info.payu.in")
+        response = client.post(
+            f"{base_url}/merchant/postservice.php?form=2", 'verify_payment', idempotent=True,
+            data={'key': merchant_key, 'command': command, 'var1': txnid, 'hash': hash_value}
+        )
+        if response.status_code != 200:
+            raise GatewayError(f"PayU API error: {response.status_code}", response.status_code, response.text)
+        return response.json().get('transaction_details', {}).get(str(txnid)) or {}
+
     @staticmethod
     def verify_webhook_signature(payload, signature, headers=None):
         """Verify PayU webhook signature
@@ -183,7 +218,6 @@ class CashfreeService:
     def create_order(self, order_id, amount, customer_details, return_url=None, notify_url=None):
         """Create a Cashfree order using direct API call"""
         try:
-            import requests
             import sys
             # Clean customer details
             cleaned_customer_details = customer_details.copy()
@@ -213,7 +247,8 @@ class CashfreeService:
                 raise Exception("Cashfree credentials not configured")
             
             # Use latest v5 API (2023-08-01)
-            base_url = "https://sandbox.cashfree.com/pg" if environment == 'TEST' else "https://api.cashfree.com/pg"
+            client = get_client('cashfree')
+            base_url = client.base_url("https://sandbox.cashfree.com/pg" if environment == 'TEST' else "https://api.cashfree.com/pg")
             url = f"{base_url}/orders"
             headers = {
                 'x-api-version': '2023-08-01',
@@ -239,13 +274,20 @@ class CashfreeService:
             }
             print("[CASHFREE DEBUG] Request data:", data, file=sys.stderr)
             print("[CASHFREE DEBUG] Headers:", {k: v for k, v in headers.items() if k != 'x-client-secret'}, file=sys.stderr)  # Hide secret
-            response = requests.post(url, json=data, headers=headers)
+            response = client.post(url, 'create_order', json=data, headers=headers)
             print("[CASHFREE DEBUG] API status:", response.status_code, file=sys.stderr)
             print("[CASHFREE DEBUG] API response:", response.text, file=sys.stderr)
             print("[CASHFREE DEBUG] Full response object:", repr(response), file=sys.stderr)
-            if response.status_code != 200:
+            if response.status_code == 409:
+                # Order IDs are ours and unique per payment: the order was created by an
+                # earlier attempt whose response was lost, so carry on with that order
+                response_data = self.get_order(order_id)
+                if response_data is None:
+                    raise Exception(f"Cashfree API error: {response.status_code} - {response.text}")
+            elif response.status_code != 200:
                 raise Exception(f"Cashfree API error: {response.status_code} - {response.text}")
-            response_data = response.json()
+            else:
+                response_data = response.json()
             # Sanitize response payment_session_id returned by Cashfree (common sandbox corruption)
             raw_resp_psid = response_data.get('payment_session_id', '') or ''
             if raw_resp_psid and raw_resp_psid.endswith('payment'):
@@ -300,7 +342,7 @@ class CashfreeService:
         from django.conf import settings
         secret = settings.CASHFREE_CONFIG.get('WEBHOOK_SECRET')
         if not secret:
-            print("[WEBHOOK_DEBUG] No webhook secret configured")
+            logger.warning("No Cashfree webhook secret configured")
             return False
         
         try:
@@ -334,8 +376,6 @@ class CashfreeService:
             
             post_data = concatenate_values(sorted_data)
             
-            print(f"[WEBHOOK_DEBUG] Concatenated post data: {repr(post_data)}")
-            
             # Compute HMAC SHA256
             computed_signature = base64.b64encode(
                 hmac.new(
@@ -345,20 +385,17 @@ class CashfreeService:
                 ).digest()
             ).decode('utf-8')
             
-            print(f"[WEBHOOK_DEBUG] Expected signature: {computed_signature}")
-            print(f"[WEBHOOK_DEBUG] Received signature: {signature}")
-            print(f"[WEBHOOK_DEBUG] Secret used: {secret[:10]}...")
+            logger.debug("Webhook signature expected %s, received %s", computed_signature, signature)
             
             return hmac.compare_digest(computed_signature, signature)
             
         except Exception as e:
-            print(f"[WEBHOOK_DEBUG] Error verifying signature: {e}")
+            logger.warning("Error verifying webhook signature: %s", e)
             return False
 
     def create_payment_link(self, order_id, amount, customer_details, return_url=None, notify_url=None):
         """Create a Cashfree payment link using direct API call"""
         try:
-            import requests
             import sys
             
             # Clean customer details
@@ -378,7 +415,8 @@ class CashfreeService:
                 cleaned_customer_details['customer_name'] = f"User{cleaned_customer_details['customer_id']}"
             
             # Use latest v5 API (2023-08-01)
-            base_url = "https://sandbox.cashfree.com/pg" if settings.CASHFREE_CONFIG['ENVIRONMENT'] == 'TEST' else "https://api.cashfree.com/pg"
+            client = get_client('cashfree')
+            base_url = client.base_url("https://sandbox.cashfree.com/pg" if settings.CASHFREE_CONFIG['ENVIRONMENT'] == 'TEST' else "https://api.cashfree.com/pg")
             url = f"{base_url}/links"
             headers = {
                 'x-api-version': '2023-08-01',
@@ -408,7 +446,7 @@ class CashfreeService:
                 'link_auto_reminders': True
             }
             print("[CASHFREE DEBUG] Creating payment link with data:", data, file=sys.stderr)
-            response = requests.post(url, json=data, headers=headers)
+            response = client.post(url, 'create_payment_link', json=data, headers=headers)
             print("[CASHFREE DEBUG] Payment link API status:", response.status_code, file=sys.stderr)
             print("[CASHFREE DEBUG] Payment link API response:", response.text, file=sys.stderr)
             if response.status_code != 200:
@@ -437,6 +475,40 @@ class CashfreeService:
         except Exception as e:
             raise Exception(f"Failed to create Cashfree payment link: {str(e)}")
 
+    def get_order(self, order_id):
+        """
+        Fetch an order's current state from Cashfree.
+
+        Args:
+            order_id: Our order ID
+
+        Returns:
+            dict: Order data, with order_status 'ACTIVE', 'PAID', 'EXPIRED' or 'TERMINATED',
+                  or None if Cashfree does not know the order
+
+        Raises:
+            GatewayError: If Cashfree cannot be reached or answers with an error
+        """
+        app_id = self.credentials.get('app_id') or settings.CASHFREE_CONFIG['APP_ID']
+        secret_key = self.credentials.get('secret_key') or settings.CASHFREE_CONFIG['SECRET_KEY']
+        environment = self.credentials.get('environment') or settings.CASHFREE_CONFIG['ENVIRONMENT']
+        if not app_id or not secret_key:
+            raise GatewayError("Cashfree credentials not configured")
+
+        client = get_client('cashfree')
+        base_url = client.base_url("https://sandbox.cashfree.com/pg" if environment == 'TEST' else "https://api.cashfree.com/pg")
+        headers = {
+            'x-api-version': '2023-08-01',
+            'x-client-id': app_id,
+            'x-client-secret': secret_key,
+        }
+        response = client.get(f"{base_url}/orders/{order_id}", 'get_order', headers=headers)
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise GatewayError(f"Cashfree API error: {response.status_code}", response.status_code, response.text)
+        return response.json()
+
 
 class PaymentInitiateView(APIView):
     """
@@ -500,20 +572,16 @@ class PaymentInitiateView(APIView):
                 
                 # Check if participant already has payment_status=True
                 if participant.payment_status:
-                    print(f"[PAYMENT_DEBUG] Blocking payment initiation - participant {participant.id} already has payment_status=True")
+                    logger.debug("Blocking payment initiation: participant %s has already paid", participant.id)
                     return Response({'error': 'Payment has already been completed for this event.'}, status=status.HTTP_400_BAD_REQUEST)
                 
                 # If participant shows unpaid, clean up any existing payments and allow new payment
                 # This handles cases where payment records exist but participant status is inconsistent
                 existing_payments = Payment.objects.filter(user=user, event=event)
-                print(f"[PAYMENT_DEBUG] Found {existing_payments.count()} existing payments for user {user.id}, event {event.id}")
-                for payment in existing_payments:
-                    print(f"[PAYMENT_DEBUG] Payment {payment.id}: status={payment.status}, is_successful={payment.is_successful}, order_id={payment.order_id}")
-                
                 # Delete all existing payments since participant shows as unpaid
-                if existing_payments.exists():
-                    print(f"[PAYMENT_DEBUG] Deleting {existing_payments.count()} existing payments since participant {participant.id} has payment_status=False")
-                    existing_payments.delete()
+                deleted, _ = existing_payments.delete()
+                if deleted:
+                    logger.debug("Deleted %d stale payment rows for unpaid participant %s", deleted, participant.id)
                 order_id = f"RADIUM_{user.id}_{uuid.uuid4().hex[:8]}"
                 payment = Payment.objects.create(
                     order_id=order_id,
@@ -664,9 +732,8 @@ class PaymentStatusView(APIView):
         try:
             payment = get_object_or_404(Payment, order_id=order_id)
             
-            print(f"[PAYMENT_STATUS_DEBUG] Payment {order_id}: status={payment.status}, is_successful={payment.is_successful}")
-            print(f"[PAYMENT_STATUS_DEBUG] Participant: {payment.participant}, payment_status: {payment.participant.payment_status if payment.participant else 'No participant'}")
-            
+            logger.debug("Payment %s status %s", order_id, payment.status)
+
             return Response({
                 'success': True,
                 'data': {
@@ -675,13 +742,13 @@ class PaymentStatusView(APIView):
             }, status=status.HTTP_200_OK)
 
         except Payment.DoesNotExist:
-            print(f"[PAYMENT_STATUS_DEBUG] Payment {order_id} not found")
+            logger.debug("Payment %s not found", order_id)
             return Response({
                 'success': False,
                 'error': 'Payment not found'
             }, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
-            print(f"[PAYMENT_STATUS_DEBUG] Error fetching payment {order_id}: {str(e)}")
+            logger.exception("Failed to fetch payment %s", order_id)
             return Response({
                 'success': False,
                 'error': f'Failed to fetch payment status: {str(e)}'
@@ -701,8 +768,7 @@ class PaymentWebhookView(APIView):
             payload = request.body  # bytes
             signature = request.headers.get('X-Webhook-Signature')
 
-            print(f"[WEBHOOK_DEBUG] Received webhook, signature: {signature is not None}")
-            print(f"[WEBHOOK_DEBUG] Payload length: {len(payload)}")
+            logger.debug("Received webhook (%d bytes, signed: %s)", len(payload), signature is not None)
 
             # For production, skip signature verification since webhook secret is not available
             from django.conf import settings
@@ -714,125 +780,46 @@ class PaymentWebhookView(APIView):
                 settings.CASHFREE_CONFIG.get('WEBHOOK_SECRET') == ''
             )
 
-            print(f"[WEBHOOK_DEBUG] Environment: {settings.CASHFREE_CONFIG.get('ENVIRONMENT')}")
-            print(f"[WEBHOOK_DEBUG] Webhook secret configured: {bool(settings.CASHFREE_CONFIG.get('WEBHOOK_SECRET'))}")
-            print(f"[WEBHOOK_DEBUG] Skip signature check: {skip_signature_check}")
 
             if not skip_signature_check and not signature:
-                print("[WEBHOOK_DEBUG] Missing webhook signature")
+                logger.warning("Rejected webhook without signature")
                 return Response({'error': 'Missing webhook signature'}, status=status.HTTP_400_BAD_REQUEST)
 
             # Verify webhook signature if not skipping
             if not skip_signature_check:
                 cashfree_service = CashfreeService()
                 if not cashfree_service.verify_webhook_signature(payload, signature, request.headers):
-                    print("[WEBHOOK_DEBUG] Invalid webhook signature")
+                    logger.warning("Rejected webhook with invalid signature")
                     return Response({'error': 'Invalid webhook signature'}, status=status.HTTP_401_UNAUTHORIZED)
-            else:
-                print("[WEBHOOK_DEBUG] Skipping signature verification for test environment")
 
             # Parse webhook data
-            import json
             webhook_data = json.loads(payload.decode('utf-8'))
+            if not isinstance(webhook_data, dict):
+                return Response({'error': 'Invalid JSON in webhook payload'}, status=status.HTTP_400_BAD_REQUEST)
 
-            print(f"[WEBHOOK_DEBUG] Webhook data: {webhook_data}")
-
-            order_id = webhook_data.get('data', {}).get('order', {}).get('order_id')
+            order_id = ((webhook_data.get('data') or {}).get('order') or {}).get('order_id')
             if not order_id:
-                print("[WEBHOOK_DEBUG] Order ID not found in webhook")
+                logger.warning("Webhook without order ID")
                 return Response({'error': 'Order ID not found in webhook.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            print(f"[WEBHOOK_DEBUG] Processing webhook for order_id: {order_id}")
+            # Store the event once and acknowledge; the process_payment_webhooks worker applies it
+            event_id = cashfree_event_id(webhook_data, request.headers)
+            _, created = ingest_webhook(
+                'cashfree', event_id, webhook_data, signature=signature, is_verified=not skip_signature_check
+            )
+            logger.info("Webhook %s for order %s %s", event_id, order_id, 'received' if created else 'already received')
 
-            # Get payment details from webhook
-            # For PAYMENT_CHARGES_WEBHOOK, status is in payment object, not order
-            payment_data = webhook_data.get('data', {}).get('payment', {})
-            order_data = webhook_data.get('data', {}).get('order', {})
-            
-            payment_status = payment_data.get('payment_status')
-            cf_payment_id = payment_data.get('cf_payment_id')
-            # Extract payment method type (e.g., 'upi', 'card', 'netbanking')
-            payment_method_obj = payment_data.get('payment_method', {})
-            payment_method = list(payment_method_obj.keys())[0] if payment_method_obj else None
-            cf_order_id = order_data.get('cf_order_id')
-
-            print(f"[WEBHOOK_DEBUG] Payment status: {payment_status}, CF payment ID: {cf_payment_id}, CF order ID: {cf_order_id}")
-
-            # Find and update payment
-            try:
-                payment = Payment.objects.get(order_id=order_id)
-                
-                print(f"[WEBHOOK_DEBUG] Found payment {payment.id}, current status: {payment.status}")
-                
-                # Log webhook
-                webhook_type = 'payment_success' if payment_status == 'SUCCESS' else 'payment_failed'
-                PaymentWebhook.objects.create(
-                    payment=payment,
-                    webhook_type=webhook_type,
-                    payload=webhook_data,
-                    signature=signature or '',
-                    is_verified=not skip_signature_check,
-                    processed=True
-                )
-                
-                # Update payment status based on gateway status
-                if payment_status == 'SUCCESS':
-                    print(f"[WEBHOOK_DEBUG] Marking payment {payment.id} as successful")
-                    payment.status = 'success'
-                    payment.paid_at = timezone.now()
-                    payment.cf_order_id = cf_order_id or payment.cf_order_id
-                    payment.cf_payment_id = cf_payment_id
-                    payment.payment_method = payment_method
-                    # Store full payment method details in payment_details
-                    payment.payment_details = payment_data
-                    payment.save(update_fields=['status', 'paid_at', 'cf_order_id', 'cf_payment_id', 'payment_method', 'payment_details', 'updated_at'])
-                    
-                    # Only update participant payment_status - no additional actions
-                    if payment.participant:
-                        print(f"[WEBHOOK_DEBUG] Updating participant {payment.participant.id} payment_status to True")
-                        payment.participant.payment_status = True
-                        payment.participant.save(update_fields=['payment_status'])
-                    
-                    print(f"[WEBHOOK_DEBUG] Payment {payment.id} verification complete - only status updated")
-                    
-                elif payment_status == 'FAILED':
-                    print(f"[WEBHOOK_DEBUG] Marking payment {payment.id} as failed")
-                    payment.status = 'failed'
-                    payment.save()
-                    
-                elif payment_status == 'CANCELLED':
-                    print(f"[WEBHOOK_DEBUG] Marking payment {payment.id} as cancelled")
-                    payment.status = 'cancelled'
-                    payment.save()
-                    
-                elif payment_status == 'PENDING':
-                    print(f"[WEBHOOK_DEBUG] Payment {payment.id} still pending")
-                    payment.status = 'pending'
-                    payment.save()
-
-                print(f"[WEBHOOK_DEBUG] Payment {payment.id} updated to status: {payment.status}")
-                return Response({'success': True, 'message': f'Payment {order_id} updated to {payment_status}'}, status=status.HTTP_200_OK)
-                
-            except Payment.DoesNotExist:
-                print(f"[WEBHOOK_DEBUG] Payment with order_id {order_id} not found")
-                # Still log the webhook even if payment not found
-                PaymentWebhook.objects.create(
-                    payment=None,  # Will need to handle this in model
-                    webhook_type='order_failed',
-                    payload=webhook_data,
-                    signature=signature or '',
-                    is_verified=not skip_signature_check,
-                    processed=False
-                )
-                return Response({'error': f'Payment with order_id {order_id} not found.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response({
+                'success': True,
+                'message': f'Webhook for {order_id} received',
+                'duplicate': not created
+            }, status=status.HTTP_200_OK)
 
         except json.JSONDecodeError as e:
-            print(f"[WEBHOOK_DEBUG] Invalid JSON in webhook payload: {str(e)}")
+            logger.warning("Invalid JSON in webhook payload: %s", e)
             return Response({'error': 'Invalid JSON in webhook payload'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
-            print(f"[WEBHOOK_DEBUG] Webhook processing failed: {str(e)}")
-            import traceback
-            print(f"[WEBHOOK_DEBUG] Traceback: {traceback.format_exc()}")
+            logger.exception("Webhook processing failed")
             return Response({'error': f'Webhook processing failed: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -1167,11 +1154,14 @@ def process_payment_confirmation(request):
         from event.models import ODList
         from event.email_services import send_qr_email_to_participant
         
-        od_entry, created = ODList.objects.get_or_create(
-            participant=payment.participant,
-            event=payment.participant.event,
-            defaults={'qr_sent': False, 'attendance': False}
-        )
+        # The payment row lock serializes this with the webhook worker and repeated confirmations
+        with transaction.atomic():
+            payment = Payment.objects.select_for_update().select_related('participant__event').get(pk=payment.pk)
+            od_entry, created = ODList.objects.get_or_create(
+                participant=payment.participant,
+                event=payment.participant.event,
+                defaults={'qr_sent': False, 'attendance': False}
+            )
         
         actions_performed = []
         
@@ -1200,6 +1190,19 @@ def process_payment_confirmation(request):
         return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def gateway_latency(request):
+    """
+    Latency histograms of gateway API calls made by this worker process
+    GET /api/payment/gateway-latency/
+    """
+    return Response({
+        'success': True,
+        'latency': latency_stats()
+    })
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def payment_debug(request):
@@ -0,0 +1,230 @@
+"""
+Payment webhook queue
+
+The webhook view only stores the raw event and answers 200; it never touches
+the payment. Each event is keyed by (gateway, gateway_event_id), so a webhook
+the gateway retries is stored once and every retry is acknowledged as a
+duplicate.
+
+The process_payment_webhooks worker claims due events in batches and applies
+each one to its payment inside a transaction holding the payment row lock.
+Whatever it cannot apply yet (the payment does not exist yet, a database
+error) is retried with backoff. Transitions only move a payment forward (a
+late FAILED never undoes a SUCCESS), so applying an event twice has no further
+effect.
+"""
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Payment, PaymentWebhook
+
+logger = logging.getLogger(__name__)
+
+# Cashfree payment statuses that end a pending payment without success
+FAILED_STATUSES = {'FAILED': 'failed', 'USER_DROPPED': 'failed', 'CANCELLED': 'cancelled'}
+
+
+class WebhookRetry(Exception):
+    """Raised when a webhook cannot be applied yet and should be retried later"""
+
+
+def cashfree_event_id(webhook_data, headers):
+    """
+    Identity of a Cashfree webhook event, shared by all retries of it.
+
+    Cashfree's idempotency header is used when sent. Otherwise the event is
+    identified by its type, order, payment attempt and payment status, which
+    a retry repeats but a later transition of the same order does not.
+    """
+    key = headers.get('X-Idempotency-Key') or headers.get('X-Webhook-Id')
+    if key:
+        return key[:200]
+
+    data = webhook_data.get('data') or {}
+    payment_data = data.get('payment') or {}
+    parts = [
+        webhook_data.get('type', ''),
+        (data.get('order') or {}).get('order_id', ''),
+        payment_data.get('cf_payment_id', ''),
+        payment_data.get('payment_status', ''),
+    ]
+    identity = ':'.join(str(part) for part in parts)
+    if len(identity) > 200:
+        identity = hashlib.sha256(identity.encode()).hexdigest()
+    return identity
+
+
+def ingest_webhook(gateway, gateway_event_id, webhook_data, signature='', is_verified=False):
+    """
+    Store a webhook event once.
+
+    Returns:
+        tuple: (PaymentWebhook, created) where created is False for a repeat of a stored event
+    """
+    data = webhook_data.get('data') or {}
+    payment_status = (data.get('payment') or {}).get('payment_status')
+    return PaymentWebhook.objects.get_or_create(
+        gateway=gateway,
+        gateway_event_id=gateway_event_id,
+        defaults={
+            'order_id': str((data.get('order') or {}).get('order_id') or '')[:100],
+            'webhook_type': 'payment_success' if payment_status == 'SUCCESS' else 'payment_failed',
+            'payload': webhook_data,
+            'signature': signature or '',
+            'is_verified': is_verified,
+        }
+    )
+
+
+def get_webhook_retry_delay(attempts):
+    """Exponential backoff for the next processing attempt"""
+    delay = settings.PAYMENT_WEBHOOK_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, settings.PAYMENT_WEBHOOK_MAX_BACKOFF_SECONDS))
+
+
+def claim_webhook_batch(batch_size):
+    """
+    Claim a batch of due webhooks for this worker.
+
+    Webhooks stuck in 'processing' longer than PAYMENT_WEBHOOK_LEASE_SECONDS
+    (crashed worker) are reclaimed. Rows are locked with SKIP LOCKED where the
+    database supports it so several workers can drain the queue side by side.
+
+    Returns:
+        list: Claimed PaymentWebhook instances, oldest first
+    """
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=settings.PAYMENT_WEBHOOK_LEASE_SECONDS)
+
+    with transaction.atomic():
+        due_ids = list(
+            PaymentWebhook.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status='pending', next_attempt_at__lte=now) |
+                Q(status='processing', locked_at__lt=lease_expired)
+            )
+            .order_by('created_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not due_ids:
+            return []
+        PaymentWebhook.objects.filter(id__in=due_ids).update(status='processing', locked_at=now)
+
+    return list(PaymentWebhook.objects.filter(id__in=due_ids).order_by('created_at'))
+
+
+def _apply_cashfree_status(payment, payment_data, order_data):
+    """
+    Move a locked payment to the state reported by the gateway.
+
+    Returns:
+        str: What happened, e.g. 'success', 'failed', 'already_success', 'ignored_pending'
+    """
+    payment_status = payment_data.get('payment_status')
+
+    if payment_status == 'SUCCESS':
+        if payment.status in ('success', 'refunded'):
+            return f'already_{payment.status}'
+        payment_method_obj = payment_data.get('payment_method') or {}
+        payment.status = 'success'
+        payment.paid_at = timezone.now()
+        payment.cf_order_id = order_data.get('cf_order_id') or payment.cf_order_id
+        payment.cf_payment_id = str(payment_data.get('cf_payment_id') or payment.cf_payment_id)
+        payment.payment_method = next(iter(payment_method_obj), '') if isinstance(payment_method_obj, dict) else ''
+        payment.payment_details = payment_data
+        payment.save(update_fields=[
+            'status', 'paid_at', 'cf_order_id', 'cf_payment_id', 'payment_method', 'payment_details', 'updated_at'
+        ])
+        # Only the participant's payment status changes here; OD entries are created on confirmation
+        participant = payment.participant
+        if participant and not participant.payment_status:
+            participant.payment_status = True
+            participant.save(update_fields=['payment_status'])
+        return 'success'
+
+    if payment_status in FAILED_STATUSES:
+        # Gateways do not guarantee delivery order: only a pending payment can fail
+        if payment.status != 'pending':
+            return f'ignored_{payment_status.lower()}'
+        payment.status = FAILED_STATUSES[payment_status]
+        payment.payment_details = payment_data
+        payment.save(update_fields=['status', 'payment_details', 'updated_at'])
+        return payment.status
+
+    return f'ignored_{str(payment_status or "unknown").lower()}'
+
+
+def apply_webhook(webhook):
+    """
+    Apply one claimed webhook to its payment and mark it processed, in one transaction.
+
+    Raises:
+        WebhookRetry: If the payment it names does not exist (yet)
+    """
+    data = webhook.payload.get('data') or {}
+    with transaction.atomic():
+        payment = (
+            Payment.objects.select_for_update()
+            .select_related('participant')
+            .filter(order_id=webhook.order_id)
+            .first()
+        )
+        if payment is None:
+            raise WebhookRetry(f'Payment with order_id {webhook.order_id or "?"} not found')
+
+        outcome = _apply_cashfree_status(payment, data.get('payment') or {}, data.get('order') or {})
+
+        webhook.payment = payment
+        webhook.status = 'processed'
+        webhook.processed = True
+        webhook.processed_at = timezone.now()
+        webhook.attempts += 1
+        webhook.locked_at = None
+        webhook.last_error = ''
+        webhook.save(update_fields=[
+            'payment', 'status', 'processed', 'processed_at', 'attempts', 'locked_at', 'last_error'
+        ])
+    return outcome
+
+
+def _record_failure(webhook, error):
+    webhook.attempts += 1
+    webhook.locked_at = None
+    webhook.last_error = error
+    if webhook.attempts >= settings.PAYMENT_WEBHOOK_MAX_ATTEMPTS:
+        webhook.status = 'failed'
+    else:
+        webhook.status = 'pending'
+        webhook.next_attempt_at = timezone.now() + get_webhook_retry_delay(webhook.attempts)
+    webhook.save(update_fields=['status', 'attempts', 'locked_at', 'last_error', 'next_attempt_at'])
+
+
+def process_payment_webhooks(batch_size=None):
+    """
+    Apply one batch of due webhooks.
+
+    Returns:
+        dict: {'claimed': int, 'processed': int, 'retrying': int, 'failed': int}
+    """
+    batch_size = batch_size or settings.PAYMENT_WEBHOOK_BATCH_SIZE
+    webhooks = claim_webhook_batch(batch_size)
+    stats = {'claimed': len(webhooks), 'processed': 0, 'retrying': 0, 'failed': 0}
+
+    for webhook in webhooks:
+        try:
+            outcome = apply_webhook(webhook)
+            stats['processed'] += 1
+            logger.info("Webhook %s for order %s: %s", webhook.id, webhook.order_id, outcome)
+        except Exception as e:
+            _record_failure(webhook, str(e))
+            stats['failed' if webhook.status == 'failed' else 'retrying'] += 1
+            logger.warning("Webhook %s for order %s not applied: %s", webhook.id, webhook.order_id, e)
+
+    return stats
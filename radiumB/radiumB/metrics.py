@@ -0,0 +1,66 @@
+"""
+Shared latency metrics
+
+LatencyHistogram is used by the payment gateway client (per gateway call) and
+by the request profiling middleware (per view). It keeps fixed buckets, so
+observing is O(1) and memory does not grow with traffic.
+"""
+import threading
+
+# Histogram bucket upper bounds in milliseconds; the last bucket catches everything slower
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram, safe to update from several threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.outcomes = {}
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, seconds, outcome):
+        elapsed_ms = seconds * 1000
+        index = len(LATENCY_BUCKETS_MS)
+        for position, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                index = position
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self.total_ms += elapsed_ms
+            self.max_ms = max(self.max_ms, elapsed_ms)
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction of observations"""
+        total = sum(self.counts)
+        if not total:
+            return None
+        threshold = fraction * total
+        running = 0
+        for position, count in enumerate(self.counts):
+            running += count
+            if running >= threshold:
+                return LATENCY_BUCKETS_MS[position] if position < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self):
+        with self._lock:
+            total = sum(self.counts)
+            buckets = {
+                (f'le_{bound}ms' if position < len(LATENCY_BUCKETS_MS) else 'slower'): count
+                for position, (bound, count) in enumerate(zip(LATENCY_BUCKETS_MS + (None,), self.counts))
+            }
+            return {
+                'count': total,
+                'outcomes': dict(self.outcomes),
+                'mean_ms': round(self.total_ms / total, 2) if total else None,
+                'p50_ms': self.percentile(0.5),
+                'p95_ms': self.percentile(0.95),
+                'p99_ms': self.percentile(0.99),
+                'max_ms': round(self.max_ms, 2),
+                'buckets': buckets,
+            }
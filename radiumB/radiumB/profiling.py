@@ -0,0 +1,214 @@
+"""
+Request profiling
+
+RequestProfilingMiddleware profiles a PROFILING_SAMPLE_RATE share of
+requests. For each of those it records the wall time, the number of database
+queries and the time spent in them, keyed by HTTP method and URL route
+(e.g. 'PUT api/events/<int:event_id>/mark-attendance/'). Unsampled requests
+cost one random() call.
+
+Queries are counted with a connection execute_wrapper, which sees the SQL
+before parameters are bound. A statement run PROFILING_N_PLUS_ONE_THRESHOLD
+times or more in one request is the N+1 pattern (one query per row of an
+earlier result). The request is counted as flagged and the statement is
+kept as an example for its view.
+
+With PROFILING_SERVER_TIMING on, sampled responses carry a Server-Timing
+header that browser dev tools show next to the request.
+
+Stats live in the worker process: GET /api/admin/request-stats/ returns this
+worker's aggregates and DELETE clears them.
+"""
+import bisect
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+
+from .metrics import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the per-request query count buckets; the last bucket catches everything above
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+MAX_EXAMPLES_PER_VIEW = 5
+
+_views = {}
+_lock = threading.Lock()
+_state = {'since': timezone.now()}
+
+
+class QueryRecorder:
+    """execute_wrapper counting queries, their time and repeats of the same SQL"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+            self.statements[sql] = self.statements.get(sql, 0) + 1
+
+    def repeated(self, threshold):
+        """Statements run at least threshold times, most repeated first"""
+        return sorted(
+            ((sql, count) for sql, count in self.statements.items() if count >= threshold),
+            key=lambda item: item[1], reverse=True
+        )
+
+
+class ViewStats:
+    """Aggregates for one method and route"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.wall = LatencyHistogram()
+        self.db = LatencyHistogram()
+        self.query_counts = [0] * (len(QUERY_COUNT_BUCKETS) + 1)
+        self.queries = 0
+        self.max_queries = 0
+        self.n_plus_one = 0
+        self.examples = {}
+
+    def observe(self, wall_seconds, recorder, status_code, repeated):
+        outcome = str(status_code)
+        self.wall.observe(wall_seconds, outcome)
+        self.db.observe(recorder.seconds, outcome)
+        new_examples = []
+        with self._lock:
+            self.query_counts[bisect.bisect_left(QUERY_COUNT_BUCKETS, recorder.count)] += 1
+            self.queries += recorder.count
+            self.max_queries = max(self.max_queries, recorder.count)
+            if repeated:
+                self.n_plus_one += 1
+            for sql, count in repeated:
+                if sql in self.examples:
+                    self.examples[sql] = max(self.examples[sql], count)
+                elif len(self.examples) < MAX_EXAMPLES_PER_VIEW:
+                    self.examples[sql] = count
+                    new_examples.append((sql, count))
+        return new_examples
+
+    def snapshot(self):
+        wall = self.wall.snapshot()
+        with self._lock:
+            requests = wall['count']
+            return {
+                'requests': requests,
+                'wall': wall,
+                'db': self.db.snapshot(),
+                'queries': {
+                    'total': self.queries,
+                    'mean': round(self.queries / requests, 2) if requests else None,
+                    'max': self.max_queries,
+                    'buckets': {
+                        (f'le_{bound}' if position < len(QUERY_COUNT_BUCKETS) else 'more'): count
+                        for position, (bound, count) in enumerate(zip(QUERY_COUNT_BUCKETS + (None,), self.query_counts))
+                    },
+                },
+                'n_plus_one_requests': self.n_plus_one,
+                'repeated_queries': [
+                    {'sql': sql[:500], 'max_repeats': count}
+                    for sql, count in sorted(self.examples.items(), key=lambda item: item[1], reverse=True)
+                ],
+            }
+
+
+def _view_stats(key):
+    stats = _views.get(key)
+    if stats is None:
+        with _lock:
+            stats = _views.setdefault(key, ViewStats())
+    return stats
+
+
+def request_stats():
+    """
+    Profiling aggregates of this process, per view.
+
+    Returns:
+        dict: {'since', 'sample_rate', 'views': {'METHOD route': snapshot}}, views ordered by total wall time
+    """
+    views = {key: stats.snapshot() for key, stats in list(_views.items())}
+    ordered = sorted(
+        views.items(), key=lambda item: (item[1]['wall']['mean_ms'] or 0) * item[1]['requests'], reverse=True
+    )
+    return {
+        'since': _state['since'].isoformat(),
+        'sample_rate': settings.PROFILING_SAMPLE_RATE,
+        'views': dict(ordered),
+    }
+
+
+def reset_request_stats():
+    with _lock:
+        _views.clear()
+        _state['since'] = timezone.now()
+
+
+def _view_key(request):
+    match = getattr(request, 'resolver_match', None)
+    route = match.route if match is not None else 'unresolved'
+    return f'{request.method} {route}'
+
+
+class RequestProfilingMiddleware:
+    """Record wall time, query count and DB time for a sample of requests"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample_rate = settings.PROFILING_SAMPLE_RATE
+        if sample_rate <= 0 or (sample_rate < 1 and random.random() >= sample_rate):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        # Streaming bodies are produced after this point and are not included
+        wall_seconds = time.perf_counter() - started
+
+        key = _view_key(request)
+        repeated = recorder.repeated(settings.PROFILING_N_PLUS_ONE_THRESHOLD)
+        for sql, count in _view_stats(key).observe(wall_seconds, recorder, response.status_code, repeated):
+            logger.warning('Possible N+1 on %s: same query run %d times: %.300s', key, count, sql)
+
+        if settings.PROFILING_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'app;dur={wall_seconds * 1000:.1f}, '
+                f'db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries"'
+            )
+        return response
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAuthenticated, IsAdminUser])
+def request_profile_stats(request):
+    """
+    Per-view request profiling aggregates of this worker process
+    GET /api/admin/request-stats/     read
+    DELETE /api/admin/request-stats/  reset
+    """
+    if request.method == 'DELETE':
+        reset_request_stats()
+        return Response({'success': True, 'message': 'Request stats reset'}, status=status.HTTP_200_OK)
+    return Response({'success': True, 'stats': request_stats()}, status=status.HTTP_200_OK)
@@ -88,6 +88,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'radiumB.profiling.RequestProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -290,12 +291,68 @@ def get_database_config():
         return {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': sqlite_db_path,
+            'OPTIONS': {
+                # Seconds a writer waits for the write lock before failing with "database is locked"
+                'timeout': int(os.getenv('SQLITE_TIMEOUT', 20)),
+            },
         }
 
 DATABASES = {
     "default": get_database_config()
 }
 
+
+def get_cache_config():
+    """
+    Returns the cache configuration selected by CACHE_BACKEND.
+
+    - 'locmem' (default): per-process memory cache
+    - 'file': shared by all workers on one host, stored under CACHE_LOCATION
+    - 'redis': shared across hosts, REDIS_URL points at any Redis-compatible server
+
+    Returns:
+        dict: Cache configuration for Django CACHES setting
+    """
+    backend = os.getenv('CACHE_BACKEND', 'locmem').strip().lower()
+
+    if backend == 'redis':
+        return {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            'KEY_PREFIX': 'radium',
+        }
+    if backend == 'file':
+        return {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_LOCATION', str(BASE_DIR / '.cache')),
+            'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))},
+        }
+    return {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'radium-default',
+        'OPTIONS': {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 10000))},
+    }
+
+CACHES = {
+    "default": get_cache_config()
+}
+
+# Invalidation of cached responses and choice lists goes through version counters in the default cache.
+# A per-process cache only invalidates the worker that made the change, so other workers would serve stale data.
+CACHE_IS_SHARED = CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+
+# Public event endpoint response cache (invalidated by signals, TTL is a safety net). Off unless enabled; enable it
+# with a shared CACHE_BACKEND ('file' or 'redis'), or with 'locmem' only when a single process serves requests
+RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'False').lower() == 'true'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+# Year/department/category choice registry: seconds between checks for changes made by other processes,
+# the longest a process keeps a loaded table (short with a per-process cache, where changes made by other
+# processes are never signalled), and how long browsers may reuse a choices response before revalidating its ETag
+CHOICE_REGISTRY_CHECK_SECONDS = int(os.getenv('CHOICE_REGISTRY_CHECK_SECONDS', 5))
+CHOICE_REGISTRY_MAX_AGE = int(os.getenv('CHOICE_REGISTRY_MAX_AGE', 600 if CACHE_IS_SHARED else 30))
+CHOICES_MAX_AGE = int(os.getenv('CHOICES_MAX_AGE', 60))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -406,7 +463,9 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        # Attendance scans; one scanner account often works a whole gate
+        'scan': os.getenv('SCAN_THROTTLE_RATE', '100/second'),
     },
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
@@ -418,6 +477,30 @@ REST_FRAMEWORK = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# QR code render cache: in-process LRU plus an optional content-addressed store under MEDIA_ROOT
+QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', 512))
+QR_CACHE_DISK_STORE = os.getenv('QR_CACHE_DISK_STORE', 'True').lower() == 'true'
+QR_CACHE_DIR = os.getenv('QR_CACHE_DIR', 'qr_codes')
+
+# Rows fetched per database round trip by the streaming CSV exports
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+
+# Event full-text search (PostgreSQL text search config, max terms per query)
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'english')
+SEARCH_MAX_TERMS = int(os.getenv('SEARCH_MAX_TERMS', 8))
+
+# Attendance scan index: per-hash cache entries loaded at gate-open (seconds to keep, keys per cache write)
+SCAN_INDEX_TIMEOUT = int(os.getenv('SCAN_INDEX_TIMEOUT', 43200))
+SCAN_INDEX_BATCH_SIZE = int(os.getenv('SCAN_INDEX_BATCH_SIZE', 1000))
+
+# Maximum scans accepted by one offline attendance sync request
+ATTENDANCE_SYNC_MAX_BATCH = int(os.getenv('ATTENDANCE_SYNC_MAX_BATCH', 5000))
+
+# Bulk internal booking: rows per upload, rows per INSERT, threads hashing new users' passwords
+BULK_BOOKING_MAX_ROWS = int(os.getenv('BULK_BOOKING_MAX_ROWS', 5000))
+BULK_BOOKING_CHUNK_SIZE = int(os.getenv('BULK_BOOKING_CHUNK_SIZE', 500))
+BULK_BOOKING_HASH_WORKERS = int(os.getenv('BULK_BOOKING_HASH_WORKERS', 4))
+
 # File upload settings
 FILE_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10MB
 FILE_UPLOAD_PERMISSIONS = 0o644
@@ -448,6 +531,16 @@ DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 EMAIL_USE_SSL = False  # Gmail uses TLS, not SSL
 SERVER_EMAIL = EMAIL_HOST_USER  # Server email for error messages
 
+# Bulk QR sends reuse one SMTP connection per batch, then reconnect
+EMAIL_BULK_BATCH_SIZE = int(os.getenv('EMAIL_BULK_BATCH_SIZE', 100))
+
+# Email outbox (drained by `python manage.py process_email_outbox`)
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_BACKOFF_SECONDS', 30))  # doubled on each retry
+EMAIL_OUTBOX_MAX_BACKOFF_SECONDS = int(os.getenv('EMAIL_OUTBOX_MAX_BACKOFF_SECONDS', 3600))
+EMAIL_OUTBOX_LEASE_SECONDS = int(os.getenv('EMAIL_OUTBOX_LEASE_SECONDS', 600))  # reclaim emails from crashed workers
+
 # Debug email configuration in debug mode
 if DEBUG:
     print("Email Configuration:")
@@ -518,3 +611,73 @@ def get_payu_config():
     }
 
 PAYU_CONFIG = get_payu_config()
+
+# Payment gateway HTTP client: connections kept open per gateway, retries and base backoff (seconds, jittered)
+PAYMENT_GATEWAY_POOL_SIZE = int(os.getenv('PAYMENT_GATEWAY_POOL_SIZE', 20))
+PAYMENT_GATEWAY_RETRIES = int(os.getenv('PAYMENT_GATEWAY_RETRIES', 2))
+PAYMENT_GATEWAY_BACKOFF_SECONDS = float(os.getenv('PAYMENT_GATEWAY_BACKOFF_SECONDS', 0.25))
+
+# (connect, read) timeouts in seconds per gateway
+PAYMENT_GATEWAY_TIMEOUTS = {
+    'default': (3.0, 10.0),
+    'cashfree': (float(os.getenv('CASHFREE_CONNECT_TIMEOUT', 3)), float(os.getenv('CASHFREE_READ_TIMEOUT', 10))),
+    'payu': (float(os.getenv('PAYU_CONNECT_TIMEOUT', 3)), float(os.getenv('PAYU_READ_TIMEOUT', 10))),
+}
+
+# Gateway API base URL overrides, e.g. http://127.0.0.1:8765/pg to use the run_fake_gateway server
+PAYMENT_GATEWAY_BASE_URLS = {
+    'cashfree': os.getenv('CASHFREE_API_BASE_URL', ''),
+    'payu': os.getenv('PAYU_API_BASE_URL', ''),
+}
+
+# Payment webhook queue (drained by process_payment_webhooks)
+PAYMENT_WEBHOOK_BATCH_SIZE = int(os.getenv('PAYMENT_WEBHOOK_BATCH_SIZE', 50))
+PAYMENT_WEBHOOK_MAX_ATTEMPTS = int(os.getenv('PAYMENT_WEBHOOK_MAX_ATTEMPTS', 8))
+PAYMENT_WEBHOOK_BACKOFF_SECONDS = int(os.getenv('PAYMENT_WEBHOOK_BACKOFF_SECONDS', 15))  # doubled on each retry
+PAYMENT_WEBHOOK_MAX_BACKOFF_SECONDS = int(os.getenv('PAYMENT_WEBHOOK_MAX_BACKOFF_SECONDS', 1800))
+PAYMENT_WEBHOOK_LEASE_SECONDS = int(os.getenv('PAYMENT_WEBHOOK_LEASE_SECONDS', 300))  # reclaim webhooks from crashed workers
+
+# Payment reconciliation: minutes a payment must stay pending before the gateway is asked, concurrent gateway requests
+PAYMENT_RECONCILE_AFTER_MINUTES = int(os.getenv('PAYMENT_RECONCILE_AFTER_MINUTES', 30))
+PAYMENT_RECONCILE_WORKERS = int(os.getenv('PAYMENT_RECONCILE_WORKERS', 8))
+
+# Admin user listing: default and maximum rows per JSON page, rows read per query when streaming NDJSON
+USER_LIST_PAGE_SIZE = int(os.getenv('USER_LIST_PAGE_SIZE', 100))
+USER_LIST_MAX_PAGE_SIZE = int(os.getenv('USER_LIST_MAX_PAGE_SIZE', 1000))
+USER_LIST_STREAM_CHUNK = int(os.getenv('USER_LIST_STREAM_CHUNK', 1000))
+
+# QR value of new OD entries: 'hash' (random SHA-256 hex) or 'signed' (compact HMAC token, see event/qr_tokens.py).
+# Existing values keep working either way.
+QR_TOKEN_FORMAT = os.getenv('QR_TOKEN_FORMAT', 'hash').lower()
+QR_TOKEN_SECRET = os.getenv('QR_TOKEN_SECRET', SECRET_KEY)
+
+# Gate photo/clip decoding: pool processes (0 decodes in the request), long side frames are reduced to,
+# mean grey level change below which a frame counts as a repeat, frames read per clip, upload limits
+QR_DECODE_WORKERS = int(os.getenv('QR_DECODE_WORKERS', 2))
+QR_DECODE_MAX_SIDE = int(os.getenv('QR_DECODE_MAX_SIDE', 1024))
+QR_DECODE_DUPLICATE_THRESHOLD = float(os.getenv('QR_DECODE_DUPLICATE_THRESHOLD', 4.0))
+QR_DECODE_MAX_FRAMES = int(os.getenv('QR_DECODE_MAX_FRAMES', 300))
+QR_DECODE_MAX_FILES = int(os.getenv('QR_DECODE_MAX_FILES', 20))
+QR_DECODE_MAX_UPLOAD_BYTES = int(os.getenv('QR_DECODE_MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
+
+# Request profiling (radiumB/profiling.py): share of requests profiled (0 disables), whether sampled responses
+# get a Server-Timing header, and how often one SQL statement may run in a request before it is flagged as N+1
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0.05))
+PROFILING_SERVER_TIMING = os.getenv('PROFILING_SERVER_TIMING', 'False').lower() == 'true'
+PROFILING_N_PLUS_ONE_THRESHOLD = int(os.getenv('PROFILING_N_PLUS_ONE_THRESHOLD', 10))
+
+# Logs of the project's own apps go to the console; LOG_LEVEL=DEBUG shows the payment, webhook and OD list debug lines
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '[{levelname}] {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        app: {'handlers': ['console'], 'level': os.getenv('LOG_LEVEL', 'INFO').upper(), 'propagate': False}
+        for app in ('radiumB', 'authentication', 'event', 'payment', 'users')
+    },
+}
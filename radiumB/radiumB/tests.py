@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.test import TestCase, override_settings
+from django.urls import path
+from rest_framework.test import APIClient
+
+from .profiling import request_profile_stats, request_stats, reset_request_stats
+
+User = get_user_model()
+
+
+def users_view(request):
+    return JsonResponse({'users': User.objects.count()})
+
+
+def users_one_by_one_view(request):
+    # One query per user: the N+1 pattern the middleware should flag
+    pks = list(User.objects.values_list('pk', flat=True))
+    return JsonResponse({'users': [User.objects.get(pk=pk).username for pk in pks]})
+
+
+urlpatterns = [
+    path('profiling/users/', users_view),
+    path('profiling/users/one-by-one/', users_one_by_one_view),
+    path('api/admin/request-stats/', request_profile_stats),
+]
+
+
+@override_settings(
+    ROOT_URLCONF=__name__,
+    PROFILING_SAMPLE_RATE=1.0,
+    PROFILING_SERVER_TIMING=True,
+    PROFILING_N_PLUS_ONE_THRESHOLD=3,
+)
+class RequestProfilingTests(TestCase):
+    """Sampled requests are timed per route, N+1 queries are flagged and admins can read the stats"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(5):
+            User.objects.create_user(username=f'student{i}', email=f'23100100{i}@rajalakshmi.edu.in')
+
+    def setUp(self):
+        reset_request_stats()
+        self.addCleanup(reset_request_stats)
+
+    def test_sampled_request_is_recorded(self):
+        response = self.client.get('/profiling/users/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+        view = request_stats()['views']['GET profiling/users/']
+        self.assertEqual(view['requests'], 1)
+        self.assertEqual(view['wall']['outcomes'], {'200': 1})
+        self.assertEqual(view['queries']['total'], 1)
+        self.assertEqual(view['n_plus_one_requests'], 0)
+
+    @override_settings(PROFILING_SAMPLE_RATE=0)
+    def test_unsampled_request_is_not_recorded(self):
+        response = self.client.get('/profiling/users/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(request_stats()['views'], {})
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.5)
+    def test_sample_rate(self):
+        with mock.patch('radiumB.profiling.random.random', side_effect=[0.7, 0.2]):
+            skipped = self.client.get('/profiling/users/')
+            sampled = self.client.get('/profiling/users/')
+
+        self.assertNotIn('Server-Timing', skipped)
+        self.assertIn('Server-Timing', sampled)
+        self.assertEqual(request_stats()['views']['GET profiling/users/']['requests'], 1)
+
+    @override_settings(PROFILING_SERVER_TIMING=False)
+    def test_server_timing_header_off(self):
+        response = self.client.get('/profiling/users/')
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(request_stats()['views']['GET profiling/users/']['requests'], 1)
+
+    def test_repeated_query_is_flagged(self):
+        with self.assertLogs('radiumB.profiling', 'WARNING') as logs:
+            self.client.get('/profiling/users/one-by-one/')
+            self.client.get('/profiling/users/one-by-one/')
+
+        view = request_stats()['views']['GET profiling/users/one-by-one/']
+        self.assertEqual(view['requests'], 2)
+        self.assertEqual(view['n_plus_one_requests'], 2)
+        self.assertEqual(view['queries']['max'], 6)
+        self.assertEqual(len(view['repeated_queries']), 1)
+        self.assertEqual(view['repeated_queries'][0]['max_repeats'], 5)
+        # Each statement is logged the first time it is seen for a view
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('same query run 5 times', logs.output[0])
+
+    def test_stats_endpoint_is_admin_only(self):
+        client = APIClient()
+        self.assertIn(client.get('/api/admin/request-stats/').status_code, (401, 403))
+
+        client.force_authenticate(User.objects.get(username='student0'))
+        self.assertEqual(client.get('/api/admin/request-stats/').status_code, 403)
+        self.assertEqual(client.delete('/api/admin/request-stats/').status_code, 403)
+
+    def test_stats_endpoint_reads_and_resets(self):
+        self.client.get('/profiling/users/')
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username='admin', is_staff=True))
+
+        response = client.get('/api/admin/request-stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['stats']['sample_rate'], 1.0)
+        self.assertEqual(response.data['stats']['views']['GET profiling/users/']['requests'], 1)
+
+        self.assertEqual(client.delete('/api/admin/request-stats/').status_code, 200)
+        # Only the DELETE itself, profiled after the reset, is left
+        self.assertEqual(list(request_stats()['views']), ['DELETE api/admin/request-stats/'])
@@ -19,9 +19,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from api_tester.admin import api_tester_view
+from .profiling import request_profile_stats
 
 urlpatterns = [
     path('admin/api-tester/', api_tester_view, name='api_tester'),
+    path('api/admin/request-stats/', request_profile_stats, name='request_profile_stats'),
     path('admin/', admin.site.urls),
     path('api/', include('event.urls')),
     path('api/auth/', include('authentication.urls')),
@@ -6,6 +6,7 @@ class UsersConfig(AppConfig):
     name = 'users'
 
     def ready(self):
+        from . import choice_registry  # noqa: F401
         from django.contrib.auth import get_user_model
         from authentication.models import UserProfile
 
@@ -0,0 +1,174 @@
+"""
+In-process registry of the dynamic choice tables
+
+Year, Department, Category (users.dynamic_choices_models) and EventCategory
+are small tables read on every profile serialisation, export row and choices
+request. Each table is loaded once per process into a ChoiceSet holding the
+active rows in display order and a code -> label dict, so a label lookup is
+a dict access instead of a query.
+
+Saving or deleting any of these rows clears the registry of the process that
+made the change and bumps a version number in the shared Django cache. Other
+processes compare that version at most every CHOICE_REGISTRY_CHECK_SECONDS
+and reload on their next lookup if it moved.
+
+Rows changed without signals (queryset updates, the database shell) or a
+per-process cache, where other processes never see the bump, are covered by
+CHOICE_REGISTRY_MAX_AGE: every set is reloaded once it is that old.
+"""
+import hashlib
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .choices import DEPARTMENT_CHOICES, YEAR_CHOICES
+
+VERSION_KEY = 'choice_registry:version'
+
+_lock = threading.Lock()
+_state = {'version': None, 'checked_at': float('-inf'), 'loaded_at': float('-inf'), 'sets': {}}
+
+
+class ChoiceSet:
+    """Snapshot of one choice table: active rows in order, labels by code and an ETag"""
+
+    def __init__(self, rows, labels):
+        self.rows = rows
+        self.labels = labels
+        self.etag = hashlib.sha1(json.dumps(rows, sort_keys=True).encode()).hexdigest()[:20]
+
+    def label(self, code, default=None):
+        return self.labels.get(code, code if default is None else default)
+
+
+def _load_years():
+    from .dynamic_choices_models import Year
+
+    rows = list(Year.objects.filter(is_active=True).order_by('order').values('code', 'display_name'))
+    # Codes no longer (or not yet) in the table fall back to the static choices
+    labels = dict(YEAR_CHOICES)
+    labels.update((row['code'], row['display_name']) for row in rows)
+    return ChoiceSet(rows, labels)
+
+
+def _load_departments():
+    from .dynamic_choices_models import Department
+
+    rows = [
+        {'code': code, 'full_name': full_name, 'category': category, 'category_active': category_active}
+        for code, full_name, category, category_active in
+        Department.objects.filter(is_active=True).order_by('category__order', 'order')
+        .values_list('code', 'full_name', 'category__code', 'category__is_active')
+    ]
+    labels = dict(DEPARTMENT_CHOICES)
+    labels.update((row['code'], row['full_name']) for row in rows)
+    return ChoiceSet(rows, labels)
+
+
+def _load_categories():
+    from .dynamic_choices_models import Category
+
+    rows = list(Category.objects.filter(is_active=True).order_by('order').values('code', 'display_name'))
+    return ChoiceSet(rows, {row['code']: row['display_name'] for row in rows})
+
+
+def _load_event_categories():
+    from event.models import EventCategory
+
+    rows = list(
+        EventCategory.objects.filter(is_active=True).order_by('order').values('code', 'display_name', 'description')
+    )
+    return ChoiceSet(rows, {row['code']: row['display_name'] for row in rows})
+
+
+LOADERS = {
+    'year': _load_years,
+    'department': _load_departments,
+    'category': _load_categories,
+    'event_category': _load_event_categories,
+}
+
+
+def _shared_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _current_sets():
+    now = time.monotonic()
+    if now - _state['checked_at'] >= settings.CHOICE_REGISTRY_CHECK_SECONDS:
+        version = _shared_version()
+        with _lock:
+            if version != _state['version'] or now - _state['loaded_at'] >= settings.CHOICE_REGISTRY_MAX_AGE:
+                _state['sets'] = {}
+                _state['version'] = version
+                _state['loaded_at'] = now
+            _state['checked_at'] = now
+    return _state['sets']
+
+
+def get_choice_set(name):
+    """
+    Loaded choice set for 'year', 'department', 'category' or 'event_category'.
+
+    Returns:
+        ChoiceSet: Active rows, labels and ETag; loaded with one query the first time
+    """
+    sets = _current_sets()
+    choice_set = sets.get(name)
+    if choice_set is None:
+        choice_set = LOADERS[name]()
+        with _lock:
+            sets[name] = choice_set
+    return choice_set
+
+
+def year_label(code):
+    return get_choice_set('year').label(code)
+
+
+def department_label(code):
+    return get_choice_set('department').label(code)
+
+
+def event_category_label(code):
+    return get_choice_set('event_category').label(code)
+
+
+def department_rows(category=None):
+    """Active departments as API rows, optionally only those of an active category"""
+    rows = get_choice_set('department').rows
+    if category:
+        rows = [row for row in rows if row['category'] == category and row['category_active']]
+    return [{'code': row['code'], 'full_name': row['full_name'], 'category': row['category']} for row in rows]
+
+
+def clear_registry():
+    """Drop every loaded set in this process and tell the other processes to do the same"""
+    with _lock:
+        _state['sets'] = {}
+        _state['checked_at'] = float('-inf')
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
+
+
+@receiver(post_save, sender='academic.Year')
+@receiver(post_delete, sender='academic.Year')
+@receiver(post_save, sender='academic.Department')
+@receiver(post_delete, sender='academic.Department')
+@receiver(post_save, sender='academic.Category')
+@receiver(post_delete, sender='academic.Category')
+@receiver(post_save, sender='event.EventCategory')
+@receiver(post_delete, sender='event.EventCategory')
+def invalidate_choice_registry(sender, **kwargs):
+    clear_registry()
@@ -1,3 +1,162 @@
-from django.test import TestCase
+import csv
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from authentication.models import UserProfile
+from .choice_registry import _shared_version, clear_registry, year_label
+from .dynamic_choices_models import Year
+from .management.commands.import_students import Command as ImportStudentsCommand
+
+User = get_user_model()
+
+STUDENT_CSV_FIELDS = [
+    'student_id__email', 'roll_no', 'student_id__first_name', 'student_id__last_name', 'dept_id__dept_name', 'batch',
+]
+
+
+@override_settings(CHOICE_REGISTRY_CHECK_SECONDS=0, CHOICE_REGISTRY_MAX_AGE=30)
+class ChoiceRegistryTests(TestCase):
+    """Loaded choice tables follow changes made here, in other processes and behind the signals' back"""
+
+    def setUp(self):
+        clear_registry()
+        self.year = Year.objects.create(code='1', display_name='First Year')
+
+    def test_save_reloads_this_process(self):
+        self.assertEqual(year_label('1'), 'First Year')
+        self.year.display_name = '1st Year'
+        self.year.save()
+        self.assertEqual(year_label('1'), '1st Year')
+
+    def test_version_bump_from_another_process_reloads(self):
+        self.assertEqual(year_label('1'), 'First Year')
+        Year.objects.filter(pk=self.year.pk).update(display_name='1st Year')
+        self.assertEqual(year_label('1'), 'First Year')
+
+        # What clear_registry() in another process leaves in the shared cache
+        with mock.patch('users.choice_registry._shared_version', return_value=_shared_version() + 1):
+            self.assertEqual(year_label('1'), '1st Year')
+
+    def test_sets_expire_after_max_age(self):
+        with mock.patch('users.choice_registry.time.monotonic', return_value=1000.0):
+            self.assertEqual(year_label('1'), 'First Year')
+        Year.objects.filter(pk=self.year.pk).update(display_name='1st Year')
+
+        with mock.patch('users.choice_registry.time.monotonic', return_value=1029.0):
+            self.assertEqual(year_label('1'), 'First Year')
+        with mock.patch('users.choice_registry.time.monotonic', return_value=1030.0):
+            self.assertEqual(year_label('1'), '1st Year')
+
+
+class ImportStudentsFastTests(TestCase):
+    """import_students --fast writes users in chunks, updates existing ones and resumes without repeating work"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.csv_path = os.path.join(directory.name, 'students.csv')
+        self.output_path = os.path.join(directory.name, 'credentials.csv')
+
+    def _write_csv(self, count, domain='rajalakshmi.edu.in'):
+        with open(self.csv_path, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.DictWriter(file, fieldnames=STUDENT_CSV_FIELDS)
+            writer.writeheader()
+            for i in range(count):
+                writer.writerow({
+                    'student_id__email': f'23100100{i}@{domain}',
+                    'roll_no': f'23100100{i}',
+                    'student_id__first_name': f'Student{i}',
+                    'student_id__last_name': 'R',
+                    'dept_id__dept_name': 'Information Technology',
+                    'batch': '2023',
+                })
+
+    def _import(self, *args):
+        out = StringIO()
+        call_command(
+            'import_students', self.csv_path, '--fast', '--workers', '1', '--chunk-size', '2',
+            '--output', self.output_path, *args, stdout=out
+        )
+        return out.getvalue()
+
+    def _credential_emails(self):
+        with open(self.output_path, newline='', encoding='utf-8') as file:
+            return [row['email'] for row in csv.DictReader(file)]
+
+    def test_imports_in_chunks(self):
+        self._write_csv(5)
+
+        output = self._import()
+
+        self.assertIn('Processed 2 rows', output)
+        self.assertIn('Processed 4 rows', output)
+        self.assertIn('Processed 5 rows', output)
+        self.assertIn('Created: 5', output)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(UserProfile.objects.filter(department='IT', is_verified=True).count(), 5)
+        user = User.objects.get(email='231001003@rajalakshmi.edu.in')
+        self.assertEqual(user.username, '231001003')
+        self.assertTrue(user.check_password('Student3$R%Information Technology.231001003'))
+        self.assertEqual(self._credential_emails(), [f'23100100{i}@rajalakshmi.edu.in' for i in range(5)])
+        self.assertFalse(os.path.exists(f'{self.csv_path}.checkpoint'))
+
+    def test_existing_email_is_updated(self):
+        existing = User.objects.create_user(
+            username='old_name', email='231001001@rajalakshmi.edu.in', first_name='Old', password='old'
+        )
+        # users.apps creates the profile on save where its signal handler is connected
+        profile, _ = UserProfile.objects.get_or_create(user=existing)
+        profile.rollno, profile.department = 'old', 'CSE'
+        profile.save()
+        self._write_csv(3)
+
+        output = self._import()
+
+        self.assertIn('Created: 2', output)
+        self.assertIn('Updated: 1', output)
+        self.assertEqual(User.objects.count(), 3)
+        existing.refresh_from_db()
+        self.assertEqual(existing.username, 'old_name')
+        self.assertEqual(existing.first_name, 'Student1')
+        self.assertTrue(existing.check_password('Student1$R%Information Technology.231001001'))
+        profile = UserProfile.objects.get(user=existing)
+        self.assertEqual((profile.rollno, profile.department), ('231001001', 'IT'))
+
+    def test_username_collision(self):
+        User.objects.create_user(username='231001000', email='someone@example.com')
+        self._write_csv(2, domain='example.org')
+
+        self._import()
+
+        self.assertEqual(User.objects.get(email='231001000@example.org').username, '2310010001')
+        self.assertEqual(User.objects.get(email='231001001@example.org').username, '231001001')
+
+    def test_resume_after_crash_does_not_repeat_credentials(self):
+        self._write_csv(5)
+        write_checkpoint = ImportStudentsCommand._write_checkpoint
+        calls = []
+
+        def crash_on_second_checkpoint(command, path, state):
+            calls.append(path)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            write_checkpoint(command, path, state)
+
+        # Interrupted after chunk 2 is committed and its credentials written, before its checkpoint
+        with mock.patch.object(ImportStudentsCommand, '_write_checkpoint', crash_on_second_checkpoint):
+            with self.assertRaises(KeyboardInterrupt):
+                self._import()
+        self.assertEqual(len(self._credential_emails()), 4)
+
+        output = self._import('--resume')
+
+        self.assertIn('Resuming after row 2', output)
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(self._credential_emails(), [f'23100100{i}@rajalakshmi.edu.in' for i in range(5)])
+        self.assertFalse(os.path.exists(f'{self.csv_path}.checkpoint'))
@@ -0,0 +1,169 @@
+"""
+Admin user listing
+
+GET /api/users/list/ pages through users by id (keyset), selecting only the
+requested columns with values(), so no model instances or serializers are
+built per user.
+
+Query parameters:
+
+after     Return users with id greater than this (the previous page's next_after)
+limit     Page size, capped at USER_LIST_MAX_PAGE_SIZE
+fields    Comma-separated subset of LIST_FIELDS (default: all)
+is_eventStaff, is_superuser, is_qr_scanner, is_verified
+          Role flag filters, 'true' or 'false'
+encoding  'ndjson' streams every matching user, one JSON object per line
+
+Memory per request is bounded by the row count held at once: at most
+USER_LIST_MAX_PAGE_SIZE rows for a JSON page, and USER_LIST_STREAM_CHUNK
+rows for an NDJSON stream, which reads the users in keyset chunks of that
+size however many there are.
+"""
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import StreamingHttpResponse
+
+User = get_user_model()
+
+# Output field -> values() lookup
+LIST_FIELDS = {
+    'id': 'id',
+    'username': 'username',
+    'email': 'email',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+    'display_name': 'profile__display_name',
+    'is_eventStaff': 'profile__is_eventStaff',
+    'is_superuser': 'profile__is_superuser',
+    'is_qr_scanner': 'profile__is_qr_scanner',
+    'is_verified': 'profile__is_verified',
+}
+
+ROLE_FLAGS = ('is_eventStaff', 'is_superuser', 'is_qr_scanner', 'is_verified')
+
+_BOOLEAN_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def _parse_int(value, name, default=None):
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{name} must be an integer')
+    if number < 0:
+        raise ValueError(f'{name} must not be negative')
+    return number
+
+
+def parse_list_params(params):
+    """
+    Validate the listing query parameters.
+
+    Returns:
+        dict: {'after', 'limit', 'fields', 'filters'}
+
+    Raises:
+        ValueError: On an unknown field, a non-boolean role filter or a bad number
+    """
+    fields = [name.strip() for name in (params.get('fields') or '').split(',') if name.strip()]
+    unknown = [name for name in fields if name not in LIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if fields and 'id' not in fields:
+        # Clients need the id to ask for the next page
+        fields.insert(0, 'id')
+
+    filters = {}
+    for flag in ROLE_FLAGS:
+        value = params.get(flag)
+        if value is None:
+            continue
+        if value.lower() not in _BOOLEAN_VALUES:
+            raise ValueError(f'{flag} must be true or false')
+        filters[flag] = _BOOLEAN_VALUES[value.lower()]
+
+    limit = _parse_int(params.get('limit'), 'limit', settings.USER_LIST_PAGE_SIZE)
+    return {
+        'after': _parse_int(params.get('after'), 'after'),
+        'limit': min(max(limit, 1), settings.USER_LIST_MAX_PAGE_SIZE),
+        'fields': fields or list(LIST_FIELDS),
+        'filters': filters,
+    }
+
+
+def user_rows(fields, filters):
+    """
+    Users matching the role filters as dicts of the requested fields, ordered by id.
+
+    A user without a profile has every role flag False, so filtering on
+    flag=false includes them.
+    """
+    queryset = User.objects.all()
+    for flag, value in filters.items():
+        if value:
+            queryset = queryset.filter(**{f'profile__{flag}': True})
+        else:
+            queryset = queryset.exclude(**{f'profile__{flag}': True})
+    return queryset.order_by('id').values(*(LIST_FIELDS[name] for name in fields))
+
+
+def _format_row(row, fields):
+    user = {}
+    for name in fields:
+        value = row[LIST_FIELDS[name]]
+        if name in ROLE_FLAGS:
+            value = bool(value)
+        elif value is None:
+            value = ''
+        user[name] = value
+    return user
+
+
+def user_page(params):
+    """
+    One keyset page of users.
+
+    Returns:
+        dict: {'results': [...], 'count': rows on this page, 'next_after': id for the next page or None}
+    """
+    queryset = user_rows(params['fields'], params['filters'])
+    if params['after'] is not None:
+        queryset = queryset.filter(id__gt=params['after'])
+    # One extra row tells whether another page follows
+    rows = list(queryset[:params['limit'] + 1])
+    has_more = len(rows) > params['limit']
+    results = [_format_row(row, params['fields']) for row in rows[:params['limit']]]
+    return {
+        'results': results,
+        'count': len(results),
+        'next_after': results[-1]['id'] if has_more else None,
+    }
+
+
+def ndjson_users(params):
+    """Yield every matching user after params['after'] as an NDJSON line, reading in keyset chunks"""
+    queryset = user_rows(params['fields'], params['filters'])
+    chunk_size = settings.USER_LIST_STREAM_CHUNK
+    after = params['after']
+    while True:
+        chunk = list((queryset.filter(id__gt=after) if after is not None else queryset)[:chunk_size])
+        for row in chunk:
+            yield json.dumps(_format_row(row, params['fields']), separators=(',', ':')) + '\n'
+        if len(chunk) < chunk_size:
+            return
+        after = chunk[-1]['id']
+
+
+def ndjson_response(params):
+    """
+    Stream all matching users.
+
+    Returns:
+        StreamingHttpResponse: application/x-ndjson attachment
+    """
+    response = StreamingHttpResponse(ndjson_users(params), content_type='application/x-ndjson')
+    response['Content-Disposition'] = 'attachment; filename="users.ndjson"'
+    return response
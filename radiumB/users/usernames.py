@@ -0,0 +1,55 @@
+"""
+Username allocation for bulk user creation
+
+Used by bulk internal booking (event.bulk_booking) and the fast student
+import (import_students --fast). Both create many users at once, so clashes
+are resolved in memory against one lookup instead of probing the database
+once per candidate username.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+User = get_user_model()
+
+# Keeps IN lookups under SQLite's bound parameter limit
+_LOOKUP_CHUNK = 500
+
+
+def _chunks(values, size=_LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def unique_usernames(bases, reserved=()):
+    """
+    Map each requested base username to a free username, with one or two queries.
+
+    Args:
+        bases: Requested usernames, e.g. email local parts
+        reserved: Usernames to treat as taken although they are not in the database yet
+
+    Returns:
+        list: Free usernames, in the order of bases
+    """
+    taken = set(reserved)
+    for chunk in _chunks(set(bases)):
+        taken.update(User.objects.filter(username__in=chunk).values_list('username', flat=True))
+
+    clashing = {base for base in bases if base in taken}
+    if clashing:
+        for chunk in _chunks(clashing, 100):
+            condition = Q()
+            for base in chunk:
+                condition |= Q(username__startswith=base)
+            taken.update(User.objects.filter(condition).values_list('username', flat=True))
+
+    usernames = []
+    for base in bases:
+        username, counter = base, 1
+        while username in taken:
+            username = f'{base}{counter}'
+            counter += 1
+        taken.add(username)
+        usernames.append(username)
+    return usernames
@@ -5,6 +5,7 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.decorators import api_view, permission_classes
 from authentication.models import UserProfile
 from .serializers import UserProfileSerializer
+from .user_listing import ndjson_response, parse_list_params, user_page
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -12,34 +13,26 @@ User = get_user_model()
 
 class UserListView(APIView):
     """
-    List all users - Admin only
+    List users - Admin only
+
+    GET /api/users/list/?after=<id>&limit=<n>&fields=<a,b>&is_eventStaff=true&encoding=json|ndjson
+    Keyset-paginated on id; see users/user_listing.py for the parameters.
     """
     permission_classes = [IsAdminUser]
 
     def get(self, request):
         try:
-            users = User.objects.all().select_related('profile')
-            user_data = []
-
-            for user in users:
-                profile_data = {}
-                if hasattr(user, 'profile'):
-                    profile_data = UserProfileSerializer(user.profile).data
-
-                user_data.append({
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email,
-                    'first_name': user.first_name,
-                    'last_name': user.last_name,
-                    'display_name': getattr(user.profile, 'display_name', '') if hasattr(user, 'profile') else '',
-                    'is_eventStaff': getattr(user.profile, 'is_eventStaff', False) if hasattr(user, 'profile') else False,
-                    'is_superuser': getattr(user.profile, 'is_superuser', False) if hasattr(user, 'profile') else False,
-                    'is_qr_scanner': getattr(user.profile, 'is_qr_scanner', False) if hasattr(user, 'profile') else False,
-                    'is_verified': getattr(user.profile, 'is_verified', False) if hasattr(user, 'profile') else False,
-                })
-
-            return Response(user_data, status=status.HTTP_200_OK)
+            params = parse_list_params(request.query_params)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            encoding = request.query_params.get('encoding', 'json')
+            if encoding == 'ndjson':
+                return ndjson_response(params)
+            if encoding != 'json':
+                return Response({"error": "encoding must be json or ndjson"}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(user_page(params), status=status.HTTP_200_OK)
         except Exception as e:
             return Response({"error": f"Failed to fetch users: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -515,50 +508,48 @@ class ApplyForPremiumMembershipView(APIView):
 
 # ========== Dynamic Choices API Views ==========
 
-from .dynamic_choices_models import Year, Department, Category
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import etag
+from .choice_registry import department_rows, get_choice_set
+
+
+def _choices_etag(name):
+    """ETag of a registry choice set, so clients revalidate with a 304 instead of refetching"""
+    def compute(request, *args, **kwargs):
+        tag = get_choice_set(name).etag
+        if name == 'department':
+            tag = f"{tag}-{request.GET.get('category', '')}"
+        return tag
+    return compute
+
+
+def _choices_response(data):
+    response = Response(data, status=status.HTTP_200_OK)
+    patch_cache_control(response, public=True, max_age=settings.CHOICES_MAX_AGE)
+    return response
 
+
+@etag(_choices_etag('year'))
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_year_choices(request):
     """Get all active year choices"""
-    years = Year.objects.filter(is_active=True).order_by('order')
-    data = [{'code': year.code, 'display_name': year.display_name} for year in years]
-    return Response(data, status=status.HTTP_200_OK)
+    return _choices_response(get_choice_set('year').rows)
 
 
+@etag(_choices_etag('department'))
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_department_choices(request):
     """Get all active department choices, optionally filtered by category"""
     category = request.query_params.get('category', None)
-    
-    if category:
-        departments = Department.objects.filter(
-            is_active=True, 
-            category__code=category,
-            category__is_active=True
-        ).order_by('order')
-    else:
-        departments = Department.objects.filter(is_active=True).order_by('category__order', 'order')
-    
-    data = [{
-        'code': dept.code,
-        'full_name': dept.full_name,
-        'category': dept.category.code
-    } for dept in departments]
-    
-    return Response(data, status=status.HTTP_200_OK)
+    return _choices_response(department_rows(category))
 
 
+@etag(_choices_etag('category'))
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def get_category_choices(request):
     """Get all active category choices"""
-    categories = Category.objects.filter(is_active=True).order_by('order')
-    
-    data = [{
-        'code': cat.code,
-        'display_name': cat.display_name
-    } for cat in categories]
-    
-    return Response(data, status=status.HTTP_200_OK)
+    return _choices_response(get_choice_set('category').rows)